@@ -0,0 +1,211 @@
+"""
+ann_index.py — Local on-disk ANN index over all DRHP chunks (IVF-flat)
+=======================================================================
+A third retrieval backend next to Pinecone and the brute-force SQLite scan.
+Pure NumPy — no extra dependency, no network, works anywhere drhp.db does.
+
+Layout (data/ann_index/):
+  vectors.npy       (n, 384) float32 unit rows, sorted by (ipo_id, chunk_index)
+  centroids.npy     (nlist, 384) float32 spherical k-means centroids
+  list_rows.npy     row ids grouped by inverted list
+  list_offsets.npy  (nlist + 1) offsets into list_rows
+  meta.json         chunk_ids, page numbers, per-IPO row ranges, build info
+
+Query time:
+  - arrays are memory-mapped (np.load mmap_mode="r") — nothing is read
+    until a search touches it
+  - ipo_id filter → that IPO's rows are one contiguous slice, scored exactly
+  - no filter     → probe the NPROBE closest lists only (IVF)
+
+Built by rag_indexer.run_indexer after every run.
+"""
+
+import os, json, shutil, time
+import numpy as np
+from datetime import datetime
+from embeddings import EMBEDDING_DIM, EMBEDDING_MODEL, unpack_embedding
+
+ANN_DIR      = os.path.join(os.path.dirname(__file__), "data", "ann_index")
+NPROBE       = 8        # inverted lists scanned per unfiltered query
+KMEANS_ITERS = 10
+TRAIN_SAMPLE = 50_000   # k-means trains on at most this many vectors
+BATCH_ROWS   = 8192
+
+
+# ── BUILD ─────────────────────────────────────────────────────────────────────
+def _nlist_for(n: int) -> int:
+    return int(min(4096, max(1, round(np.sqrt(n)))))
+
+
+def _assign(X, C) -> np.ndarray:
+    """Nearest centroid (max dot product) for every row, in bounded batches."""
+    out = np.empty(len(X), dtype=np.int32)
+    for i in range(0, len(X), BATCH_ROWS):
+        out[i:i+BATCH_ROWS] = np.argmax(np.asarray(X[i:i+BATCH_ROWS]) @ C.T, axis=1)
+    return out
+
+
+def _train_centroids(X, nlist: int, seed: int = 0) -> np.ndarray:
+    rng    = np.random.default_rng(seed)
+    n      = len(X)
+    sample = np.asarray(X[np.sort(rng.choice(n, min(n, TRAIN_SAMPLE), replace=False))])
+    C      = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(KMEANS_ITERS):
+        assign = _assign(sample, C)
+        sums   = np.zeros_like(C)
+        np.add.at(sums, assign, sample)
+        counts = np.bincount(assign, minlength=nlist)
+        filled = counts > 0                      # empty lists keep their old centroid
+        norms  = np.linalg.norm(sums[filled], axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        C[filled] = sums[filled] / norms
+    return C.astype(np.float32)
+
+
+def build_ann_index(conn, out_dir: str = ANN_DIR) -> int:
+    """
+    Build the index from every embedded chunk in drhp.db.
+    Written to a temp dir and swapped in, so readers never see a half-built index.
+    Returns the number of vectors indexed.
+    """
+    t0 = time.time()
+    n  = conn.execute("SELECT COUNT(*) FROM chunks WHERE embedding IS NOT NULL").fetchone()[0]
+    if not n:
+        print("  ANN index: no embedded chunks — skipped")
+        return 0
+
+    tmp_dir = out_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    # Stream rows straight into an on-disk array — bounded memory at any corpus size
+    vectors    = np.lib.format.open_memmap(os.path.join(tmp_dir, "vectors.npy"), mode="w+",
+                                          dtype=np.float32, shape=(n, EMBEDDING_DIM))
+    chunk_ids  = []
+    pages      = []
+    ipo_ranges = {}
+    cursor = conn.execute("""
+        SELECT chunk_id, ipo_id, page_number, embedding
+        FROM chunks WHERE embedding IS NOT NULL
+        ORDER BY ipo_id, chunk_index
+    """)
+    row = 0
+    for chunk_id, ipo_id, page_number, blob in cursor:
+        if row >= n: break
+        v  = unpack_embedding(blob)
+        nv = float(np.linalg.norm(v))
+        vectors[row] = v / nv if nv > 0 else v
+        chunk_ids.append(chunk_id)
+        pages.append(page_number or 0)
+        start, _ = ipo_ranges.get(ipo_id, (row, row))
+        ipo_ranges[ipo_id] = (start, row + 1)
+        row += 1
+    n = row
+    vectors.flush()
+
+    nlist     = _nlist_for(n)
+    centroids = _train_centroids(vectors[:n], nlist)
+    assign    = _assign(vectors[:n], centroids)
+    list_rows = np.argsort(assign, kind="stable").astype(np.int32)
+    offsets   = np.zeros(nlist + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(assign, minlength=nlist))
+
+    np.save(os.path.join(tmp_dir, "centroids.npy"),    centroids)
+    np.save(os.path.join(tmp_dir, "list_rows.npy"),    list_rows)
+    np.save(os.path.join(tmp_dir, "list_offsets.npy"), offsets)
+    meta = {
+        "built_at":   datetime.now().isoformat(),
+        "model":      EMBEDDING_MODEL,
+        "dim":        EMBEDDING_DIM,
+        "count":      n,
+        "nlist":      nlist,
+        "chunk_ids":  chunk_ids,
+        "pages":      pages,
+        "ipo_ranges": {k: list(v) for k, v in ipo_ranges.items()},
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    del vectors   # release the memmap before moving the file (Windows)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    print(f"  ✅ ANN index: {n} vectors, {nlist} lists, {len(ipo_ranges)} IPOs "
+          f"({time.time() - t0:.1f}s)")
+    return n
+
+
+# ── LOAD ──────────────────────────────────────────────────────────────────────
+_loaded = {}   # out_dir -> (meta.json mtime, index dict)
+
+def load_ann_index(out_dir: str = ANN_DIR):
+    """Memory-mapped index, reloaded only when a rebuild replaces meta.json."""
+    meta_path = os.path.join(out_dir, "meta.json")
+    try:
+        mtime = os.path.getmtime(meta_path)
+    except OSError:
+        return None
+    cached = _loaded.get(out_dir)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("model") != EMBEDDING_MODEL:
+            print(f"  ANN index built with {meta.get('model')} — ignoring")
+            return None
+        index = {
+            "vectors":    np.load(os.path.join(out_dir, "vectors.npy"),      mmap_mode="r"),
+            "centroids":  np.load(os.path.join(out_dir, "centroids.npy")),
+            "list_rows":  np.load(os.path.join(out_dir, "list_rows.npy"),    mmap_mode="r"),
+            "offsets":    np.load(os.path.join(out_dir, "list_offsets.npy")),
+            "chunk_ids":  meta["chunk_ids"],
+            "pages":      meta["pages"],
+            "ipo_ranges": meta["ipo_ranges"],
+            "built_at":   meta["built_at"],
+        }
+    except Exception as e:
+        print(f"  ANN index load failed: {e}")
+        return None
+    _loaded[out_dir] = (mtime, index)
+    return index
+
+
+# ── SEARCH ────────────────────────────────────────────────────────────────────
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    if k < scores.size:
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(scores.size)
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+def search(index: dict, queries, top_k: int, ipo_id: str = None, nprobe: int = NPROBE) -> list:
+    """
+    queries: (m, 384) unit vectors (a single vector is accepted too).
+    Returns one list per query of (row, score) pairs, best first.
+    """
+    Q = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    if top_k <= 0:
+        return [[] for _ in Q]
+
+    if ipo_id is not None:
+        rng = index["ipo_ranges"].get(ipo_id)
+        if not rng:
+            return [[] for _ in Q]
+        start, end = rng
+        scores = Q @ np.asarray(index["vectors"][start:end]).T   # exact within one IPO
+        return [[(start + int(i), float(s[i])) for i in _top(s, top_k)] for s in scores]
+
+    centroids = index["centroids"]
+    offsets   = index["offsets"]
+    nprobe    = min(nprobe, len(centroids))
+    probes    = np.argsort(-(Q @ centroids.T), axis=1)[:, :nprobe]
+    results   = []
+    for q, lists in zip(Q, probes):
+        rows = np.concatenate([index["list_rows"][offsets[l]:offsets[l+1]] for l in lists])
+        if rows.size == 0:
+            results.append([]); continue
+        rows.sort()                               # sequential reads from the memmap
+        s = np.asarray(index["vectors"][rows]) @ q
+        results.append([(int(rows[i]), float(s[i])) for i in _top(s, top_k)])
+    return results
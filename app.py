@@ -28,13 +28,14 @@ if qp and qp != st.session_state.current_page:
     st.query_params.clear()
 
 cur   = st.session_state.current_page
-pages = ["F&O Early Access", "Dashboard", "IPO Detail", "GMP Tracker", "Historical Data"]
+pages = ["F&O Early Access", "Dashboard", "IPO Detail", "GMP Tracker", "Historical Data", "DRHP Search"]
 icons = {
     "F&O Early Access":  "🎯",
     "Dashboard":     "🏠",
     "IPO Detail":    "🔍",
     "GMP Tracker":   "📊",
     "Historical Data":"📜",
+    "DRHP Search":   "🔎",
 }
 
 # ── THEME (light only — dark toggle removed per user request) ──────────────────
@@ -242,6 +243,7 @@ st.markdown(f"""
         <a class="ts-drawer-link {"active" if cur=="IPO Detail" else ""}" href="?page=IPO Detail" target="_self">🔍 IPO Detail</a>
         <a class="ts-drawer-link {"active" if cur=="GMP Tracker" else ""}" href="?page=GMP Tracker" target="_self">📊 GMP Tracker</a>
         <a class="ts-drawer-link {"active" if cur=="Historical Data" else ""}" href="?page=Historical Data" target="_self">📜 Historical Data</a>
+        <a class="ts-drawer-link {"active" if cur=="DRHP Search" else ""}" href="?page=DRHP Search" target="_self">🔎 DRHP Search</a>
     </div>
     <div class="ts-drawer-pills">
         <span class="ts-pill np-blue">Mainboard</span>
@@ -263,6 +265,7 @@ st.markdown(f"""
         {nav_link("IPO Detail")}
         {nav_link("GMP Tracker")}
         {nav_link("Historical Data")}
+        {nav_link("DRHP Search")}
     </div>
     <div class="ts-pills">
         <span class="ts-pill np-blue">Mainboard</span>
@@ -332,3 +335,5 @@ elif "GMP"        in cur:
     from pages.gmp_tracker   import render; render(ACTIVE_IPOS + UPCOMING_IPOS, GMP_HISTORY)
 elif "Historical" in cur:
     from pages.historical    import render; render(HISTORICAL_IPOS)
+elif "DRHP Search" in cur:
+    from pages.drhp_search   import render; render(ACTIVE_IPOS + UPCOMING_IPOS)
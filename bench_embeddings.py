@@ -0,0 +1,203 @@
+"""
+bench_embeddings.py — Embedding backend startup / throughput / parity check
+============================================================================
+Runs the same texts through every EMBEDDING_BACKEND (see embeddings.py),
+each in a fresh process so import and model-load time are measured cold:
+
+  torch      — PyTorch float32 (reference)
+  onnx       — ONNX Runtime float32
+  onnx-int8  — ONNX Runtime, int8-quantised export
+
+Reported per backend:
+  load_s           import sentence_transformers + load the model
+  texts_per_s      warm encode throughput (batch of BATCH_SIZE)
+  peak_rss_mb      peak resident memory of the process (not on Windows)
+  mean_cos/min_cos cosine between each vector and the torch vector
+  overlap_at_k     top-k retrieval overlap with the torch rankings
+  top1_agree       share of queries whose best chunk is unchanged
+
+Texts are chunk texts sampled from data/drhp.db (synthetic DRHP sentences if
+there is no index yet); queries are the scorecard topic queries plus
+sentences taken from the sampled chunks.
+
+A backend passes parity when mean_cos >= MIN_MEAN_COSINE and
+overlap_at_k >= MIN_OVERLAP_AT_K; the exit status is 1 if any backend fails,
+so this can gate a switch of EMBEDDING_BACKEND.
+
+Run:  python bench_embeddings.py
+      python bench_embeddings.py --backends torch onnx-int8 --texts 2000
+"""
+
+import os, sys, json, time, random, sqlite3, argparse, tempfile, subprocess
+import numpy as np
+from datetime import datetime
+from pathlib import Path
+from embeddings import EMBEDDING_BACKENDS, EMBEDDING_MODEL
+from index_telemetry import peak_rss_mb
+
+OUT_DIR          = os.path.join(os.path.dirname(__file__), "data", "benchmarks")
+DB_PATH          = os.path.join(os.path.dirname(__file__), "data", "drhp.db")
+DEFAULT_TEXTS    = 1000
+DEFAULT_QUERIES  = 100
+DEFAULT_TOP_K    = 10
+BATCH_SIZE       = 64
+MIN_MEAN_COSINE  = 0.99    # per-text agreement with the torch vectors
+MIN_OVERLAP_AT_K = 0.90    # retrieval rankings stay within tolerance
+
+
+# ── TEXTS ─────────────────────────────────────────────────────────────────────
+def load_texts(n: int, seed: int = 0) -> list:
+    """Chunk texts from drhp.db, or synthetic DRHP-style sentences without one."""
+    if os.path.exists(DB_PATH):
+        try:
+            conn = sqlite3.connect(Path(DB_PATH).resolve().as_uri() + "?mode=ro", uri=True)
+            rows = conn.execute("SELECT text FROM chunks ORDER BY chunk_id").fetchall()
+            conn.close()
+            if rows:
+                random.Random(seed).shuffle(rows)
+                return [r[0] for r in rows[:n]]
+        except sqlite3.Error:
+            pass
+    from rag_retriever import SCORECARD_QUERIES
+    rng   = random.Random(seed)
+    words = " ".join(SCORECARD_QUERIES.values()).split()
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(20, 120))) + "."
+            for _ in range(n)]
+
+
+def make_queries(texts: list, count: int, seed: int = 1) -> list:
+    from rag_retriever import SCORECARD_QUERIES
+    rng       = random.Random(seed)
+    sentences = [s for t in texts for s in t.split(". ") if len(s) > 40]
+    return list(SCORECARD_QUERIES.values()) + rng.sample(sentences, min(count, len(sentences)))
+
+
+# ── WORKER (one fresh process per backend) ────────────────────────────────────
+def run_worker(backend: str, texts_path: str, out_path: str):
+    with open(texts_path, encoding="utf-8") as f:
+        texts = json.load(f)
+    t0    = time.perf_counter()
+    from embeddings import load_embedding_model
+    model = load_embedding_model(backend)
+    load_s = time.perf_counter() - t0
+
+    model.encode(texts[:BATCH_SIZE], batch_size=BATCH_SIZE, show_progress_bar=False)   # warm-up
+    t0 = time.perf_counter()
+    E  = np.asarray(model.encode(texts, batch_size=BATCH_SIZE, show_progress_bar=False), dtype=np.float32)
+    encode_s = time.perf_counter() - t0
+
+    np.save(out_path, E)
+    print(json.dumps({"load_s": load_s, "texts_per_s": len(texts) / encode_s,
+                      "peak_rss_mb": peak_rss_mb()}))
+
+
+def bench_backend(backend: str, texts_path: str, workdir: str) -> tuple:
+    out_path = os.path.join(workdir, f"{backend}.npy")
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", backend,
+                           "--texts-file", texts_path, "--out-npy", out_path],
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        return None, None
+    stats = json.loads(proc.stdout.strip().splitlines()[-1])
+    return stats, np.load(out_path)
+
+
+# ── PARITY ────────────────────────────────────────────────────────────────────
+def _unit(X):
+    n = np.linalg.norm(X, axis=1, keepdims=True)
+    n[n == 0] = 1.0
+    return X / n
+
+
+def _top_k(Q, C, k: int) -> np.ndarray:
+    S   = Q @ C.T
+    idx = np.argpartition(-S, min(k, S.shape[1] - 1), axis=1)[:, :k]
+    return np.take_along_axis(idx, np.argsort(-np.take_along_axis(S, idx, 1), axis=1), 1)
+
+
+def parity(ref, E, n_corpus: int, top_k: int) -> dict:
+    ref, E = _unit(ref), _unit(E)
+    top_k  = min(top_k, n_corpus)
+    cos    = np.einsum("ij,ij->i", ref, E)
+    t_ref  = _top_k(ref[n_corpus:], ref[:n_corpus], top_k)
+    t_new  = _top_k(E[n_corpus:],   E[:n_corpus],   top_k)
+    overlap = np.mean([len(set(a) & set(b)) / top_k for a, b in zip(t_ref, t_new)])
+    return {"mean_cos": float(cos.mean()), "min_cos": float(cos.min()),
+            "overlap_at_k": float(overlap), "top1_agree": float(np.mean(t_ref[:, 0] == t_new[:, 0]))}
+
+
+# ── REPORT ────────────────────────────────────────────────────────────────────
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark embedding backends against torch")
+    ap.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS), choices=EMBEDDING_BACKENDS)
+    ap.add_argument("--texts",    type=int, default=DEFAULT_TEXTS)
+    ap.add_argument("--queries",  type=int, default=DEFAULT_QUERIES)
+    ap.add_argument("--top-k",    type=int, default=DEFAULT_TOP_K)
+    ap.add_argument("--out",      help="output JSON (default data/benchmarks/embeddings_<commit>.json)")
+    ap.add_argument("--worker",   help=argparse.SUPPRESS)
+    ap.add_argument("--texts-file", help=argparse.SUPPRESS)
+    ap.add_argument("--out-npy",    help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.worker:
+        return run_worker(args.worker, args.texts_file, args.out_npy)
+
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]   # torch is the reference
+    corpus   = load_texts(args.texts)
+    queries  = make_queries(corpus, args.queries)
+    print(f"  {EMBEDDING_MODEL}: {len(corpus)} texts, {len(queries)} queries, top-{args.top_k}")
+
+    report = {
+        "commit":     _git_commit(),
+        "created_at": datetime.now().isoformat(),
+        "params":     {"texts": len(corpus), "queries": len(queries), "top_k": args.top_k,
+                       "batch_size": BATCH_SIZE, "min_mean_cos": MIN_MEAN_COSINE,
+                       "min_overlap_at_k": MIN_OVERLAP_AT_K},
+        "results":    [],
+    }
+    failed = False
+    with tempfile.TemporaryDirectory() as workdir:
+        texts_path = os.path.join(workdir, "texts.json")
+        with open(texts_path, "w", encoding="utf-8") as f:
+            json.dump(corpus + queries, f)
+
+        ref = None
+        print(f"\n  {'backend':<10} {'load s':>7} {'texts/s':>9} {'RSS MB':>7} "
+              f"{'mean cos':>9} {'min cos':>8} {'overlap':>8} {'top1':>6}")
+        for backend in backends:
+            stats, E = bench_backend(backend, texts_path, workdir)
+            if stats is None:
+                print(f"  ❌ {backend}: worker failed")
+                if backend == "torch":
+                    return 1   # no reference → nothing to compare against
+                failed = True
+                continue
+            if ref is None:
+                ref = E
+            p  = parity(ref, E, len(corpus), args.top_k)
+            ok = p["mean_cos"] >= MIN_MEAN_COSINE and p["overlap_at_k"] >= MIN_OVERLAP_AT_K
+            failed |= not ok
+            rss = f"{stats['peak_rss_mb']:7.0f}" if stats["peak_rss_mb"] is not None else "      —"
+            print(f"  {backend:<10} {stats['load_s']:7.2f} {stats['texts_per_s']:9.1f} {rss} "
+                  f"{p['mean_cos']:9.4f} {p['min_cos']:8.4f} {p['overlap_at_k']:8.3f} "
+                  f"{p['top1_agree']:6.2f}  {'✅' if ok else '❌'}")
+            report["results"].append({"backend": backend, **stats, **p, "parity_ok": ok})
+
+    out = args.out or os.path.join(OUT_DIR, f"embeddings_{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n  ✅ Results → {out}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+bench_extraction.py — PDF text-extraction engine speed / similarity check
+==========================================================================
+Extracts the same PDFs with every PDF_ENGINE (see pdf_extract.py) and
+compares each page against pdfplumber, the reference engine:
+
+  pdfplumber  reference — layout-aware, slow
+  pdfium      pypdfium2 — fast, reading order from the content stream
+  pymupdf     PyMuPDF — fast (skipped if not installed)
+  auto        pdfium, with pdfplumber for pages that look like tables
+
+Reported per engine:
+  pages_per_s      single-process extraction throughput (no page cache)
+  mean_sim/min_sim token-level similarity to pdfplumber, all pages
+  table_sim        the same over pages pdfplumber's text marks as tabular —
+                   the financial statements the section parser reads numbers from
+  routed           pages auto handed to pdfplumber
+
+Similarity is difflib's ratio over whitespace-split tokens, so line-wrapping
+differences don't count, but reordered or merged table cells do.
+
+Run:  python bench_extraction.py                       # up to 5 PDFs from data/drhp_pdfs
+      python bench_extraction.py a.pdf b.pdf --pages 100 --engines pdfium auto
+"""
+
+import os, sys, json, time, argparse, difflib, importlib.util
+from datetime import datetime
+from pdf_extract import ENGINES, looks_tabular, page_count, _extract_range, resolve_engine
+from bench_embeddings import _git_commit
+
+OUT_DIR       = os.path.join(os.path.dirname(__file__), "data", "benchmarks")
+PDF_DIR       = os.path.join(os.path.dirname(__file__), "data", "drhp_pdfs")
+DEFAULT_PDFS  = 5
+DEFAULT_PAGES = 60    # first N pages of each PDF (0 = all)
+
+
+def similarity(a: str, b: str) -> float:
+    ta, tb = a.split(), b.split()
+    if not ta and not tb:
+        return 1.0
+    return difflib.SequenceMatcher(None, ta, tb, autojunk=False).ratio()
+
+
+def extract(pdf_path: str, pages: int, engine: str) -> tuple:
+    """(seconds, [text, ...]) for the first `pages` pages, serially."""
+    end = min(pages or 10**9, page_count(pdf_path))
+    t0  = time.perf_counter()
+    out = _extract_range((pdf_path, 0, end, {}, engine))
+    return time.perf_counter() - t0, [t for _, t in out]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark PDF extraction engines against pdfplumber")
+    ap.add_argument("pdfs",      nargs="*", help=f"PDFs to extract (default: first {DEFAULT_PDFS} in data/drhp_pdfs)")
+    ap.add_argument("--engines", nargs="+", default=list(ENGINES), choices=ENGINES)
+    ap.add_argument("--pages",   type=int, default=DEFAULT_PAGES, help="pages per PDF, 0 = all")
+    ap.add_argument("--out",     help="output JSON (default data/benchmarks/extraction_<commit>.json)")
+    args = ap.parse_args()
+
+    pdfs = args.pdfs or ([os.path.join(PDF_DIR, f) for f in sorted(os.listdir(PDF_DIR))
+                          if f.endswith(".pdf")][:DEFAULT_PDFS] if os.path.isdir(PDF_DIR) else [])
+    if not pdfs:
+        print(f"❌ No PDFs given and none in {PDF_DIR}"); return 1
+
+    engines = ["pdfplumber"] + [e for e in args.engines if e != "pdfplumber"]   # reference first
+    if "pymupdf" in engines and importlib.util.find_spec("fitz") is None:
+        print("  ⚠ PyMuPDF not installed — skipping pymupdf")
+        engines.remove("pymupdf")
+    if resolve_engine("pdfium") == "pdfplumber":
+        print("  ⚠ pypdfium2 not installed — only pdfplumber can run")
+        engines = ["pdfplumber"]
+
+    seconds, texts = {e: 0.0 for e in engines}, {e: [] for e in engines}
+    for path in pdfs:
+        print(f"  ▶ {os.path.basename(path)}")
+        for engine in engines:
+            s, pages = extract(path, args.pages, engine)
+            seconds[engine] += s
+            texts[engine]   += pages
+    ref    = texts["pdfplumber"]
+    tables = [i for i, t in enumerate(ref) if looks_tabular(t)]
+    print(f"  {len(pdfs)} PDF(s), {len(ref)} pages, {len(tables)} tabular (by pdfplumber text)")
+
+    report = {
+        "commit":     _git_commit(),
+        "created_at": datetime.now().isoformat(),
+        "params":     {"pdfs": [os.path.basename(p) for p in pdfs], "pages_per_pdf": args.pages,
+                       "pages": len(ref), "tabular_pages": len(tables)},
+        "results":    [],
+    }
+    print(f"\n  {'engine':<11} {'seconds':>8} {'pages/s':>8} {'speedup':>8} "
+          f"{'mean sim':>9} {'min sim':>8} {'table sim':>10} {'routed':>7}")
+    for engine in engines:
+        sims   = [similarity(r, t) for r, t in zip(ref, texts[engine])]
+        tsim   = [sims[i] for i in tables]
+        routed = (sum(1 for t in texts["pdfium"] if looks_tabular(t))
+                  if engine == "auto" and "pdfium" in texts else None)
+        row = {
+            "engine":      engine,
+            "seconds":     round(seconds[engine], 3),
+            "pages_per_s": round(len(ref) / seconds[engine], 1) if seconds[engine] else None,
+            "speedup":     round(seconds["pdfplumber"] / seconds[engine], 1) if seconds[engine] else None,
+            "mean_sim":    round(sum(sims) / len(sims), 4) if sims else None,
+            "min_sim":     round(min(sims), 4) if sims else None,
+            "table_sim":   round(sum(tsim) / len(tsim), 4) if tsim else None,
+            "routed":      routed,
+        }
+        report["results"].append(row)
+        fmt = lambda v, w, p: f"{v:{w}.{p}f}" if v is not None else f"{'—':>{w}}"
+        print(f"  {engine:<11} {fmt(row['seconds'], 8, 2)} {fmt(row['pages_per_s'], 8, 1)} "
+              f"{fmt(row['speedup'], 7, 1)}x {fmt(row['mean_sim'], 9, 4)} {fmt(row['min_sim'], 8, 4)} "
+              f"{fmt(row['table_sim'], 10, 4)} {routed if routed is not None else '—':>7}")
+
+    out = args.out or os.path.join(OUT_DIR, f"extraction_{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n  ✅ Results → {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
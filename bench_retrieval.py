@@ -0,0 +1,298 @@
+"""
+bench_retrieval.py — Retrieval latency / memory / recall benchmark
+===================================================================
+Builds synthetic DRHP-shaped chunk corpora (~250 chunks per IPO) in a temp
+drhp.db + ANN index and runs every backend behind rag_retriever._query.
+The vectors are built to be as hard on the IVF index as real MiniLM
+embeddings:
+  - a direction shared by every chunk (sentence embeddings are anisotropic);
+  - a few broad themes, each holding many fine topics of Zipf-distributed
+    size, so cluster edges blur and lists are uneven;
+  - a per-IPO shift (company name, boilerplate) across topics.
+Top-10 cosines land around 0.4–0.5. Chunk noise and query noise are wide
+enough that true neighbours straddle inverted lists.
+
+  sqlite    — per-IPO matrix cache, brute force
+  local     — on-disk IVF index (ann_index.py), per-IPO exact slice
+  pinecone  — in-process stub with the Pinecone client's response shape
+              (measures our client-side overhead, not network latency;
+              add --pinecone-rtt-ms to simulate a round trip)
+  global    — unfiltered IVF search across all IPOs (search_all_ipos path)
+
+Reported per (corpus size, backend):
+  cold_p50_ms      first pass, caches empty
+  p50_ms / p99_ms  warm pass
+  mem_peak_mb      tracemalloc peak over a cold pass
+  recall_at_k      overlap with exact brute force top-k — sqlite, local
+                   and pinecone search one IPO exactly, so anything below
+                   1.0 there is a bug; global is the approximate (IVF) figure
+
+Results are written to data/benchmarks/retrieval_<commit>.json so runs can
+be diffed between commits:
+
+Run:  python bench_retrieval.py                      # 1k, 10k, 100k
+      python bench_retrieval.py --sizes 1000 10000 --queries 100
+      python bench_retrieval.py --compare data/benchmarks/retrieval_abc1234.json
+"""
+
+import os, sys, json, time, shutil, sqlite3, argparse, tempfile, tracemalloc, subprocess
+import numpy as np
+from datetime import datetime
+from types import SimpleNamespace
+
+import rag_retriever
+import ann_index
+from embeddings import EMBEDDING_DIM, pack_embedding
+from ann_index import build_ann_index, search as ann_search
+from rag_indexer import init_chunks_table
+
+OUT_DIR          = os.path.join(os.path.dirname(__file__), "data", "benchmarks")
+DEFAULT_SIZES    = [1_000, 10_000, 100_000]
+CHUNKS_PER_IPO   = 250
+THEMES           = 8      # broad directions the topics are drawn around
+TOPICS           = 512    # fine topics; chunks per topic follow Zipf(TOPIC_ZIPF)
+TOPIC_ZIPF       = 1.0
+TOPIC_SPREAD     = 1.2    # noise norm of a topic around its theme
+SHARED_WEIGHT    = 1.6    # weight of the direction common to every chunk
+IPO_SHIFT        = 0.5    # norm of the per-IPO direction
+CHUNK_NOISE      = 1.5    # noise norm of a chunk around its topic
+QUERY_NOISE      = 1.0    # noise norm around the source chunk of a query
+DEFAULT_QUERIES  = 200
+DEFAULT_TOP_K    = 10
+BACKENDS         = ["sqlite", "local", "pinecone", "global"]
+
+
+# ── SYNTHETIC CORPUS ──────────────────────────────────────────────────────────
+def _unit(X):
+    n = np.linalg.norm(X, axis=-1, keepdims=True)
+    n[n == 0] = 1.0
+    return (X / n).astype(np.float32)
+
+
+def _noise(rng, rows: int, norm: float):
+    return norm / np.sqrt(EMBEDDING_DIM) * rng.standard_normal((rows, EMBEDDING_DIM))
+
+
+def make_corpus(n: int, seed: int = 0) -> dict:
+    """Shared direction + themed Zipf topics + per-IPO shift + noise, as unit vectors."""
+    rng     = np.random.default_rng(seed)
+    shared  = _unit(rng.standard_normal(EMBEDDING_DIM))
+    themes  = _unit(rng.standard_normal((THEMES, EMBEDDING_DIM)))
+    topics  = _unit(themes[rng.integers(0, THEMES, TOPICS)] + _noise(rng, TOPICS, TOPIC_SPREAD))
+    weights = 1.0 / np.arange(1, TOPICS + 1) ** TOPIC_ZIPF
+    topic   = rng.choice(TOPICS, n, p=weights / weights.sum())
+    n_ipos  = -(-n // CHUNKS_PER_IPO)
+    ipo_dir = _noise(rng, n_ipos, IPO_SHIFT)
+    X       = _unit(SHARED_WEIGHT * shared + topics[topic] + ipo_dir[np.arange(n) // CHUNKS_PER_IPO]
+                    + _noise(rng, n, CHUNK_NOISE))
+    ipo_ids = [f"bench_{i // CHUNKS_PER_IPO:05d}" for i in range(n)]
+    return {"vectors": X, "ipo_ids": ipo_ids, "chunk_ids": [f"{ipo_ids[i]}_{i:07d}" for i in range(n)]}
+
+
+def write_db(corpus: dict, db_path: str):
+    conn = sqlite3.connect(db_path)
+    init_chunks_table(conn)
+    now  = datetime.now().isoformat()
+    rows = ((cid, ipo, ipo.upper(), 1 + (i % CHUNKS_PER_IPO) // 4, i % CHUNKS_PER_IPO,
+             f"synthetic chunk {i}", 4, pack_embedding(v), now)
+            for i, (cid, ipo, v) in enumerate(zip(corpus["chunk_ids"], corpus["ipo_ids"], corpus["vectors"])))
+    conn.executemany("""
+        INSERT INTO chunks (chunk_id, ipo_id, company, page_number, chunk_index,
+                            text, token_count, embedding, indexed_at)
+        VALUES (?,?,?,?,?,?,?,?,?)
+    """, rows)
+    conn.commit()
+    return conn
+
+
+def make_queries(corpus: dict, count: int, seed: int = 1):
+    """Noisy copies of random chunks, each scoped to that chunk's IPO."""
+    rng  = np.random.default_rng(seed)
+    idx  = rng.choice(len(corpus["vectors"]), count, replace=False)
+    Q    = _unit(corpus["vectors"][idx] + _noise(rng, count, QUERY_NOISE))
+    return Q, [corpus["ipo_ids"][i] for i in idx]
+
+
+def exact_top_k(corpus: dict, Q, ipo_ids, top_k: int) -> list:
+    """Brute-force ground truth; ipo_ids=None → across the whole corpus."""
+    X, ids, all_ipos = corpus["vectors"], corpus["chunk_ids"], np.array(corpus["ipo_ids"])
+    truth = []
+    for qi, q in enumerate(Q):
+        rows   = np.arange(len(X)) if ipo_ids is None else np.flatnonzero(all_ipos == ipo_ids[qi])
+        scores = X[rows] @ q
+        keep   = rows[scores >= rag_retriever.MIN_SIMILARITY]
+        scores = scores[scores >= rag_retriever.MIN_SIMILARITY]
+        truth.append({ids[r] for r in keep[np.argsort(-scores, kind="stable")[:top_k]]})
+    return truth
+
+
+# ── PINECONE STUB ─────────────────────────────────────────────────────────────
+class PineconeStub:
+    """Exact in-memory search returning Pinecone's query() response shape."""
+
+    def __init__(self, corpus: dict, rtt_ms: float = 0.0):
+        self.X      = corpus["vectors"]
+        self.ids    = corpus["chunk_ids"]
+        self.ipos   = np.array(corpus["ipo_ids"])
+        self.rtt    = rtt_ms / 1000
+        self.ranges = {}
+        for i, ipo in enumerate(corpus["ipo_ids"]):
+            start, _ = self.ranges.get(ipo, (i, i))
+            self.ranges[ipo] = (start, i + 1)
+
+    def query(self, vector, top_k, filter=None, include_metadata=True):
+        if self.rtt: time.sleep(self.rtt)
+        start, end = (0, len(self.X))
+        if filter:
+            start, end = self.ranges.get(filter["ipo_id"]["$eq"], (0, 0))
+        scores = self.X[start:end] @ np.asarray(vector, dtype=np.float32)
+        order  = np.argsort(-scores)[:top_k]
+        return SimpleNamespace(matches=[
+            SimpleNamespace(id=self.ids[start + i], score=float(scores[i]), metadata={
+                "ipo_id": self.ipos[start + i], "company": self.ipos[start + i].upper(),
+                "page_number": 1, "text": f"synthetic chunk {start + i}",
+            }) for i in order
+        ])
+
+
+# ── RUNNER ────────────────────────────────────────────────────────────────────
+def _use_backend(backend: str, stub):
+    rag_retriever.RAG_BACKEND       = "local" if backend == "global" else backend
+    rag_retriever._pinecone_index   = stub if backend == "pinecone" else None
+    rag_retriever._pinecone_checked = True
+
+
+def _reset_caches():
+    rag_retriever._matrix_cache.clear()
+    ann_index._loaded.clear()
+
+
+def _run_pass(backend: str, Q, ipo_ids, top_k: int):
+    times, results = [], []
+    for q, ipo_id in zip(Q, ipo_ids):
+        t0 = time.perf_counter()
+        if backend == "global":
+            index = rag_retriever.get_local_index()
+            hits  = ann_search(index, q, top_k)[0]
+            ids  = {index["chunk_ids"][r] for r, s in hits if s >= rag_retriever.MIN_SIMILARITY}
+        else:
+            ids = {c["chunk_id"] for c in rag_retriever._query(ipo_id, q.tolist(), top_k)}
+        times.append((time.perf_counter() - t0) * 1000)
+        results.append(ids)
+    return np.array(times), results
+
+
+def _recall(results: list, truth: list) -> float:
+    per_query = [len(r & t) / len(t) for r, t in zip(results, truth) if t]
+    return float(np.mean(per_query)) if per_query else 1.0
+
+
+def bench_size(n: int, backends: list, queries: int, top_k: int, rtt_ms: float) -> list:
+    print(f"\n  ── {n:,} chunks ──")
+    corpus = make_corpus(n)
+    work   = tempfile.mkdtemp(prefix="bench_rag_")
+    db     = os.path.join(work, "drhp.db")
+    saved  = (rag_retriever.DB_PATH, rag_retriever.ANN_DIR, rag_retriever.RAG_BACKEND,
+              rag_retriever._pinecone_index, rag_retriever._pinecone_checked)
+    try:
+        t0   = time.time()
+        conn = write_db(corpus, db)
+        build_ann_index(conn, os.path.join(work, "ann_index"))
+        conn.close()
+        print(f"  corpus ready in {time.time() - t0:.1f}s")
+        rag_retriever.DB_PATH = db
+        rag_retriever.ANN_DIR = os.path.join(work, "ann_index")
+
+        Q, ipo_ids = make_queries(corpus, min(queries, n))
+        truth      = {"scoped": exact_top_k(corpus, Q, ipo_ids, top_k),
+                      "global": exact_top_k(corpus, Q, None, top_k)}
+        stub       = PineconeStub(corpus, rtt_ms)
+        rows       = []
+        for backend in backends:
+            _use_backend(backend, stub)
+            _reset_caches()
+            tracemalloc.start()
+            _run_pass(backend, Q, ipo_ids, top_k)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            _reset_caches()
+            cold, _     = _run_pass(backend, Q, ipo_ids, top_k)
+            warm, found = _run_pass(backend, Q, ipo_ids, top_k)
+            row = {
+                "size":         n,
+                "backend":      backend,
+                "queries":      len(Q),
+                "top_k":        top_k,
+                "cold_p50_ms":  round(float(np.percentile(cold, 50)), 3),
+                "p50_ms":       round(float(np.percentile(warm, 50)), 3),
+                "p99_ms":       round(float(np.percentile(warm, 99)), 3),
+                "mem_peak_mb":  round(peak / 1e6, 2),
+                "recall_at_k":  round(_recall(found, truth["global" if backend == "global" else "scoped"]), 4),
+            }
+            rows.append(row)
+            print(f"  {backend:<9} p50 {row['p50_ms']:>8.3f} ms  p99 {row['p99_ms']:>8.3f} ms  "
+                  f"cold {row['cold_p50_ms']:>8.3f} ms  mem {row['mem_peak_mb']:>7.2f} MB  "
+                  f"recall@{top_k} {row['recall_at_k']:.3f}")
+        return rows
+    finally:
+        (rag_retriever.DB_PATH, rag_retriever.ANN_DIR, rag_retriever.RAG_BACKEND,
+         rag_retriever._pinecone_index, rag_retriever._pinecone_checked) = saved
+        _reset_caches()
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def compare(old_path: str, new: dict):
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    before = {(r["size"], r["backend"]): r for r in old["results"]}
+    print(f"\n  Δ vs {old.get('commit', '?')} (negative latency = faster)")
+    for r in new["results"]:
+        b = before.get((r["size"], r["backend"]))
+        if not b: continue
+        print(f"  {r['size']:>7,} {r['backend']:<9} "
+              f"p50 {r['p50_ms'] - b['p50_ms']:+8.3f} ms  p99 {r['p99_ms'] - b['p99_ms']:+8.3f} ms  "
+              f"mem {r['mem_peak_mb'] - b['mem_peak_mb']:+7.2f} MB  "
+              f"recall {r['recall_at_k'] - b['recall_at_k']:+.3f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark rag_retriever backends")
+    ap.add_argument("--sizes",    type=int, nargs="+", default=DEFAULT_SIZES)
+    ap.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    ap.add_argument("--queries",  type=int, default=DEFAULT_QUERIES)
+    ap.add_argument("--top-k",    type=int, default=DEFAULT_TOP_K)
+    ap.add_argument("--pinecone-rtt-ms", type=float, default=0.0)
+    ap.add_argument("--out",      help="output JSON (default data/benchmarks/retrieval_<commit>.json)")
+    ap.add_argument("--compare",  help="previous results JSON to diff against")
+    args = ap.parse_args()
+
+    report = {
+        "commit":     _git_commit(),
+        "created_at": datetime.now().isoformat(),
+        "params":     {"queries": args.queries, "top_k": args.top_k,
+                       "chunks_per_ipo": CHUNKS_PER_IPO, "pinecone_rtt_ms": args.pinecone_rtt_ms},
+        "results":    [],
+    }
+    for n in args.sizes:
+        report["results"] += bench_size(n, args.backends, args.queries, args.top_k, args.pinecone_rtt_ms)
+
+    out = args.out or os.path.join(OUT_DIR, f"retrieval_{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n  ✅ Results → {out}")
+    if args.compare:
+        compare(args.compare, report)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+bench_sections.py — Section-header scanner micro-benchmark
+==========================================================
+Times drhp_scraper.scan_headers (one compiled alternation per line, then
+per-pattern confirmation) against the previous scan, which ran every
+SECTION_PATTERNS regex uncompiled against every line. It also checks
+that both find exactly the same (line, section) candidates.
+
+Text is real DRHP page text:
+  1. the page-text cache in data/drhp.db (pdf_pages), else
+  2. the PDFs given on the command line or found in data/drhp_pdfs,
+     extracted with pdf_extract.
+
+Run:  python bench_sections.py
+      python bench_sections.py a.pdf b.pdf --repeat 5
+"""
+
+import os, re, sys, json, time, zlib, sqlite3, argparse
+from datetime import datetime
+from pathlib import Path
+from drhp_scraper import SECTION_PATTERNS, scan_headers, choose_section_starts
+from bench_embeddings import _git_commit
+
+OUT_DIR        = os.path.join(os.path.dirname(__file__), "data", "benchmarks")
+DB_PATH        = os.path.join(os.path.dirname(__file__), "data", "drhp.db")
+PDF_DIR        = os.path.join(os.path.dirname(__file__), "data", "drhp_pdfs")
+DEFAULT_DOCS   = 5
+DEFAULT_REPEAT = 3
+
+
+# ── TEXTS ─────────────────────────────────────────────────────────────────────
+def cached_documents(limit: int) -> list:
+    """[(label, [(page_number, text)])] from the drhp.db page cache."""
+    if not os.path.exists(DB_PATH):
+        return []
+    try:
+        conn = sqlite3.connect(Path(DB_PATH).resolve().as_uri() + "?mode=ro", uri=True)
+        docs = [r[0] for r in conn.execute(
+            "SELECT pdf_sha256 FROM pdf_docs ORDER BY page_count DESC LIMIT ?", (limit,))]
+        out  = []
+        for digest in docs:
+            rows = conn.execute("SELECT page_number, text FROM pdf_pages WHERE pdf_sha256 = ? "
+                                "ORDER BY page_number", (digest,)).fetchall()
+            out.append((digest[:12], [(n, zlib.decompress(b).decode("utf-8")) for n, b in rows]))
+        conn.close()
+        return out
+    except sqlite3.Error:
+        return []
+
+
+def pdf_documents(paths: list) -> list:
+    from pdf_extract import extract_page_texts
+    return [(os.path.basename(p), extract_page_texts(p)) for p in paths]
+
+
+# ── SCANNERS ──────────────────────────────────────────────────────────────────
+def scan_reference(pages) -> list:
+    """The previous scan: every pattern, uncompiled, on every line."""
+    found, i = [], 0
+    for _, text in pages:
+        if not text:
+            continue
+        for line in text.split("\n"):
+            ls = line.strip()
+            if len(ls) >= 5:
+                for key, patterns in SECTION_PATTERNS:
+                    for pat in patterns:
+                        if re.search(pat, ls, re.IGNORECASE):
+                            found.append((i, key))
+                            break
+            i += 1
+    return found
+
+
+def best_of(fn, arg, repeat: int) -> tuple:
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(arg)
+        took = time.perf_counter() - t0
+        best = took if best is None else min(best, took)
+    return best, result
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the section-header scanner")
+    ap.add_argument("pdfs",     nargs="*", help="PDFs to scan (default: drhp.db page cache, then data/drhp_pdfs)")
+    ap.add_argument("--docs",   type=int, default=DEFAULT_DOCS)
+    ap.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    ap.add_argument("--out",    help="output JSON (default data/benchmarks/sections_<commit>.json)")
+    args = ap.parse_args()
+
+    docs = pdf_documents(args.pdfs) if args.pdfs else cached_documents(args.docs)
+    if not docs and os.path.isdir(PDF_DIR):
+        docs = pdf_documents([os.path.join(PDF_DIR, f) for f in sorted(os.listdir(PDF_DIR))
+                              if f.endswith(".pdf")][:args.docs])
+    if not docs:
+        print(f"❌ No DRHP text — no page cache in {DB_PATH} and no PDFs in {PDF_DIR}"); return 1
+
+    report = {"commit": _git_commit(), "created_at": datetime.now().isoformat(),
+              "params": {"repeat": args.repeat, "patterns": sum(len(p) for _, p in SECTION_PATTERNS)},
+              "results": []}
+    print(f"\n  {'document':<16}{'pages':>6}{'lines':>8}{'old ms':>9}{'new ms':>9}{'speedup':>9}"
+          f"{'cands':>7}  parity")
+    mismatched = 0
+    for label, pages in docs:
+        lines      = sum(len(t.split("\n")) for _, t in pages if t)
+        old_s, old = best_of(scan_reference, pages, args.repeat)
+        new_s, new = best_of(scan_headers, pages, args.repeat)
+        same       = set(old) == {(c[0], c[2]) for c in new}
+        mismatched += not same
+        chosen     = choose_section_starts(new)
+        print(f"  {label[:15]:<16}{len(pages):>6}{lines:>8}{old_s * 1000:9.1f}{new_s * 1000:9.1f}"
+              f"{old_s / new_s if new_s else 0:8.1f}x{len(new):>7}  {'✅' if same else '❌'}")
+        report["results"].append({
+            "document": label, "pages": len(pages), "lines": lines,
+            "old_ms": round(old_s * 1000, 2), "new_ms": round(new_s * 1000, 2),
+            "lines_per_s": round(lines / new_s) if new_s else None,
+            "candidates": len(new), "parity": same,
+            "chosen": {k: {"line": c[0], "page": c[1], "text": c[4][:80]} for k, c in chosen.items()},
+        })
+
+    out = args.out or os.path.join(OUT_DIR, f"sections_{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n  ✅ Results → {out}")
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
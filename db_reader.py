@@ -1,8 +1,10 @@
 """
 db_reader.py — Read DRHP sections + enriched IPO data from SQLite.
 Option A: smart section-based context for AI (question routing).
+Connections come from the shared read pool in drhp_db — never close them.
 """
-import sqlite3, json, os
+import json, os
+from drhp_db import get_read_connection
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "data", "drhp.db")
 
@@ -37,8 +39,8 @@ QUESTION_ROUTING = {
 
 
 def get_connection():
-    if not os.path.exists(DB_PATH): return None
-    return sqlite3.connect(DB_PATH)
+    """Pooled per-thread read-only connection (None if the DB doesn't exist)."""
+    return get_read_connection(DB_PATH)
 
 
 def route_question(user_question: str) -> list[str]:
@@ -131,8 +133,6 @@ def get_drhp_context(ipo_id: str, user_question: str = "") -> str:
     except Exception as e:
         print(f"DB read error: {e}")
         return ""
-    finally:
-        conn.close()
 
 
 def enrich_ipo_with_drhp(ipo: dict) -> dict:
@@ -172,8 +172,6 @@ def enrich_ipo_with_drhp(ipo: dict) -> dict:
             if drow[6]: enriched["data_quality"] = drow[6]
     except Exception as e:
         print(f"DB enrich error for {ipo.get('company')}: {e}")
-    finally:
-        conn.close()
     return enriched
 
 
@@ -200,5 +198,3 @@ def get_db_stats() -> dict:
         }
     except:
         return {"ipos_with_drhp": 0, "ipos_with_financials": 0, "total_pdf_size_mb": 0}
-    finally:
-        conn.close()
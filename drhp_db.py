@@ -0,0 +1,103 @@
+"""
+drhp_db.py — Shared connection layer for data/drhp.db
+======================================================
+Readers (rag_retriever, db_reader) and writers (rag_indexer, drhp_scraper)
+used to open a fresh sqlite3 connection per call — several per page render.
+
+Readers
+  get_read_connection() → one persistent read-only connection per thread.
+  - mode=ro + query_only: a reader can never take a write lock
+  - mmap_size / cache_size pragmas: hot pages are served from memory
+  - sqlite3 statement cache (cached_statements): each SQL string is
+    prepared once per connection and reused on every later call
+  - reopened automatically if drhp.db is replaced on disk (git pull, copy)
+  Never close a read connection — it belongs to the pool.
+
+Writer
+  get_write_connection() → the single process-wide writer, WAL journaling.
+  In WAL mode readers keep reading the last committed snapshot while the
+  scheduled run_indexer / drhp_scraper writes, so page renders never block.
+"""
+
+import os, sqlite3, threading
+from pathlib import Path
+
+DB_PATH = os.path.join(os.path.dirname(__file__), "data", "drhp.db")
+
+MMAP_SIZE         = 256 * 1024 * 1024   # bytes of the DB file mapped into memory
+CACHE_SIZE_KB     = 64 * 1024           # page cache per connection (negative pragma = KiB)
+CACHED_STATEMENTS = 256                 # prepared statements kept per connection
+BUSY_TIMEOUT_MS   = 30_000
+
+_local        = threading.local()
+_writer       = {}                      # db_path → connection
+_writer_lock  = threading.Lock()
+
+
+def _file_identity(db_path: str):
+    st = os.stat(db_path)
+    return (st.st_dev, st.st_ino)
+
+
+def _apply_read_pragmas(conn):
+    conn.execute("PRAGMA query_only = ON")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+
+
+def get_read_connection(db_path: str = DB_PATH):
+    """Per-thread persistent read-only connection, or None if the DB doesn't exist."""
+    try:
+        identity = _file_identity(db_path)
+    except OSError:
+        return None
+    pool  = _local.__dict__.setdefault("conns", {})
+    entry = pool.get(db_path)
+    if entry and entry[0] == identity:
+        return entry[1]
+    if entry:
+        try: entry[1].close()
+        except Exception: pass
+    try:
+        uri  = Path(db_path).resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, cached_statements=CACHED_STATEMENTS,
+                               timeout=BUSY_TIMEOUT_MS / 1000)
+        _apply_read_pragmas(conn)
+    except sqlite3.Error as e:
+        print(f"  DB read connection failed: {e}")
+        return None
+    pool[db_path] = (identity, conn)
+    return conn
+
+
+def get_write_connection(db_path: str = DB_PATH):
+    """The single writer connection for this process (WAL mode, created on first use)."""
+    with _writer_lock:
+        conn = _writer.get(db_path)
+        if conn is not None:
+            return conn
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        conn = sqlite3.connect(db_path, cached_statements=CACHED_STATEMENTS,
+                               timeout=BUSY_TIMEOUT_MS / 1000)
+        conn.execute("PRAGMA journal_mode = WAL")      # persistent — readers inherit it
+        conn.execute("PRAGMA synchronous = NORMAL")    # safe in WAL, far fewer fsyncs
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+        _writer[db_path] = conn
+        return conn
+
+
+def close_write_connection(db_path: str = DB_PATH):
+    """Checkpoint the WAL into the main file and release the writer."""
+    with _writer_lock:
+        conn = _writer.pop(db_path, None)
+    if conn is None:
+        return
+    try:
+        conn.commit()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    except sqlite3.Error:
+        pass
+    conn.close()
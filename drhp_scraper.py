@@ -3,20 +3,42 @@ drhp_scraper.py — DRHP PDF Pipeline (Option A: Section-Based Extraction)
 =========================================================================
 For each IPO:
   1. Scrapes ipowatch.in detail page -> finds DRHP/RHP PDF URL
-  2. Downloads the full PDF (all pages, no page limit)
-  3. Scans ALL pages for SEBI-standard section headers
+  2. Downloads the full PDF (all pages, no page limit) — streamed, resumable,
+     several at once (pdf_download.py)
+  3. Finds each section's pages from the PDF bookmarks or printed table of
+     contents (pdf_toc.py) and extracts only those; scans ALL pages for
+     SEBI-standard section headers when there is no usable TOC
   4. Extracts each section into its own DB column:
        risk_factors / objects / financials / promoters / litigation / overview
   5. Stores in SQLite: data/drhp.db
 
-Run: python drhp_scraper.py
+Each IPO moves through these steps as tasks in a persistent queue
+(job_queue.py, drhp.db → jobs): failed steps are retried with backoff, and
+a run that is killed picks up where it stopped the next time it starts.
+Several PDFs download and extract at once.
+
+Detail pages and PDFs are re-fetched conditionally (http_cache.py). An
+unchanged detail page reuses the previous run's parse, and an unchanged PDF
+is not downloaded again.
+
+Run:    python drhp_scraper.py [--workers N]   # N extract processes (DRHP_WORKERS, default ≤4)
+Status: python job_queue.py
 """
 
-import os, re, json, time, sqlite3, requests
-import pdfplumber
-from io import BytesIO
+import os, re, json, time, socket, requests, multiprocessing
 from datetime import datetime
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from drhp_db import get_write_connection, get_read_connection, close_write_connection
+from pdf_extract import (EXTRACTOR, get_page_texts, load_cached_pages, store_page_texts, file_sha256,
+                         page_count)
+from pdf_toc import toc_entries, page_reader
+from pdf_download import fetch_pdf, DOWNLOAD_WORKERS, HOST_CONNECTIONS
+import http_cache
+from index_telemetry import StageTimer, init_runs_table, new_run_id, record_ipo_run
+from job_queue import (LEASE_S, init_jobs_table, start_chain, reap_expired, claim, heartbeat,
+                       release, complete, fail, backoff_s, next_wakeup, last_payload)
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -26,6 +48,10 @@ HEADERS = {
 DB_PATH = os.path.join(os.path.dirname(__file__), "data", "drhp.db")
 PDF_DIR = os.path.join(os.path.dirname(__file__), "data", "drhp_pdfs")
 DELAY   = 2.0
+DRHP_WORKERS  = int(os.environ.get("DRHP_WORKERS", 0)) or min(4, os.cpu_count() or 1)   # extract processes
+HTTP_SCOPE    = "drhp"        # http_cache scope — data/http_cache/drhp
+DETAIL_PARSER = "detail-v1"   # bump when parse_detail_page changes, so cached results are re-parsed
+SECTIONS_PARSER = "sections-v1"   # bump when section extraction changes, so unchanged PDFs are re-read
 
 os.makedirs(PDF_DIR, exist_ok=True)
 os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
@@ -86,10 +112,15 @@ SECTION_MAX = {
     "overview":     3000,
 }
 
+TOC_MIN_SECTIONS  = 3     # fewer sections located via the TOC → full-text scan instead
+TOC_SECTION_PAGES = 6     # pages read per section — SECTION_MAX keeps a few pages of text at most
+TOC_TITLE_SHARE   = 0.5   # a pattern must cover this much of a TOC title or heading ("...USE OF FINANCIAL
+                          # INFORMATION AND MARKET DATA" is front matter, not the financials)
+
 
 # ── DATABASE ──────────────────────────────────────────────────────────────────
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_write_connection(DB_PATH)
     conn.execute("""
         CREATE TABLE IF NOT EXISTS drhp (
             ipo_id          TEXT PRIMARY KEY,
@@ -166,16 +197,31 @@ def reset_failed_entries(conn):
 
 # ── DETAIL PAGE SCRAPER ───────────────────────────────────────────────────────
 def scrape_detail_page(ipo):
+    """
+    Detail-page data, or {} if the page is missing (4xx). Errors worth retrying
+    (network, 5xx) are raised for the job queue. An unchanged page (HTTP 304)
+    returns the result parsed on the previous run.
+    """
     url = ipo.get("detail_url","")
     if not url: return {}
     print(f"  Scraping detail: {ipo['company']}...")
     try:
-        r = requests.get(url, headers=HEADERS, timeout=15)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
+        result, modified = http_cache.get_parsed(url, HTTP_SCOPE, parse_detail_page, DETAIL_PARSER,
+                                                 HEADERS, timeout=15)
     except Exception as e:
-        print(f"    Failed: {e}"); return {}
+        print(f"    Failed: {e}")
+        status = getattr(getattr(e, "response", None), "status_code", None)
+        if not (status and status < 500):
+            raise
+        return {}
+    print(f"    DRHP:{'Y' if result.get('drhp_url') else 'N'} RHP:{'Y' if result.get('rhp_url') else 'N'} "
+          f"Rev:{result.get('revenue_cr','?')}" + ("" if modified else " (unchanged)"))
+    return result
+
 
+def parse_detail_page(html):
+    """ipowatch detail page → PDF links and headline numbers."""
+    soup   = BeautifulSoup(html, "html.parser")
     text   = soup.get_text(separator=" ", strip=True)
     result = {}
 
@@ -208,75 +254,127 @@ def scrape_detail_page(ipo):
     if rm: result["registrar"] = rm.group(1).strip()
     paras = [p.get_text(strip=True) for p in soup.find_all("p") if len(p.get_text(strip=True)) > 80]
     if paras: result["summary"] = paras[0][:600]
-
-    print(f"    DRHP:{'Y' if result.get('drhp_url') else 'N'} RHP:{'Y' if result.get('rhp_url') else 'N'} Rev:{result.get('revenue_cr','?')}")
     return result
 
 
 # ── PDF DOWNLOAD & EXTRACTION ─────────────────────────────────────────────────
-def download_and_extract_pdf(url, ipo_id):
-    local = os.path.join(PDF_DIR, f"{ipo_id}.pdf")
-    if os.path.exists(local) and os.path.getsize(local) > 1000:
-        print(f"    Cached: {local}")
-        pdf_bytes = open(local,"rb").read()
-    else:
-        print(f"    Downloading: {url[:70]}...")
-        try:
-            r = requests.get(url, headers=HEADERS, timeout=60, stream=True)
-            r.raise_for_status()
-            pdf_bytes = r.content
-            open(local,"wb").write(pdf_bytes)
-            print(f"    Downloaded {len(pdf_bytes)//1024}KB")
-        except Exception as e:
-            print(f"    Download failed: {e}"); return "", 0
+def _pdf_path(ipo_id):
+    return os.path.join(PDF_DIR, f"{ipo_id}.pdf")
+
+
+def _have_pdf(local):
+    return os.path.exists(local) and os.path.getsize(local) > 1000
 
+
+def extract_pdf(local, conn=None, timer=None, collect=None):
+    """([(page_number, text)], total_pages) for every page of the PDF."""
+    timer = timer or StageTimer()
     try:
-        pages_text = []
-        with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
-            total = len(pdf.pages)
-            print(f"    Extracting {total} pages...")
-            for page in pdf.pages:
-                try:
-                    t = page.extract_text()
-                    if t: pages_text.append(t)
-                except: pass
-        full = "\n".join(pages_text)
-        print(f"    Extracted {len(full):,} chars from {total} pages")
-        return full, total
+        with timer.stage("extract"):
+            pages = get_page_texts(local, conn, collect=collect)   # cached in drhp.db for rag_indexer
+        print(f"    Extracted {sum(len(t) for _, t in pages):,} chars from {len(pages)} pages")
+        return pages, len(pages)
     except Exception as e:
-        print(f"    PDF parse error: {e}"); return "", 0
+        print(f"    PDF parse error: {e}"); return [], 0
 
 
 # ── OPTION A: SECTION EXTRACTION ─────────────────────────────────────────────
-def extract_sections(full_text):
-    sections       = {k:"" for k,_ in SECTION_PATTERNS}
-    sections_found = []
-    lines          = full_text.split("\n")
-    section_starts = {}
-
-    for i, line in enumerate(lines):
-        ls = line.strip()
-        if not ls or len(ls) < 5: continue
-        for section_key, patterns in SECTION_PATTERNS:
-            if section_key in section_starts: continue
-            for pat in patterns:
-                if re.search(pat, ls, re.IGNORECASE):
-                    section_starts[i] = section_key
-                    sections_found.append(section_key)
-                    print(f"    [{section_key}] line {i}: {ls[:55]}")
-                    break
-
-    if not section_starts:
+# Header scan: every pattern is compiled once, and _HEADER_ANY joins them into one
+# alternation used as a prefilter — a body line costs a single search, and only
+# lines it hits are confirmed pattern by pattern. For speed the prefilter is
+# case-sensitive on the upper-cased line (SECTION_PATTERNS are written in capitals)
+# and drops anchors and leading optional groups, so each branch starts with a
+# literal and the regex engine can skip ahead to candidate characters. That
+# makes it match a superset of the lines the full patterns match.
+_HEADER_RES = [(key, rank, re.compile(pat, re.IGNORECASE))
+               for key, patterns in SECTION_PATTERNS for rank, pat in enumerate(patterns)]
+
+def _prefilter_core(pat):
+    pat = pat.lstrip("^").rstrip("$")
+    m   = re.match(r"\(\?:[^()]*\)\?", pat)   # leading "(?:OUR\s+)?"
+    return pat[m.end():] if m else pat
+
+_HEADER_ANY = re.compile("|".join(f"(?:{_prefilter_core(pat)})"
+                                  for _, patterns in SECTION_PATTERNS for pat in patterns))
+_TOC_STYLE  = re.compile(r"(?:\.{2,}|…|\s)\s*\d{1,4}$")   # "RISK FACTORS ....... 27"
+
+
+def header_matches(line):
+    """[(key, rank, match)] for every header pattern found in line, in SECTION_PATTERNS order."""
+    if not _HEADER_ANY.search(line.upper()):
+        return []
+    hits = []
+    for key, rank, rx in _HEADER_RES:
+        m = rx.search(line)
+        if m:
+            hits.append((key, rank, m))
+    return hits
+
+
+def scan_headers(pages):
+    """
+    One pass over the lines of [(page_number, text)] → every candidate heading
+    as (line_index, page_number, key, rank, line), one per key per line.
+    line_index counts lines of the non-empty pages joined with newlines.
+    """
+    candidates, i = [], 0
+    for n, text in pages:
+        if not text:
+            continue
+        for line in text.split("\n"):
+            ls = line.strip()
+            if len(ls) >= 5:
+                seen = set()
+                for key, rank, _ in header_matches(ls):
+                    if key not in seen:
+                        seen.add(key)
+                        candidates.append((i, n, key, rank, ls))
+            i += 1
+    return candidates
+
+
+def _heading_like(line):
+    """Headings are short and upper-case, with no page number (contents lines have one)."""
+    return len(line) <= 100 and line.upper() == line and not _TOC_STYLE.search(line)
+
+
+def choose_section_starts(candidates):
+    """
+    {key: candidate}. Headings proper — heading-like lines that are mostly the
+    pattern match (heading_section) — beat passing mentions; among them the
+    earliest pattern in SECTION_PATTERNS wins, then the first line, as in the
+    TOC path. A key with no such heading keeps its first mention.
+    """
+    chosen, best = {}, {}
+    for c in candidates:
+        i, _, key, _, line = c
+        k, rank = heading_section(line) if _heading_like(line) else (None, None)
+        score   = (0, rank, i) if k == key else (1, 0, i)
+        if key not in best or score < best[key]:
+            best[key], chosen[key] = score, c
+    return chosen
+
+
+def extract_sections(pages):
+    """(sections, sections_found) by scanning every line of [(page_number, text)]."""
+    sections   = {k:"" for k,_ in SECTION_PATTERNS}
+    lines      = "\n".join(t for _, t in pages if t).split("\n")
+    candidates = scan_headers(pages)
+    chosen     = choose_section_starts(candidates)
+
+    if not chosen:
         print("    No headers found — using fallback regex")
-        return _fallback_sections(full_text), []
+        return _fallback_sections("\n".join(lines)), []
 
-    sorted_starts = sorted(section_starts.items())
-    for idx, (start, key) in enumerate(sorted_starts):
-        end = sorted_starts[idx+1][0] if idx+1 < len(sorted_starts) else min(start+600, len(lines))
+    print(f"    {len(candidates)} header candidates")
+    starts = sorted((c[0], key) for key, c in chosen.items())
+    for idx, (start, key) in enumerate(starts):
+        end  = next((s for s, _ in starts[idx+1:] if s > start), min(start+600, len(lines)))
         text = "\n".join(lines[start:end]).strip()
         sections[key] = text[:SECTION_MAX.get(key, 3000)]
+        print(f"    [{key}] line {start}, page {chosen[key][1]}: {chosen[key][4][:55]}")
 
-    return sections, sections_found
+    return sections, [key for _, key in starts]
 
 
 def _fallback_sections(text):
@@ -294,6 +392,99 @@ def _fallback_sections(text):
     return s
 
 
+# ── TOC-GUIDED SECTIONS ───────────────────────────────────────────────────────
+_SECTION_PREFIX = re.compile(r"^(?:SECTION|CHAPTER|PART)\s+[IVXLC\d]+\s*[:.\-–—]*\s*", re.IGNORECASE)
+
+def heading_section(title):
+    """(section key, pattern rank) for a TOC title or heading a pattern covers most of, or (None, None)."""
+    bare = _SECTION_PREFIX.sub("", title.strip()) or title.strip()
+    for key, rank, rx in _HEADER_RES:
+        m = rx.search(bare) or rx.search(title.strip())
+        if m and len(m.group(0)) >= TOC_TITLE_SHARE * len(bare):
+            return key, rank
+    return None, None
+
+
+def locate_sections(entries, total):
+    """
+    {key: (first_page, end_page)} — per key the entry matched by the earliest
+    pattern in SECTION_PATTERNS (OUR BUSINESS over INDUSTRY OVERVIEW), first
+    in page order on a tie; each section runs up to the next entry's page.
+    """
+    best = {}
+    for i, (title, start) in enumerate(entries):
+        key, rank = heading_section(title)
+        if key and (key not in best or rank < best[key][0]):
+            best[key] = (rank, i)
+    ranges = {}
+    for key, (_, i) in best.items():
+        start = entries[i][1]
+        nxt   = next((p for _, p in entries[i+1:] if p > start), total + 1)
+        ranges[key] = (start, min(nxt, start + TOC_SECTION_PAGES))
+    return ranges
+
+
+def toc_sections(ranges, pages):
+    """Section text from its pages, starting at the header line when it can be found."""
+    sections = {k:"" for k,_ in SECTION_PATTERNS}
+    found    = sorted(ranges, key=lambda k: ranges[k][0])
+    for key in found:
+        start, end = ranges[key]
+        lines = "\n".join(pages.get(n, "") for n in range(start, end)).split("\n")
+        first = len(pages.get(start, "").split("\n"))
+        head  = next((i for i, l in enumerate(lines[:first])
+                      if any(k == key for k, _, _ in header_matches(l.strip()))), 0)
+        sections[key] = "\n".join(lines[head:]).strip()[:SECTION_MAX.get(key, 3000)]
+        print(f"    [{key}] page {start}: {lines[head].strip()[:55] if lines else ''}")
+    return sections, found
+
+
+def read_pdf_sections(local, conn=None, timer=None, collect=None):
+    """
+    (sections, sections_found, total_pages) for a downloaded PDF.
+    Section pages come from the bookmarks or printed TOC (pdf_toc), so only
+    those pages are extracted — or read from the page cache if an earlier
+    run or rag_indexer got there first. The pages extracted here go into the
+    cache as a partial entry that rag_indexer completes. Without a usable TOC
+    the full text is extracted and scanned line by line. With `collect` the
+    extracted pages are handed back as (digest, pages, total) entries for
+    the caller's writer to store (conn is read-only in a worker).
+    """
+    timer = timer or StageTimer()
+    fresh = {}
+    try:
+        with timer.stage("extract"):
+            digest  = file_sha256(local)
+            cached  = load_cached_pages(conn, digest) if conn is not None else {}
+            read    = page_reader(local, cached, fresh)
+            total   = page_count(local)
+            entries, source = toc_entries(local, read)
+            ranges  = locate_sections(entries, total)
+            if len(ranges) >= TOC_MIN_SECTIONS:
+                wanted = [n for s, e in ranges.values() for n in range(s, e)]
+                pages  = read(wanted)
+        if fresh and collect is not None:
+            collect.append((digest, sorted(fresh.items()), total))
+        elif fresh and conn is not None:
+            store_page_texts(conn, digest, sorted(fresh.items()), total)
+        if len(ranges) >= TOC_MIN_SECTIONS:
+            print(f"    {source.upper()}: {len(ranges)} sections on {len(set(wanted))} of {total} pages"
+                  + (" (page cache)" if cached and not fresh else ""))
+            with timer.stage("split"):
+                sections, found = toc_sections(ranges, pages)
+            return sections, found, total
+        print(f"    No usable TOC ({len(ranges)} sections located) — scanning full text")
+    except Exception as e:
+        print(f"    TOC lookup failed ({e}) — scanning full text")
+
+    pages, total = extract_pdf(local, conn, timer, collect)
+    if not any(t for _, t in pages):
+        return None, [], total
+    with timer.stage("split"):
+        sections, found = extract_sections(pages)
+    return sections, found, total
+
+
 # ── STRUCTURED NUMBER EXTRACTION ──────────────────────────────────────────────
 def extract_numbers(sections, detail):
     fin_text = sections.get("financials","") + "\n" + sections.get("overview","")
@@ -346,90 +537,314 @@ def assess_quality(sections_found, fin_json):
     return "limited"
 
 
-# ── MAIN PIPELINE ─────────────────────────────────────────────────────────────
-def process_ipo_drhp(ipo, conn):
-    ipo_id  = ipo["id"]
-    company = ipo["company"]
+# ── WRITE ─────────────────────────────────────────────────────────────────────
+def _pdf_url(detail):
+    return detail.get("rhp_url") or detail.get("drhp_url") or ""
 
-    if already_scraped(conn, ipo_id):
-        print(f"  Skipping (already done): {company}")
-        return {}
-
-    time.sleep(DELAY)
-    detail = scrape_detail_page(ipo)
 
-    pdf_url = detail.get("rhp_url") or detail.get("drhp_url") or ""
-    full_text, total_pages = "", 0
-    if pdf_url:
-        time.sleep(DELAY)
-        full_text, total_pages = download_and_extract_pdf(pdf_url, ipo_id)
-
-    sections, sections_found = ({}, [])
-    if full_text:
-        sections, sections_found = extract_sections(full_text)
-    else:
-        print("    No PDF — detail page data only")
+def store_ipo_drhp(ipo, detail, conn, timer, sections=None, sections_found=(), total_pages=0, run_id=None):
+    ipo_id  = ipo["id"]
+    company = ipo["company"]
 
-    fin_json = extract_numbers(sections, detail)
-    quality  = assess_quality(sections_found, fin_json)
-
-    conn.execute("""
-        INSERT OR REPLACE INTO drhp
-        (ipo_id, company, drhp_url, rhp_url,
-         risk_factors, objects, financials, promoters, litigation, overview,
-         financials_json, peers_json, sections_found, total_pages, data_quality, scraped_at)
-        VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-    """, (
-        ipo_id, company,
-        detail.get("drhp_url",""), detail.get("rhp_url",""),
-        sections.get("risk_factors",""), sections.get("objects",""),
-        sections.get("financials",""),   sections.get("promoters",""),
-        sections.get("litigation",""),   sections.get("overview",""),
-        json.dumps(fin_json), json.dumps(fin_json.get("peers",[])),
-        json.dumps(sections_found), total_pages, quality,
-        datetime.now().isoformat(),
-    ))
-    conn.execute("""
-        INSERT OR REPLACE INTO ipo_enriched
-        (ipo_id, company, revenue_cr, profit_cr, years, lot_size,
-         lead_manager, registrar, listing_date, sector, summary, scraped_at)
-        VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
-    """, (
-        ipo_id, company,
-        json.dumps(fin_json["revenue_cr"]), json.dumps(fin_json["profit_cr"]),
-        json.dumps(fin_json["years"]),
-        detail.get("lot_size",0), detail.get("lead_manager",""),
-        detail.get("registrar",""), detail.get("listing_date",""),
-        detail.get("sector") or ipo.get("sector",""),
-        detail.get("summary") or ipo.get("summary",""),
-        datetime.now().isoformat(),
-    ))
-    conn.commit()
+    with timer.stage("split"):
+        sections, sections_found = sections or {}, list(sections_found)
+        if not sections:
+            print("    No PDF — detail page data only")
+
+        fin_json = extract_numbers(sections, detail)
+        quality  = assess_quality(sections_found, fin_json)
+
+    with timer.stage("write"):
+        conn.execute("""
+            INSERT OR REPLACE INTO drhp
+            (ipo_id, company, drhp_url, rhp_url,
+             risk_factors, objects, financials, promoters, litigation, overview,
+             financials_json, peers_json, sections_found, total_pages, data_quality, scraped_at)
+            VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+        """, (
+            ipo_id, company,
+            detail.get("drhp_url",""), detail.get("rhp_url",""),
+            sections.get("risk_factors",""), sections.get("objects",""),
+            sections.get("financials",""),   sections.get("promoters",""),
+            sections.get("litigation",""),   sections.get("overview",""),
+            json.dumps(fin_json), json.dumps(fin_json.get("peers",[])),
+            json.dumps(sections_found), total_pages, quality,
+            datetime.now().isoformat(),
+        ))
+        conn.execute("""
+            INSERT OR REPLACE INTO ipo_enriched
+            (ipo_id, company, revenue_cr, profit_cr, years, lot_size,
+             lead_manager, registrar, listing_date, sector, summary, scraped_at)
+            VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
+        """, (
+            ipo_id, company,
+            json.dumps(fin_json["revenue_cr"]), json.dumps(fin_json["profit_cr"]),
+            json.dumps(fin_json["years"]),
+            detail.get("lot_size",0), detail.get("lead_manager",""),
+            detail.get("registrar",""), detail.get("listing_date",""),
+            detail.get("sector") or ipo.get("sector",""),
+            detail.get("summary") or ipo.get("summary",""),
+            datetime.now().isoformat(),
+        ))
+        conn.commit()
+    if run_id:
+        record_ipo_run(conn, run_id, "drhp_scraper", ipo_id, status="ok",
+                       seconds=timer.seconds, pages=total_pages)
 
     print(f"    [{quality}] Sections:{sections_found} Rev:{fin_json['revenue_cr']} Litigations:{fin_json.get('litigation_count',0)}")
-    return {**fin_json, **sections, "data_quality": quality, "drhp_url": pdf_url}
+    return {**fin_json, **sections, "data_quality": quality, "drhp_url": _pdf_url(detail)}
+
+
+# ── JOB QUEUE PIPELINE ────────────────────────────────────────────────────────
+# Each IPO is a chain of tasks in drhp.db → jobs (job_queue.py):
+#   detail → download → extract → write        (no PDF link: detail → write)
+# The payload carries what a stage hands on: the IPO, its detail-page data,
+# the local PDF, the sections, and the stage timings so far. Detail pages
+# go one at a time, DELAY apart (all on ipowatch.in). Downloads run in
+# threads, capped per host by pdf_download. Extraction runs in processes,
+# because PDFium is not thread-safe and parsing is CPU-bound (one worker:
+# a single thread, the only one that touches PDFium). Write runs in the
+# coordinator, which is the only process that writes to drhp.db — workers
+# read the page cache and hand back the pages they extracted, and the
+# coordinator stores them before the write stage.
+# A new chain carries the sections of the key's last write as "previous".
+# When the PDF comes back 304 with the same sha256 and the sections were
+# read by the same parser and extractor, download hands them straight to
+# write and extraction is skipped.
+QUEUE        = "drhp"
+SECTIONS_TAG = f"{SECTIONS_PARSER}/{EXTRACTOR}"
+
+
+def _merge_seconds(payload, seconds):
+    out = dict(payload.get("seconds") or {})
+    for stage, s in seconds.items():
+        out[stage] = out.get(stage, 0.0) + s
+    return out
+
+
+def _previous_sections(conn, ipo_id):
+    """{"previous": sections of the IPO's last queued write} or {} if there are none to reuse."""
+    last = last_payload(conn, QUEUE, ipo_id, "write") or {}
+    if not (last.get("pdf_sha256") and last.get("sections")):
+        return {}
+    return {"previous": {k: last.get(k) for k in ("pdf_sha256", "parser", "sections", "found", "total")}}
 
 
-def run_drhp_pipeline(ipos):
+def _detail_stage(payload):
+    ipo   = payload["ipo"]
+    timer = StageTimer()   # DELAY sleeps are not counted
+    time.sleep(DELAY)
+    with timer.stage("download"):
+        detail = scrape_detail_page(ipo)
+    payload = {**payload, "detail": detail, "seconds": _merge_seconds(payload, timer.seconds)}
+    return ("download" if _pdf_url(detail) else "write"), payload
+
+
+def _download_stage(payload):
+    ipo   = payload["ipo"]
+    local = _pdf_path(ipo["id"])
+    have  = _have_pdf(local)   # then only ask whether it changed (HTTP 304 → keep it)
+    prev  = payload.get("previous") or {}
+    payload = {k: v for k, v in payload.items() if k != "previous"}
+    try:
+        size, seconds, modified = fetch_pdf(_pdf_url(payload["detail"]), local, HEADERS, revalidate=have)
+    except Exception as e:
+        if have:
+            print(f"  ⚠ {ipo['company']} — could not revalidate ({e}); using cached: {local}")
+            return "extract", {**payload, "pdf": local}
+        if not isinstance(e, (requests.HTTPError, ValueError)):
+            raise
+        status = getattr(e.response, "status_code", None) if isinstance(e, requests.HTTPError) else None
+        if status is not None and status >= 500:
+            raise   # server trouble — worth another attempt later
+        print(f"  {ipo['company']} — download failed: {e}")
+        return "write", {**payload, "pdf": None}   # detail-page data only, as before
+    payload = {**payload, "pdf": local, "seconds": _merge_seconds(payload, {"download": seconds})}
+    if not modified and prev.get("parser") == SECTIONS_TAG and prev.get("pdf_sha256") == file_sha256(local):
+        print(f"  {ipo['company']} — unchanged, reusing sections from the last run")
+        return "write", {**payload, **prev}
+    if not modified:
+        print(f"  {ipo['company']} — unchanged, cached: {local}")
+        return "extract", payload
+    print(f"  ✅ Downloaded {ipo['company']} — {size//1024}KB in {seconds:.1f}s")
+    return "extract", payload
+
+
+def _extract_init():
+    """Per worker process: the pool already runs one PDF per process."""
+    import pdf_extract
+    pdf_extract.PDF_WORKERS = 1
+
+
+def _extract_task(local):
+    """
+    Sections of one PDF → (sections, found, total, seconds, pages, sha256).
+    Must stay top-level (pickled). The page cache is only read here; `pages`
+    is what was extracted, as (digest, pages, total) entries for the writer
+    to store.
+    """
+    timer = StageTimer()
+    pages = []
+    found = read_pdf_sections(local, get_read_connection(DB_PATH), timer, collect=pages)
+    return (*found, timer.seconds, pages, file_sha256(local))
+
+
+def _extracted(payload, result, conn):
+    """Store the worker's extracted pages (conn is the writer), then hand on to write."""
+    sections, found, total, seconds, pages, digest = result
+    for sha, texts, count in pages:
+        store_page_texts(conn, sha, texts, count)
+    return "write", {**payload, "sections": sections, "found": found, "total": total,
+                     "pdf_sha256": digest, "parser": SECTIONS_TAG,
+                     "seconds": _merge_seconds(payload, seconds)}
+
+
+def _write_stage(payload, conn, run_id):
+    timer = StageTimer()
+    timer.seconds.update(payload.get("seconds") or {})
+    print(f"\n  {payload['ipo']['company']}")
+    return store_ipo_drhp(payload["ipo"], payload.get("detail") or {}, conn, timer,
+                          payload.get("sections"), payload.get("found") or [],
+                          payload.get("total") or 0, run_id)
+
+
+def _extract_pool(workers):
+    """
+    Processes, or with one worker a single thread — either way extraction
+    runs off the coordinator, which keeps heartbeating its leases meanwhile.
+    """
+    if workers <= 1:
+        return ThreadPoolExecutor(max_workers=1)
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_extract_init)
+
+
+def run_queue(conn, run_id, workers, results):
+    """
+    Work the drhp queue until nothing is pending or running: claim tasks up
+    to each stage's limit, settle them as they finish, and wait out retry
+    backoffs. On exit (including Ctrl+C) tasks still in flight are handed
+    back, so the next run picks them up.
+    """
+    owner    = f"{socket.gethostname()}:{os.getpid()}"
+    threads  = ThreadPoolExecutor(max_workers=1 + DOWNLOAD_WORKERS)
+    procs    = _extract_pool(workers)
+    limits   = {"detail": 1, "download": DOWNLOAD_WORKERS, "extract": workers}
+    handlers = {"detail": _detail_stage, "download": _download_stage}
+    inflight = {}   # future → task
+    beat     = time.time()
+    broken   = False   # a worker process died; the pool takes no new work
+
+    def keep_leases():
+        nonlocal beat
+        if inflight and time.time() - beat >= LEASE_S / 3:
+            heartbeat(conn, inflight.values())
+            beat = time.time()
+
+    def settle(task, run):
+        """Run / collect one stage, then complete or fail its task."""
+        company = task["payload"]["ipo"]["company"]
+        try:
+            outcome = run()
+        except Exception as e:
+            state = fail(conn, task, e)
+            if state == "pending":
+                print(f"  ↻ {company} [{task['stage']}] {e} — retry in {backoff_s(task['attempts']):.0f}s "
+                      f"({task['attempts']}/{task['max_attempts']})")
+            elif state == "failed":
+                print(f"  ❌ {company} [{task['stage']}] failed after {task['attempts']} attempt(s): {e}")
+                results["failed"] += 1
+                record_ipo_run(conn, run_id, "drhp_scraper", task["key"], status="failed",
+                               seconds=task["payload"].get("seconds"))
+            else:
+                print(f"  ⚠ {company} [{task['stage']}] lease lost — another run has it ({e})")
+            return
+        if not complete(conn, task, *(() if task["stage"] == "write" else outcome)):
+            print(f"  ⚠ {company} [{task['stage']}] lease lost — result dropped, another run has it")
+        elif task["stage"] == "write":
+            q = outcome.get("data_quality", "failed")
+            results[q] = results.get(q, 0) + 1
+
+    try:
+        while True:
+            keep_leases()
+            reap_expired(conn, QUEUE)
+
+            while (task := claim(conn, QUEUE, "write", owner)):
+                settle(task, lambda: _write_stage(task["payload"], conn, run_id))
+                keep_leases()
+
+            if broken and not any(t["stage"] == "extract" for t in inflight.values()):
+                print("  ⚠ An extract worker died — starting a new pool")
+                procs.shutdown(wait=False)
+                procs, broken = _extract_pool(workers), False
+            for stage in ("detail", "download", "extract"):
+                if stage == "extract" and broken:
+                    continue
+                busy = sum(1 for t in inflight.values() if t["stage"] == stage)
+                while busy < limits[stage] and (task := claim(conn, QUEUE, stage, owner)):
+                    if stage == "extract":
+                        fut = procs.submit(_extract_task, task["payload"]["pdf"])
+                    else:
+                        fut = threads.submit(handlers[stage], task["payload"])
+                    inflight[fut] = task
+                    busy += 1
+
+            if inflight:
+                done, _ = wait(inflight, timeout=0.5, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    task = inflight.pop(fut)
+                    if task["stage"] == "extract":
+                        broken = broken or isinstance(fut.exception(), BrokenProcessPool)
+                        settle(task, lambda: _extracted(task["payload"], fut.result(), conn))
+                    else:
+                        settle(task, fut.result)
+                continue
+
+            wake = next_wakeup(conn, QUEUE)
+            if wake is None:
+                break
+            time.sleep(min(max(wake - time.time(), 0.1), 30))
+    except BaseException:
+        release(conn, list(inflight.values()))
+        print(f"\n  ⚠ Stopped — {len(inflight)} task(s) handed back; re-run to resume")
+        raise
+    finally:
+        threads.shutdown(wait=False, cancel_futures=True)
+        procs.shutdown(wait=False, cancel_futures=True)
+
+
+def run_drhp_pipeline(ipos, workers=None):
+    workers = workers or DRHP_WORKERS
     print("\n" + "="*60)
     print(f"DRHP Pipeline (Option A) — {datetime.now().strftime('%Y-%m-%d %H:%M')}")
     print(f"  {len(ipos)} IPOs | Section-based extraction")
     print(f"  DB location: {DB_PATH}")
     print(f"  PDF folder:  {PDF_DIR}")
+    print(f"  Workers:     {workers} extract, {DOWNLOAD_WORKERS} download (≤{HOST_CONNECTIONS} per host)")
     print("="*60)
     conn    = init_db()
     reset_failed_entries(conn)   # clear empty rows from previous failed runs
+    init_runs_table(conn)
+    init_jobs_table(conn)
+    run_id  = new_run_id()
     results = {"full_drhp":0,"partial":0,"limited":0,"failed":0}
-    for i, ipo in enumerate(ipos):
-        print(f"\n[{i+1}/{len(ipos)}] {ipo['company']}")
-        try:
-            r = process_ipo_drhp(ipo, conn)
-            q = r.get("data_quality","failed")
-            results[q] = results.get(q,0) + 1
-        except Exception as e:
-            print(f"  Error: {e}"); results["failed"] += 1
-    conn.close()
-    print(f"\nDone. Full:{results['full_drhp']} Partial:{results['partial']} Limited:{results['limited']} Failed:{results['failed']}")
+
+    queued, skipped = 0, 0
+    for ipo in ipos:
+        if already_scraped(conn, ipo["id"]):
+            skipped += 1
+        elif start_chain(conn, QUEUE, ipo["id"], "detail", {"ipo": ipo, **_previous_sections(conn, ipo["id"])}):
+            queued += 1
+    resumed = sum(1 for _ in conn.execute(
+        "SELECT DISTINCT key FROM jobs WHERE queue = ? AND state IN ('pending','running')", (QUEUE,))) - queued
+    print(f"\n▶ Queued {queued} IPO(s)" + (f", resuming {resumed} from an earlier run" if resumed else "")
+          + (f", skipping {skipped} already done" if skipped else ""))
+
+    run_queue(conn, run_id, workers, results)
+    close_write_connection(DB_PATH)
+    print(f"\nDone. Full:{results['full_drhp']} Partial:{results['partial']} Limited:{results['limited']} "
+          f"Failed:{results['failed']} Skipped:{skipped}")
 
 
 if __name__ == "__main__":
@@ -448,4 +863,7 @@ if __name__ == "__main__":
     if not ipos:
         print("\n⚠  No IPOs found — run scraper.py first to get IPO list.")
     else:
-        run_drhp_pipeline(ipos)
+        workers = None
+        if "--workers" in sys.argv:
+            workers = int(sys.argv[sys.argv.index("--workers") + 1])
+        run_drhp_pipeline(ipos, workers)
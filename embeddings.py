@@ -0,0 +1,120 @@
+"""
+embeddings.py — Binary embedding storage for drhp.db
+=====================================================
+Chunk embeddings are stored in `chunks.embedding` as raw little-endian
+float32 BLOBs (384 dims × 4 bytes = 1,536 bytes per chunk) instead of
+JSON text (~4x bigger and slow to parse).
+
+Readers load them with np.frombuffer — no parsing, no copy.
+
+Vectors are L2-normalised at write time by default, so cosine similarity
+is a plain dot product. Pinecone uses the cosine metric, so normalised
+vectors upload unchanged.
+
+Embedding backend (EMBEDDING_BACKEND env var) — same model, three runtimes:
+  torch      — PyTorch float32, the reference (default)
+  onnx       — ONNX Runtime float32: near-identical vectors, faster import
+               and CPU encode, no torch in memory
+  onnx-int8  — ONNX Runtime with the int8-quantised export: smallest and
+               fastest on CPU, vectors within bench_embeddings' parity bounds
+ONNX needs sentence-transformers>=3.2 and onnxruntime
+(pip install "sentence-transformers[onnx]"). If it cannot load, the torch
+model is used instead.
+"""
+
+import os, json
+import numpy as np
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_DIM   = 384                 # all-MiniLM-L6-v2 output size
+EMBEDDING_DTYPE = np.dtype("<f4")     # little-endian float32 on every platform
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+EMBEDDING_BACKEND  = os.environ.get("EMBEDDING_BACKEND", "torch").lower()
+# Quantised export shipped in the model repo; AVX2 runs on any x86-64 CPU
+ONNX_INT8_FILE     = os.environ.get("EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+
+
+# ── EMBEDDING BACKEND ─────────────────────────────────────────────────────────
+def embedding_model_id(backend: str = None) -> str:
+    """Model + backend tag for cache keys; plain model name for torch."""
+    backend = backend or EMBEDDING_BACKEND
+    return EMBEDDING_MODEL if backend == "torch" else f"{EMBEDDING_MODEL}@{backend}"
+
+
+def load_embedding_model(backend: str = None):
+    """SentenceTransformer for EMBEDDING_MODEL on the chosen backend."""
+    from sentence_transformers import SentenceTransformer
+    backend = backend or EMBEDDING_BACKEND
+    if backend not in EMBEDDING_BACKENDS:
+        print(f"  ⚠ Unknown EMBEDDING_BACKEND '{backend}' — using torch")
+        backend = "torch"
+    if backend == "torch":
+        return SentenceTransformer(EMBEDDING_MODEL)
+    kwargs = {"backend": "onnx"}
+    if backend == "onnx-int8":
+        kwargs["model_kwargs"] = {"file_name": ONNX_INT8_FILE}
+    try:
+        return SentenceTransformer(EMBEDDING_MODEL, **kwargs)
+    except Exception as e:
+        print(f"  ⚠ {backend} embedding backend unavailable ({e}) — using torch")
+        return SentenceTransformer(EMBEDDING_MODEL)
+
+
+# ── STORAGE ───────────────────────────────────────────────────────────────────
+def pack_embedding(vector, normalize=True) -> bytes:
+    """Encode a vector as a float32 BLOB, optionally L2-normalised."""
+    v = np.asarray(vector, dtype=EMBEDDING_DTYPE)
+    if normalize:
+        n = float(np.linalg.norm(v))
+        if n > 0:
+            v = v / n
+    return v.astype(EMBEDDING_DTYPE, copy=False).tobytes()
+
+
+def unpack_embedding(blob) -> np.ndarray:
+    """
+    Zero-copy read-only view over a stored embedding.
+    Legacy JSON rows (not yet migrated) are still decoded so a reader
+    never breaks on an old drhp.db.
+    """
+    if isinstance(blob, str):
+        return np.asarray(json.loads(blob), dtype=EMBEDDING_DTYPE)
+    return np.frombuffer(blob, dtype=EMBEDDING_DTYPE)
+
+
+def migrate_json_embeddings(conn, normalize=True, batch_size=500) -> int:
+    """
+    One-time migration: rewrite JSON-text embeddings as float32 BLOBs.
+    Only touches rows still stored as text, so re-running is a no-op.
+    Returns the number of rows converted.
+    """
+    rowids = [r[0] for r in conn.execute(
+        "SELECT rowid FROM chunks WHERE typeof(embedding) = 'text'"
+    ).fetchall()]
+    if not rowids:
+        return 0
+
+    print(f"  Migrating {len(rowids)} JSON embeddings → float32 BLOBs...")
+    converted = 0
+    for i in range(0, len(rowids), batch_size):
+        batch = rowids[i:i+batch_size]
+        marks = ",".join("?" * len(batch))
+        rows  = conn.execute(
+            f"SELECT rowid, embedding FROM chunks WHERE rowid IN ({marks})", batch
+        ).fetchall()
+        updates = []
+        for rowid, embedding_json in rows:
+            try:
+                blob = pack_embedding(json.loads(embedding_json), normalize=normalize)
+            except Exception:
+                blob = None   # unreadable row — drop the embedding, keep the text
+            updates.append((blob, rowid))
+        conn.executemany("UPDATE chunks SET embedding = ? WHERE rowid = ?", updates)
+        conn.commit()
+        converted += len(updates)
+
+    # Reclaim the space the JSON text occupied
+    conn.execute("VACUUM")
+    print(f"  ✅ Migrated {converted} embeddings")
+    return converted
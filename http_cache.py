@@ -0,0 +1,145 @@
+"""
+http_cache.py — Conditional-request cache for pages and PDFs
+============================================================
+The refresh workflow runs three times a day, and most ipowatch pages and
+DRHP PDFs have not changed since the last run. This cache keeps each
+response's ETag / Last-Modified (and, for pages, the body) on disk. The
+next request for the same URL sends If-None-Match / If-Modified-Since;
+a 304 answer means the stored copy is still current, so nothing is
+downloaded again.
+
+data/http_cache/<scope>/<sha1(url)>.json   validators, encoding, parsed result
+                                  .body    zlib-compressed response body
+
+A scope is one cache per consumer ("live" for scraper.py, "drhp" for
+drhp_scraper.py, "pdf" for pdf_download.py). Each one is only revalidated
+against what that consumer last saw, and the Actions jobs can persist
+their own scope.
+
+  get_text(url, scope)                → (text, modified)
+  get_parsed(url, scope, parse, tag)  → (parse(text), modified). On a 304 the
+                                        stored result comes back without
+                                        parsing again (the tag names the
+                                        parser version)
+  conditional_headers(url, scope)     → {If-None-Match / If-Modified-Since} or {}
+  remember(url, scope, headers)       → store validators (pdf_download keeps
+                                        the body itself)
+
+Responses without an ETag or Last-Modified are not cached. Delete a scope's
+directory to force full re-fetches.
+"""
+
+import os, json, zlib, hashlib, requests
+from datetime import datetime
+
+CACHE_DIR = os.environ.get("HTTP_CACHE_DIR") or os.path.join(os.path.dirname(__file__), "data", "http_cache")
+TIMEOUT   = 15
+
+
+def _paths(url: str, scope: str) -> tuple:
+    base = os.path.join(CACHE_DIR, scope, hashlib.sha1(url.encode("utf-8")).hexdigest())
+    return base + ".json", base + ".body"
+
+
+def _write(path: str, data: bytes):
+    """Write via a temp file + os.replace, so a crash never leaves a torn entry."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def load(url: str, scope: str):
+    """The stored entry for a URL, or None."""
+    meta, _ = _paths(url, scope)
+    try:
+        with open(meta, encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return entry if entry.get("url") == url else None
+
+
+def _save(entry: dict, scope: str):
+    meta, _ = _paths(entry["url"], scope)
+    _write(meta, json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+
+
+def forget(url: str, scope: str):
+    for path in _paths(url, scope):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def conditional_headers(url: str, scope: str, entry: dict = None) -> dict:
+    entry = entry or load(url, scope) or {}
+    hdrs  = {}
+    if entry.get("etag"):
+        hdrs["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        hdrs["If-Modified-Since"] = entry["last_modified"]
+    return hdrs
+
+
+def remember(url: str, scope: str, headers, body: bytes = None, encoding: str = None, **extra) -> bool:
+    """
+    Store a 200 response's validators, plus its body if given. `extra` fields
+    are kept with the entry. A response with no validators drops the stale
+    entry instead. True if stored.
+    """
+    etag, modified = headers.get("ETag"), headers.get("Last-Modified")
+    if not (etag or modified):
+        forget(url, scope)
+        return False
+    if body is not None:
+        _write(_paths(url, scope)[1], zlib.compress(body, 6))
+    _save({"url": url, "etag": etag, "last_modified": modified, "encoding": encoding,
+           "has_body": body is not None, "fetched_at": datetime.now().isoformat(), **extra}, scope)
+    return True
+
+
+def _stored_body(url: str, scope: str, entry: dict):
+    if not entry or not entry.get("has_body"):
+        return None
+    try:
+        with open(_paths(url, scope)[1], "rb") as f:
+            return zlib.decompress(f.read())
+    except (OSError, zlib.error):
+        return None
+
+
+# ── FETCH ─────────────────────────────────────────────────────────────────────
+def get_text(url: str, scope: str, headers: dict = None, timeout: float = TIMEOUT) -> tuple:
+    """
+    GET a page through the cache → (text, modified). modified is False when
+    the server answered 304 and the stored body was used. Raises like
+    requests (HTTPError on 4xx/5xx).
+    """
+    entry = load(url, scope)
+    body  = _stored_body(url, scope, entry)
+    hdrs  = {**(headers or {}), **(conditional_headers(url, scope, entry) if body is not None else {})}
+    r = requests.get(url, headers=hdrs, timeout=timeout)
+    if r.status_code == 304 and body is not None:
+        return body.decode(entry.get("encoding") or "utf-8", errors="replace"), False
+    r.raise_for_status()
+    encoding = r.encoding or r.apparent_encoding
+    remember(url, scope, r.headers, r.content, encoding)
+    return r.content.decode(encoding or "utf-8", errors="replace"), True
+
+
+def get_parsed(url: str, scope: str, parse, tag: str = "", headers: dict = None,
+               timeout: float = TIMEOUT) -> tuple:
+    """
+    get_text, then parse(text) → JSON-able result. The result is stored with
+    the entry. On a 304 it is returned as is, unless `tag` (the parser version)
+    has changed.
+    """
+    text, modified = get_text(url, scope, headers, timeout)
+    entry = load(url, scope)
+    if not modified and entry and entry.get("parsed_tag") == tag and "parsed" in entry:
+        return entry["parsed"], False
+    data = parse(text)
+    if entry:
+        _save({**entry, "parsed": data, "parsed_tag": tag}, scope)
+    return data, modified
@@ -0,0 +1,262 @@
+"""
+index_telemetry.py — Per-IPO stage timings for the indexing pipelines
+======================================================================
+Every rag_indexer and drhp_scraper run writes one row per IPO to
+drhp.db → index_runs:
+  run_id, pipeline, ipo_id, status, recorded_at,
+  seconds per stage (download, extract, split, embed, chunk, write), total_s,
+  pages, sentences, chunks, cache_hits, pages_per_s, sentences_per_s,
+  peak_rss_mb, versions (python / numpy / pdfplumber / sentence-transformers
+  / embedding backend — so a slowdown can be tied to a dependency update)
+
+Stages are exclusive: StageTimer pauses the outer stage while a nested one
+runs, so in the streaming indexer the time inside model.encode counts as
+embed, not as chunk. Stages a pipeline doesn't have stay 0.
+
+peak_rss_mb is the process peak so far (a parallel worker reports its own
+peak); it is NULL on Windows, which has no resource module.
+
+Report:  python index_telemetry.py                    # last 10 runs, both pipelines
+         python index_telemetry.py --pipeline rag_indexer --runs 20
+         python index_telemetry.py --ipo <ipo_id>     # one IPO across runs
+"""
+
+import os, sys, json, time, platform
+from datetime import datetime
+from contextlib import contextmanager
+
+DB_PATH    = os.path.join(os.path.dirname(__file__), "data", "drhp.db")
+STAGES     = ("download", "extract", "split", "embed", "chunk", "write")
+PIPELINES  = ("rag_indexer", "drhp_scraper")
+REGRESSION = 0.20   # report flags a stage that got this much slower than the previous run
+
+
+# ── STAGE TIMER ───────────────────────────────────────────────────────────────
+class StageTimer:
+    """Exclusive wall time per stage; stages may nest, generators may be timed per item."""
+
+    def __init__(self):
+        self.seconds  = dict.fromkeys(STAGES, 0.0)
+        self.started  = time.perf_counter()
+        self._stack   = []   # [name, resumed_at]
+
+    @contextmanager
+    def stage(self, name: str):
+        now = time.perf_counter()
+        if self._stack:                        # pause the enclosing stage
+            outer = self._stack[-1]
+            self.seconds[outer[0]] = self.seconds.get(outer[0], 0.0) + now - outer[1]
+        self._stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            name, since = self._stack.pop()
+            self.seconds[name] = self.seconds.get(name, 0.0) + now - since
+            if self._stack:
+                self._stack[-1][1] = now
+
+    def iterate(self, iterable, name: str):
+        """Re-yield `iterable`, timing only the work done to produce each item."""
+        it = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+            yield item
+
+    def encoder(self, model, name: str = "embed"):
+        """Proxy whose encode() is timed as `name`."""
+        timer = self
+
+        class _Timed:
+            def encode(self, *args, **kwargs):
+                with timer.stage(name):
+                    return model.encode(*args, **kwargs)
+        return _Timed()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+# ── SQLITE TABLE ──────────────────────────────────────────────────────────────
+def init_runs_table(conn):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS index_runs (
+            run_id           TEXT NOT NULL,
+            pipeline         TEXT NOT NULL,
+            ipo_id           TEXT NOT NULL,
+            status           TEXT,
+            recorded_at      TEXT,
+            {", ".join(f"{s}_s REAL" for s in STAGES)},
+            total_s          REAL,
+            pages            INTEGER,
+            sentences        INTEGER,
+            chunks           INTEGER,
+            cache_hits       INTEGER,
+            pages_per_s      REAL,
+            sentences_per_s  REAL,
+            peak_rss_mb      REAL,
+            versions         TEXT,
+            PRIMARY KEY (run_id, pipeline, ipo_id)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_index_runs_ipo ON index_runs(ipo_id)")
+    conn.commit()
+
+
+def new_run_id() -> str:
+    return datetime.now().strftime("%Y%m%d-%H%M%S")
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, or None where unsupported."""
+    try:
+        import resource
+    except ImportError:   # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+_versions = None
+
+def dependency_versions() -> str:
+    global _versions
+    if _versions is None:
+        from importlib.metadata import version, PackageNotFoundError
+        found = {"python": platform.python_version(),
+                 "embedding_backend": os.environ.get("EMBEDDING_BACKEND", "torch")}
+        for pkg in ("numpy", "pdfplumber", "pypdfium2", "PyMuPDF", "sentence-transformers",
+                    "torch", "onnxruntime"):
+            try:
+                found[pkg] = version(pkg)
+            except PackageNotFoundError:
+                pass
+        _versions = json.dumps(found, sort_keys=True)
+    return _versions
+
+
+def record_ipo_run(conn, run_id: str, pipeline: str, ipo_id: str, status: str = "ok",
+                   seconds: dict = None, total_s: float = None, pages: int = 0,
+                   sentences: int = 0, chunks: int = 0, cache_hits: int = 0,
+                   rss_mb: float = None):
+    """One index_runs row. rss_mb defaults to this process's peak."""
+    seconds = seconds or {}
+    total_s = total_s if total_s is not None else sum(seconds.values())
+    rss_mb  = rss_mb if rss_mb is not None else peak_rss_mb()
+    rate    = lambda n: round(n / total_s, 2) if total_s and n else None
+    try:
+        with conn:
+            conn.execute(f"""
+                INSERT OR REPLACE INTO index_runs
+                (run_id, pipeline, ipo_id, status, recorded_at,
+                 {", ".join(f"{s}_s" for s in STAGES)},
+                 total_s, pages, sentences, chunks, cache_hits,
+                 pages_per_s, sentences_per_s, peak_rss_mb, versions)
+                VALUES ({",".join("?" * (5 + len(STAGES) + 9))})
+            """, (
+                run_id, pipeline, ipo_id, status, datetime.now().isoformat(),
+                *(round(seconds.get(s, 0.0), 3) for s in STAGES),
+                round(total_s, 3), pages, sentences, chunks, cache_hits,
+                rate(pages), rate(sentences),
+                round(rss_mb, 1) if rss_mb is not None else None,
+                dependency_versions(),
+            ))
+    except Exception as e:
+        print(f"  ⚠ Telemetry not recorded: {e}")   # never fail a pipeline over timings
+
+
+# ── REPORT ────────────────────────────────────────────────────────────────────
+def _run_summaries(conn, pipeline: str, limit: int) -> list:
+    cols = ", ".join(f"SUM({s}_s)" for s in STAGES)
+    rows = conn.execute(f"""
+        SELECT run_id, COUNT(*), SUM(status != 'ok'), SUM(pages), SUM(sentences), SUM(chunks),
+               SUM(total_s), MAX(peak_rss_mb), MAX(versions), {cols}
+        FROM index_runs WHERE pipeline = ?
+        GROUP BY run_id ORDER BY run_id DESC LIMIT ?
+    """, (pipeline, limit)).fetchall()
+    out = []
+    for r in reversed(rows):
+        out.append({"run_id": r[0], "ipos": r[1], "failed": r[2] or 0, "pages": r[3] or 0,
+                    "sentences": r[4] or 0, "chunks": r[5] or 0, "total_s": r[6] or 0.0,
+                    "rss": r[7], "versions": json.loads(r[8] or "{}"),
+                    "stages": dict(zip(STAGES, (v or 0.0 for v in r[9:])))})
+    return out
+
+
+def _version_changes(old: dict, new: dict) -> list:
+    return [f"{k} {old.get(k, '—')} → {new.get(k, '—')}"
+            for k in sorted(set(old) | set(new)) if old.get(k) != new.get(k)]
+
+
+def _slower(run: dict, prev: dict, stage: str) -> bool:
+    """Stage time per page (or absolute, without page counts) up by REGRESSION."""
+    now, before = run["stages"][stage], prev["stages"][stage]
+    if before < 0.5:   # too small to compare
+        return False
+    if run["pages"] and prev["pages"]:
+        now, before = now / run["pages"], before / prev["pages"]
+    return now > before * (1 + REGRESSION)
+
+
+def report(conn, pipeline: str, limit: int = 10):
+    runs = _run_summaries(conn, pipeline, limit)
+    if not runs:
+        return
+    print(f"\n  {pipeline} — last {len(runs)} run(s)")
+    print(f"  {'run':<16}{'IPOs':>5}{'pages':>7}{'sents':>8}{'total s':>9}{'pg/s':>7}"
+          f"{'snt/s':>7}{'RSS MB':>8}  " + "".join(f"{s:>9}" for s in STAGES))
+    prev = None
+    for run in runs:
+        if prev and run["versions"] and prev["versions"]:
+            for change in _version_changes(prev["versions"], run["versions"]):
+                print(f"  {'':<16}  ↻ {change}")
+        t     = run["total_s"] or 0.0
+        rate  = lambda n: f"{n / t:7.1f}" if t and n else f"{'—':>7}"
+        rss   = f"{run['rss']:8.0f}" if run["rss"] else f"{'—':>8}"
+        cells = "".join(f"{run['stages'][s]:8.1f}{'▲' if prev and _slower(run, prev, s) else ' '}"
+                        for s in STAGES)
+        failed = f" ❌{run['failed']}" if run["failed"] else ""
+        print(f"  {run['run_id']:<16}{run['ipos']:>5}{run['pages']:>7}{run['sentences']:>8}"
+              f"{t:9.1f}{rate(run['pages'])}{rate(run['sentences'])}{rss}  {cells}{failed}")
+        prev = run
+
+
+def report_ipo(conn, ipo_id: str, limit: int = 20):
+    rows = conn.execute(f"""
+        SELECT run_id, pipeline, status, pages, sentences, chunks, total_s, peak_rss_mb,
+               {", ".join(f"{s}_s" for s in STAGES)}
+        FROM index_runs WHERE ipo_id = ? ORDER BY run_id DESC LIMIT ?
+    """, (ipo_id, limit)).fetchall()
+    if not rows:
+        print(f"  No runs recorded for {ipo_id}"); return
+    print(f"\n  {ipo_id}")
+    print(f"  {'run':<16}{'pipeline':<14}{'status':<8}{'pages':>6}{'sents':>7}{'chunks':>7}"
+          f"{'total s':>9}  " + "".join(f"{s:>9}" for s in STAGES))
+    for r in reversed(rows):
+        print(f"  {r[0]:<16}{r[1]:<14}{r[2] or '':<8}{r[3] or 0:>6}{r[4] or 0:>7}{r[5] or 0:>7}"
+              f"{r[6] or 0:9.1f}  " + "".join(f"{v or 0:9.1f}" for v in r[8:]))
+
+
+if __name__ == "__main__":
+    import argparse, sqlite3
+    from pathlib import Path
+    ap = argparse.ArgumentParser(description="Indexing stage timings across runs")
+    ap.add_argument("--pipeline", choices=PIPELINES)
+    ap.add_argument("--runs",     type=int, default=10)
+    ap.add_argument("--ipo",      help="one IPO's history instead of run totals")
+    args = ap.parse_args()
+    if not os.path.exists(DB_PATH):
+        print(f"❌ DB not found: {DB_PATH}"); sys.exit(1)
+    conn = sqlite3.connect(Path(DB_PATH).resolve().as_uri() + "?mode=ro", uri=True)   # valid on Windows too
+    try:
+        if args.ipo:
+            report_ipo(conn, args.ipo, args.runs)
+        else:
+            for p in ([args.pipeline] if args.pipeline else PIPELINES):
+                report(conn, p, args.runs)
+    except sqlite3.OperationalError:
+        print("  No index_runs table yet — run rag_indexer.py or drhp_scraper.py first")
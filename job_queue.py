@@ -0,0 +1,252 @@
+"""
+job_queue.py — Persistent task queue in drhp.db
+===============================================
+The DRHP pipeline's progress lives in SQLite instead of in a for-loop, so
+a run that is killed (GitHub Actions timeout, cancelled job, Ctrl+C)
+resumes where it stopped. Finished stages are not redone, and tasks that
+were in flight run again.
+
+drhp.db → jobs: one row per (queue, key, stage) — e.g. ("drhp", ipo_id, "download")
+  state        pending → running → done
+               A failed attempt goes back to pending with
+               next_run_at = now + BACKOFF_BASE_S × 2^(attempts-1), capped at
+               BACKOFF_MAX_S. It becomes failed after max_attempts.
+  attempts     claims so far (a killed attempt counts)
+  lease_owner / lease_until
+               A running task belongs to its claimer until lease_until. The
+               owner extends the lease while it works (heartbeat). When a
+               process dies its leases run out, and reap_expired hands those
+               tasks back as pending.
+  payload      JSON handed from one stage to the next
+
+complete() marks a task done and enqueues the key's next stage in the same
+transaction, so a crash can never lose the hand-off. complete() and fail()
+only touch a task still running under the caller's lease: if it was reaped
+and claimed by someone else meanwhile, the late result is dropped.
+
+All calls take the caller's writer connection — in drhp_scraper only the
+coordinator thread touches this table; its workers just run the stage.
+
+Inspect:  python job_queue.py                 # counts per stage/state + failures
+          python job_queue.py --retry-failed  # failed tasks back to pending
+"""
+
+import os, sys, json, time, sqlite3
+from datetime import datetime
+
+DB_PATH        = os.path.join(os.path.dirname(__file__), "data", "drhp.db")
+MAX_ATTEMPTS   = 4
+BACKOFF_BASE_S = 5.0
+BACKOFF_MAX_S  = 300.0
+LEASE_S        = 120.0    # a running task with no heartbeat for this long is presumed dead
+
+
+def init_jobs_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            queue         TEXT NOT NULL,
+            key           TEXT NOT NULL,
+            stage         TEXT NOT NULL,
+            state         TEXT NOT NULL DEFAULT 'pending',
+            attempts      INTEGER NOT NULL DEFAULT 0,
+            max_attempts  INTEGER NOT NULL DEFAULT 4,
+            next_run_at   REAL NOT NULL DEFAULT 0,
+            lease_owner   TEXT,
+            lease_until   REAL,
+            payload       TEXT,
+            last_error    TEXT,
+            updated_at    TEXT,
+            PRIMARY KEY (queue, key, stage)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs(queue, stage, state, next_run_at)")
+    conn.commit()
+
+
+def _now_iso() -> str:
+    return datetime.now().isoformat()
+
+
+def backoff_s(attempts: int) -> float:
+    return min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** max(0, attempts - 1))
+
+
+# ── ENQUEUE ───────────────────────────────────────────────────────────────────
+def has_open_tasks(conn, queue: str, key: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM jobs WHERE queue = ? AND key = ? AND state IN ('pending','running') LIMIT 1",
+        (queue, key),
+    ).fetchone() is not None
+
+
+def start_chain(conn, queue: str, key: str, stage: str, payload: dict,
+                max_attempts: int = MAX_ATTEMPTS) -> bool:
+    """
+    Begin a key's pipeline at `stage`, dropping any finished or failed run of it.
+    False (and untouched) if the key still has open tasks — that run resumes.
+    """
+    with conn:
+        if has_open_tasks(conn, queue, key):
+            return False
+        conn.execute("DELETE FROM jobs WHERE queue = ? AND key = ?", (queue, key))
+        conn.execute("""
+            INSERT INTO jobs (queue, key, stage, max_attempts, payload, updated_at)
+            VALUES (?,?,?,?,?,?)
+        """, (queue, key, stage, max_attempts, json.dumps(payload), _now_iso()))
+    return True
+
+
+def last_payload(conn, queue: str, key: str, stage: str):
+    """
+    Payload of a key's finished `stage` from its last run, or None. Read it
+    before start_chain drops that run.
+    """
+    row = conn.execute(
+        "SELECT payload FROM jobs WHERE queue = ? AND key = ? AND stage = ? AND state = 'done'",
+        (queue, key, stage),
+    ).fetchone()
+    return json.loads(row[0] or "{}") if row else None
+
+
+# ── CLAIM / HEARTBEAT ─────────────────────────────────────────────────────────
+def reap_expired(conn, queue: str) -> int:
+    """Running tasks whose lease ran out → pending (or failed if out of attempts)."""
+    now = time.time()
+    with conn:
+        cur = conn.execute("""
+            UPDATE jobs SET state = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END,
+                            lease_owner = NULL, lease_until = NULL, next_run_at = ?,
+                            last_error = COALESCE(last_error, 'lease expired'), updated_at = ?
+            WHERE queue = ? AND state = 'running' AND lease_until < ?
+        """, (now, _now_iso(), queue, now))
+    return cur.rowcount
+
+
+def claim(conn, queue: str, stage: str, owner: str, lease_s: float = LEASE_S):
+    """Atomically take the next due pending task of a stage → task dict, or None."""
+    now = time.time()
+    with conn:
+        row = conn.execute("""
+            UPDATE jobs SET state = 'running', attempts = attempts + 1,
+                            lease_owner = ?, lease_until = ?, updated_at = ?
+            WHERE rowid = (SELECT rowid FROM jobs
+                           WHERE queue = ? AND stage = ? AND state = 'pending' AND next_run_at <= ?
+                           ORDER BY next_run_at, rowid LIMIT 1)
+            RETURNING key, attempts, max_attempts, payload
+        """, (owner, now + lease_s, _now_iso(), queue, stage, now)).fetchone()
+    if row is None:
+        return None
+    return {"queue": queue, "key": row[0], "stage": stage, "attempts": row[1],
+            "max_attempts": row[2], "payload": json.loads(row[3] or "{}"), "owner": owner}
+
+
+def heartbeat(conn, tasks, lease_s: float = LEASE_S):
+    """Extend the leases of tasks this owner is still working on."""
+    until = time.time() + lease_s
+    with conn:
+        conn.executemany(
+            "UPDATE jobs SET lease_until = ? WHERE queue = ? AND key = ? AND stage = ? "
+            "AND state = 'running' AND lease_owner = ?",
+            [(until, t["queue"], t["key"], t["stage"], t["owner"]) for t in tasks],
+        )
+
+
+def release(conn, tasks):
+    """Hand unfinished tasks back without using up an attempt (clean shutdown)."""
+    with conn:
+        conn.executemany(
+            "UPDATE jobs SET state = 'pending', attempts = MAX(attempts - 1, 0), lease_owner = NULL, "
+            "lease_until = NULL, next_run_at = 0, updated_at = ? "
+            "WHERE queue = ? AND key = ? AND stage = ? AND state = 'running' AND lease_owner = ?",
+            [(_now_iso(), t["queue"], t["key"], t["stage"], t["owner"]) for t in tasks],
+        )
+
+
+# ── FINISH ────────────────────────────────────────────────────────────────────
+def complete(conn, task: dict, next_stage: str = None, payload: dict = None) -> bool:
+    """
+    Mark done; enqueue the key's next stage (if any) with `payload` in the
+    same transaction. False (and nothing enqueued) if the lease was lost.
+    """
+    with conn:
+        cur = conn.execute("""
+            UPDATE jobs SET state = 'done', lease_owner = NULL, lease_until = NULL,
+                            last_error = NULL, updated_at = ?
+            WHERE queue = ? AND key = ? AND stage = ? AND state = 'running' AND lease_owner = ?
+        """, (_now_iso(), task["queue"], task["key"], task["stage"], task["owner"]))
+        if cur.rowcount == 0:
+            return False
+        if next_stage:
+            conn.execute("""
+                INSERT OR REPLACE INTO jobs (queue, key, stage, max_attempts, payload, updated_at)
+                VALUES (?,?,?,?,?,?)
+            """, (task["queue"], task["key"], next_stage, task["max_attempts"],
+                  json.dumps(payload if payload is not None else task["payload"]), _now_iso()))
+    return True
+
+
+def fail(conn, task: dict, error: str):
+    """
+    Record a failed attempt → "pending" (retried after backoff_s(attempts)),
+    "failed" (out of attempts), or None if the lease was lost.
+    """
+    state = "pending" if task["attempts"] < task["max_attempts"] else "failed"
+    delay = backoff_s(task["attempts"]) if state == "pending" else 0
+    with conn:
+        cur = conn.execute("""
+            UPDATE jobs SET state = ?, next_run_at = ?, lease_owner = NULL, lease_until = NULL,
+                            last_error = ?, updated_at = ?
+            WHERE queue = ? AND key = ? AND stage = ? AND state = 'running' AND lease_owner = ?
+        """, (state, time.time() + delay, str(error)[:500],
+              _now_iso(), task["queue"], task["key"], task["stage"], task["owner"]))
+    return state if cur.rowcount else None
+
+
+# ── STATUS ────────────────────────────────────────────────────────────────────
+def next_wakeup(conn, queue: str):
+    """Earliest time anything may become claimable — a due retry or an expiring lease — or None."""
+    row = conn.execute("""
+        SELECT MIN(CASE WHEN state = 'pending' THEN next_run_at ELSE lease_until END)
+        FROM jobs WHERE queue = ? AND state IN ('pending','running')
+    """, (queue,)).fetchone()
+    return row[0]
+
+
+def counts(conn, queue: str) -> dict:
+    """{stage: {state: n}}"""
+    out = {}
+    for stage, state, n in conn.execute(
+            "SELECT stage, state, COUNT(*) FROM jobs WHERE queue = ? GROUP BY stage, state", (queue,)):
+        out.setdefault(stage, {})[state] = n
+    return out
+
+
+def retry_failed(conn, queue: str) -> int:
+    with conn:
+        cur = conn.execute("""
+            UPDATE jobs SET state = 'pending', attempts = 0, next_run_at = 0, updated_at = ?
+            WHERE queue = ? AND state = 'failed'
+        """, (_now_iso(), queue))
+    return cur.rowcount
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Pipeline job queue status")
+    ap.add_argument("--queue", default="drhp")
+    ap.add_argument("--retry-failed", action="store_true", help="put failed tasks back to pending")
+    args = ap.parse_args()
+    if not os.path.exists(DB_PATH):
+        print(f"❌ DB not found: {DB_PATH}"); sys.exit(1)
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    try:
+        if args.retry_failed:
+            print(f"  ↻ {retry_failed(conn, args.queue)} failed task(s) back to pending")
+        for stage, states in sorted(counts(conn, args.queue).items()):
+            print(f"  {stage:<10} " + "  ".join(f"{s}:{n}" for s, n in sorted(states.items())))
+        for key, stage, attempts, err in conn.execute(
+                "SELECT key, stage, attempts, last_error FROM jobs WHERE queue = ? AND state = 'failed'",
+                (args.queue,)):
+            print(f"  ❌ {key} [{stage}] after {attempts} attempt(s): {err}")
+    except sqlite3.OperationalError:
+        print("  No jobs table yet — run drhp_scraper.py first")
@@ -0,0 +1,63 @@
+"""DRHP Search page — one question across every indexed prospectus."""
+import html
+import streamlit as st
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def _search(question, max_ipos, per_ipo):
+    from rag_retriever import search_all_ipos
+    return search_all_ipos(question, max_ipos=max_ipos, per_ipo=per_ipo)
+
+
+def render(all_ipos):
+    st.markdown("### 🔎 DRHP Search")
+    st.markdown("<div style='font-size:0.75rem;color:var(--muted);text-transform:uppercase;letter-spacing:1.5px;margin-bottom:20px;'>SEARCH EVERY PROSPECTUS · GROUPED BY IPO · PAGE CITATIONS</div>", unsafe_allow_html=True)
+
+    try:
+        import rag_retriever  # noqa: F401
+    except ImportError:
+        st.info("DRHP search needs the RAG index dependencies (sentence-transformers, numpy).")
+        return
+
+    col1, col2, col3 = st.columns([6, 1.2, 1.2])
+    with col1:
+        question = st.text_input("Search DRHPs", placeholder="e.g. customer concentration above 50% of revenue",
+                                 label_visibility="collapsed")
+    with col2:
+        max_ipos = st.selectbox("IPOs", [5, 10, 20], index=1)
+    with col3:
+        per_ipo = st.selectbox("Per IPO", [1, 2, 3, 5], index=2)
+
+    if not question.strip():
+        st.caption("Ask a question once — matching passages from every indexed DRHP are returned, best match first.")
+        return
+
+    with st.spinner("Searching DRHPs..."):
+        groups = _search(question.strip(), max_ipos, per_ipo)
+
+    if not groups:
+        st.warning("No matching passages found.")
+        return
+
+    tracked = {i["id"] for i in all_ipos}
+    st.caption(f"{len(groups)} IPO(s) matched")
+
+    for g in groups:
+        with st.expander(f"{g['company'] or g['ipo_id']} — best match {g['best_similarity']:.2f}", expanded=True):
+            for c in g["chunks"]:
+                snippet = html.escape(c["text"][:600]) + ("..." if len(c["text"]) > 600 else "")
+                st.markdown(f"""
+                <div style='border-left:3px solid var(--blue);padding:6px 12px;margin-bottom:10px;'>
+                    <div style='font-size:0.7rem;color:var(--muted);text-transform:uppercase;letter-spacing:0.8px;'>Page {c['page_number']} · similarity {c['similarity']:.2f}</div>
+                    <div style='font-size:0.85rem;line-height:1.5;margin-top:4px;'>{snippet}</div>
+                </div>
+                """, unsafe_allow_html=True)
+            if g["ipo_id"] in tracked and st.button("Analyze →", key=f"search_analyze_{g['ipo_id']}"):
+                st.session_state.selected_ipo_id = g["ipo_id"]
+                st.session_state.current_page    = "IPO Detail"
+                st.rerun()
+
+    from rag_retriever import get_query_cache_stats
+    qc = get_query_cache_stats()
+    st.caption(f"Query embedding cache: {qc['hit_rate']:.0%} hit rate · {qc['memory_hits']} memory / "
+               f"{qc['disk_hits']} disk hits · {qc['misses']} misses · {qc['memory_entries']} in memory")
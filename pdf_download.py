@@ -0,0 +1,193 @@
+"""
+pdf_download.py — Streaming, resumable DRHP/RHP downloads
+=========================================================
+RHPs run to 20–50 MB, so a download never sits in memory: it streams in
+CHUNK_SIZE blocks to <dest>.part and is moved into place with os.replace
+only once it is complete and starts like a PDF. A crash or a dropped
+connection never leaves a truncated file in data/drhp_pdfs that later
+runs would treat as cached.
+
+Resume
+  A leftover .part is continued with an HTTP Range request. The first
+  response's ETag / Last-Modified are kept next to it (<dest>.part.json)
+  and sent as If-Range, so if the file changed on the server the answer is
+  a 200 with the new file and the download starts again from byte 0 —
+  bytes of two versions are never stitched together. A .part without
+  usable validators is discarded. A server that ignores Range (200 instead
+  of 206) is downloaded again from byte 0. A 416 means the .part already
+  holds the whole file, so it is kept.
+  A connection that drops mid-transfer is retried MAX_RETRIES times,
+  each try resuming where the last one stopped. 4xx errors are not retried.
+
+Revalidation
+  Each finished download's ETag / Last-Modified goes to http_cache (scope
+  "pdf"). With revalidate=True an existing dest is checked with a
+  conditional GET: a 304 keeps the file untouched (modified=False) and
+  anything else downloads the new version. A dest with no stored
+  validators for it is kept without asking.
+
+Concurrency
+  fetch_pdf is download_pdf behind a per-host semaphore: at most
+  HOST_CONNECTIONS downloads talk to any one host at a time, so an
+  exchange's CDN never gets every RHP request at once. drhp_scraper's job
+  queue runs its download stage in DOWNLOAD_WORKERS threads, each calling
+  fetch_pdf. The queue retries a failed download later with backoff, on
+  top of the in-call retries here.
+
+  download_pdf(url, dest)              → (file_bytes, seconds, modified)
+  fetch_pdf(url, dest)                 → the same, waiting for a free slot on the url's host
+"""
+
+import os, json, time, threading, requests
+import http_cache
+from urllib.parse import urlsplit
+
+DOWNLOAD_WORKERS = int(os.environ.get("DOWNLOAD_WORKERS", 4))
+HOST_CONNECTIONS = int(os.environ.get("HOST_CONNECTIONS", 2))
+CHUNK_SIZE       = 1 << 16   # 64 KB per write
+TIMEOUT          = 60        # seconds to connect / between received blocks
+MAX_RETRIES      = 3
+RETRY_DELAY      = 2.0       # × attempt number
+HTTP_SCOPE       = "pdf"     # http_cache scope for PDF validators
+
+
+# ── CONNECTIONS ───────────────────────────────────────────────────────────────
+_local      = threading.local()
+_host_slots = {}
+_host_lock  = threading.Lock()
+
+def _session() -> requests.Session:
+    """One Session per thread — keep-alive without sharing a Session across threads."""
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def _host_slot(url: str) -> threading.BoundedSemaphore:
+    host = urlsplit(url).netloc.lower()
+    with _host_lock:
+        return _host_slots.setdefault(host, threading.BoundedSemaphore(HOST_CONNECTIONS))
+
+
+def _is_pdf(path: str) -> bool:
+    with open(path, "rb") as f:
+        return b"%PDF-" in f.read(1024)   # the spec allows junk before the header
+
+
+# ── PARTIAL DOWNLOADS ─────────────────────────────────────────────────────────
+def _save_part_validators(part: str, url: str, headers):
+    """Note which version of the file `part` holds; no validators → it cannot be resumed."""
+    saved = {k: headers.get(k) for k in ("ETag", "Last-Modified") if headers.get(k)}
+    if not saved:
+        _drop(part + ".json")
+        return
+    with open(part + ".json", "w", encoding="utf-8") as f:
+        json.dump({"url": url, **saved}, f)
+
+
+def _part_validators(part: str, url: str):
+    """The validators saved when `part` was started, or None if unknown."""
+    try:
+        with open(part + ".json", encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return saved if saved.get("url") == url else None
+
+
+def _if_range(saved: dict):
+    """If-Range value: a strong ETag, else Last-Modified (weak ETags are not allowed there)."""
+    etag = saved.get("ETag")
+    return etag if etag and not etag.startswith("W/") else saved.get("Last-Modified")
+
+
+def _same_version(saved: dict, headers) -> bool:
+    """A 206 is for the version the .part holds — for servers that ignore If-Range."""
+    for k in ("ETag", "Last-Modified"):
+        if saved.get(k) and headers.get(k):
+            return saved[k] == headers[k]
+    return True
+
+
+def _drop(path: str):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+# ── DOWNLOAD ──────────────────────────────────────────────────────────────────
+def download_pdf(url: str, dest: str, headers: dict = None, revalidate: bool = False) -> tuple:
+    """
+    Stream url → dest via dest.part, resuming a previous partial download.
+    revalidate: dest exists — replace it only if the server has a newer version.
+    """
+    part = dest + ".part"
+    t0   = time.perf_counter()
+    cond = {}
+    if revalidate and os.path.exists(dest) and not os.path.exists(part):
+        entry = http_cache.load(url, HTTP_SCOPE)
+        if entry and entry.get("file") == os.path.basename(dest):   # validators describe this file
+            cond = http_cache.conditional_headers(url, HTTP_SCOPE, entry)
+        if not cond:   # nothing to compare against — keep dest
+            return os.path.getsize(dest), 0.0, False
+    validators = None
+    for attempt in range(1, MAX_RETRIES + 1):
+        have  = os.path.getsize(part) if os.path.exists(part) else 0
+        saved = _part_validators(part, url) if have else None
+        hdrs  = dict(headers or {})
+        if have and saved and _if_range(saved):
+            hdrs["Range"]    = f"bytes={have}-"
+            hdrs["If-Range"] = _if_range(saved)
+        elif have:   # no way to tell which version the .part holds
+            have = 0
+        if not have and cond:
+            hdrs.update(cond)
+        try:
+            with _session().get(url, headers=hdrs, timeout=TIMEOUT, stream=True) as r:
+                if r.status_code == 304 and cond and not have:   # dest is current
+                    return os.path.getsize(dest), time.perf_counter() - t0, False
+                if r.status_code == 416 and have:   # nothing left to fetch
+                    validators = validators or saved
+                    break
+                r.raise_for_status()
+                if have and r.status_code == 206 and not _same_version(saved, r.headers):
+                    _drop(part)
+                    raise requests.ConnectionError("file changed on the server since the .part was started")
+                if have and r.status_code != 206:    # Range ignored or file changed — full body follows
+                    have = 0
+                if not have:
+                    _save_part_validators(part, url, r.headers)
+                if r.headers.get("ETag") or r.headers.get("Last-Modified"):
+                    validators = r.headers
+                else:
+                    validators = saved if have else None
+                expected = int(r.headers.get("Content-Length") or 0)
+                got = 0
+                with open(part, "ab" if have else "wb") as f:
+                    for block in r.iter_content(CHUNK_SIZE):
+                        f.write(block)
+                        got += len(block)
+            if expected and got < expected:
+                raise requests.ConnectionError(f"connection closed at {have + got:,} of {have + expected:,} bytes")
+            break
+        except requests.RequestException as e:
+            status = getattr(e.response, "status_code", None)
+            if attempt == MAX_RETRIES or (status and status < 500):
+                raise
+            kept = os.path.getsize(part) if os.path.exists(part) else 0
+            print(f"    ↻ {e} — retrying from {kept // 1024}KB ({attempt}/{MAX_RETRIES})")
+            time.sleep(RETRY_DELAY * attempt)
+
+    _drop(part + ".json")
+    if not _is_pdf(part):
+        os.remove(part)   # an HTML error page, not something to resume
+        raise ValueError("response is not a PDF")
+    os.replace(part, dest)
+    if validators is not None:
+        http_cache.remember(url, HTTP_SCOPE, validators, file=os.path.basename(dest))
+    return os.path.getsize(dest), time.perf_counter() - t0, True
+
+
+def fetch_pdf(url: str, dest: str, headers: dict = None, revalidate: bool = False) -> tuple:
+    """download_pdf under the per-host cap — safe to call from any number of threads."""
+    with _host_slot(url):
+        return download_pdf(url, dest, headers, revalidate)
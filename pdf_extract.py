@@ -0,0 +1,353 @@
+"""
+pdf_extract.py — Parallel page-text extraction for DRHP/RHP PDFs
+================================================================
+pdfplumber's extract_text is pure Python and single-core; a 300–600 page
+RHP is the slowest stage of the nightly pipeline. Pages are independent,
+so the document is cut into contiguous page ranges and each range is
+extracted in its own process (each worker opens the PDF itself — only the
+path and the page range cross the process boundary).
+
+Engines (PDF_ENGINE env var):
+  auto        pdfium for running text, pdfplumber for pages that look like
+              tables (default) — pdfplumber's layout-aware rows keep
+              financial tables readable, pdfium is ~50x faster elsewhere
+  pdfium      pypdfium2 only (installed with pdfplumber)
+  pymupdf     PyMuPDF only (pip install pymupdf)
+  pdfplumber  pdfplumber only — the original behaviour
+bench_extraction.py compares their speed and text similarity.
+
+  extract_page_texts(pdf_path) → [(page_number, raw_text), ...] in page order
+
+Raw text only: every page is returned (empty string if it failed or has no
+text layer) and each caller applies its own cleaning.
+
+Page-text cache
+  get_page_texts(pdf_path, conn) → same result, stored in drhp.db keyed by
+  the PDF's sha256. drhp_scraper (sections) and rag_indexer (chunks) read
+  the same pages, so whichever stage touches a PDF first extracts it and
+  every later stage — and every re-run — reads it back from SQLite.
+
+  An entry may be partial: drhp_scraper's TOC path extracts only the
+  section pages and stores just those (store_page_texts with total=).
+  load_page_texts only returns complete entries. get_page_texts and
+  rag_indexer extract the missing pages and complete the entry
+  (complete_page_texts).
+
+Entries are tied to the engine and its version; switching PDF_ENGINE
+re-extracts.
+
+Workers: PDF_WORKERS env var (default: CPU count, capped at 8).
+Small PDFs (< PARALLEL_MIN_PAGES) and single-worker setups run serially —
+process start-up costs more than it saves there.
+"""
+
+import os, re, zlib, sqlite3, hashlib, importlib.util
+import pdfplumber
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+try:
+    import pypdfium2 as pdfium
+except ImportError:   # pdfplumber < 0.10 — pdfplumber-only extraction
+    pdfium = None
+
+PDF_WORKERS        = int(os.environ.get("PDF_WORKERS", 0)) or min(8, os.cpu_count() or 1)
+PARALLEL_MIN_PAGES = 40    # below this, extract serially
+SHARDS_PER_WORKER  = 4     # more, smaller ranges → better balance across uneven pages
+
+ENGINES            = ("auto", "pdfium", "pymupdf", "pdfplumber")
+PDF_ENGINE         = os.environ.get("PDF_ENGINE", "auto").lower()
+TABLE_MIN_LINES    = 5     # a page is tabular with at least this many mostly-numeric lines...
+TABLE_LINE_SHARE   = 0.3   # ...making up at least this share of its lines
+_NUMBER            = re.compile(r"^\(?[-–]?[₹$]?\d[\d,]*(?:\.\d+)?%?\)?$")
+
+
+# ── ENGINES ───────────────────────────────────────────────────────────────────
+def resolve_engine(engine: str = None) -> str:
+    engine = (engine or PDF_ENGINE).lower()
+    if engine not in ENGINES:
+        print(f"    ⚠ Unknown PDF_ENGINE '{engine}' — using auto")
+        engine = "auto"
+    if engine == "pymupdf" and importlib.util.find_spec("fitz") is None:
+        print("    ⚠ PDF_ENGINE=pymupdf but PyMuPDF is not installed — using auto")
+        engine = "auto"
+    if engine in ("auto", "pdfium") and pdfium is None:
+        return "pdfplumber"
+    return engine
+
+
+def looks_tabular(text: str) -> bool:
+    """
+    Financial-table heuristic: many lines that are at least half numbers.
+    Holds for both layouts a fast engine produces — whole rows
+    ("Total income 50,987.35 6,911.90") or, when the PDF draws tables
+    column by column, one cell per line.
+    """
+    lines = [l.split() for l in text.splitlines() if l.strip()]
+    if len(lines) < TABLE_MIN_LINES:
+        return False
+    numeric = sum(1 for toks in lines if 2 * sum(1 for t in toks if _NUMBER.match(t)) >= len(toks))
+    return numeric >= TABLE_MIN_LINES and numeric >= TABLE_LINE_SHARE * len(lines)
+
+
+def _pdfplumber_pages(pdf_path, indices, kwargs) -> dict:
+    out = {}
+    with pdfplumber.open(pdf_path) as pdf:
+        for i in indices:
+            page = pdf.pages[i]
+            try:
+                out[i] = page.extract_text(**kwargs) or ""
+            except Exception:
+                out[i] = ""
+            page.close()   # drop the page's parsed layout — keeps worker memory flat
+    return out
+
+
+def _pdfium_pages(pdf_path, start, end) -> dict:
+    out = {}
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        for i in range(start, end):
+            try:
+                page = pdf[i]
+                textpage = page.get_textpage()
+                text = textpage.get_text_range()
+                textpage.close(); page.close()
+            except Exception:
+                text = ""
+            # pdfium: CRLF line ends, U+FFFE / \x02 for soft hyphens
+            out[i] = text.replace("\r\n", "\n").replace("\r", "\n").replace("\ufffe", "").replace("\x02", "")
+    finally:
+        pdf.close()
+    return out
+
+
+def _pymupdf_pages(pdf_path, start, end) -> dict:
+    import fitz
+    out = {}
+    with fitz.open(pdf_path) as pdf:
+        for i in range(start, end):
+            try:
+                out[i] = pdf[i].get_text("text")
+            except Exception:
+                out[i] = ""
+    return out
+
+
+def page_count(pdf_path) -> int:
+    if pdfium is not None:
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+def _extract_range(job) -> list:
+    """Worker: extract pages [start, end) of one PDF. Must stay top-level (pickled)."""
+    pdf_path, start, end, kwargs, engine = job
+    if engine == "pdfplumber":
+        texts = _pdfplumber_pages(pdf_path, range(start, end), kwargs)
+    else:
+        try:
+            texts = (_pymupdf_pages if engine == "pymupdf" else _pdfium_pages)(pdf_path, start, end)
+        except Exception:   # unreadable for the fast engine — pdfplumber is more forgiving
+            texts = _pdfplumber_pages(pdf_path, range(start, end), kwargs)
+            engine = "pdfplumber"
+        if engine == "auto":
+            tables = [i for i, t in texts.items() if looks_tabular(t)]
+            if tables:
+                texts.update(_pdfplumber_pages(pdf_path, tables, kwargs))
+    return [(i + 1, texts[i]) for i in range(start, end)]
+
+
+def _shards(total: int, workers: int) -> list:
+    n    = min(total, workers * SHARDS_PER_WORKER)
+    step = -(-total // n)
+    return [(s, min(s + step, total)) for s in range(0, total, step)]
+
+
+def extract_page_texts(pdf_path, workers: int = None, engine: str = None, **extract_kwargs) -> list:
+    """
+    Ordered (page_number, text) for every page of the PDF.
+    extract_kwargs are passed to pdfplumber's page.extract_text.
+    """
+    workers = workers or PDF_WORKERS
+    engine  = resolve_engine(engine)
+    total   = page_count(pdf_path)
+    if workers <= 1 or total < PARALLEL_MIN_PAGES:
+        return _extract_range((pdf_path, 0, total, extract_kwargs, engine))
+
+    jobs = [(pdf_path, s, e, extract_kwargs, engine) for s, e in _shards(total, workers)]
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as ex:
+            return [page for shard in ex.map(_extract_range, jobs) for page in shard]
+    except Exception as e:
+        # No fork/spawn available (sandboxed host) or a worker died — do it here
+        print(f"    ⚠ Parallel extraction failed ({e}) — extracting serially")
+        return _extract_range((pdf_path, 0, total, extract_kwargs, engine))
+
+
+def extract_selected_pages(pdf_path, page_numbers, engine: str = None, workers: int = 1,
+                           **extract_kwargs) -> list:
+    """
+    (page_number, text) for just the given 1-based pages — for callers that
+    know which pages they need (pdf_toc, completing a partial cache entry).
+    Out-of-range numbers are ignored. Serial unless workers > 1 and there
+    are at least PARALLEL_MIN_PAGES pages.
+    """
+    engine = resolve_engine(engine)
+    total  = page_count(pdf_path)
+    wanted = sorted({n for n in page_numbers if 1 <= n <= total})
+    runs   = []   # contiguous [start, end) index ranges
+    for n in wanted:
+        if runs and runs[-1][1] == n - 1:
+            runs[-1][1] = n
+        else:
+            runs.append([n - 1, n])
+    jobs = [(pdf_path, s, e, extract_kwargs, engine) for s, e in runs]
+    if workers > 1 and len(wanted) >= PARALLEL_MIN_PAGES:
+        step = -(-len(wanted) // (workers * SHARDS_PER_WORKER))   # cut long runs for balance
+        jobs = [(pdf_path, i, min(i + step, e), extract_kwargs, engine)
+                for s, e in runs for i in range(s, e, step)]
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as ex:
+                return [page for shard in ex.map(_extract_range, jobs) for page in shard]
+        except Exception as e:
+            print(f"    ⚠ Parallel extraction failed ({e}) — extracting serially")
+    return [page for job in jobs for page in _extract_range(job)]
+
+
+# ── PAGE-TEXT CACHE ───────────────────────────────────────────────────────────
+def extractor_tag(engine: str = None) -> str:
+    """Cache tag: engine + library versions (+ table heuristic for auto)."""
+    from importlib.metadata import version
+    engine  = resolve_engine(engine)
+    plumber = f"pdfplumber {pdfplumber.__version__}"
+    if engine == "pdfplumber":
+        return plumber
+    if engine == "pymupdf":
+        return f"pymupdf {version('PyMuPDF')}"
+    fast = f"pdfium {version('pypdfium2')}"
+    if engine == "pdfium":
+        return fast
+    return f"auto {fast} + {plumber} tables>={TABLE_MIN_LINES}/{TABLE_LINE_SHARE}"
+
+EXTRACTOR = extractor_tag()
+
+def init_page_cache(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pdf_docs (
+            pdf_sha256    TEXT PRIMARY KEY,
+            page_count    INTEGER NOT NULL,
+            extractor     TEXT NOT NULL,
+            extracted_at  TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pdf_pages (
+            pdf_sha256    TEXT NOT NULL,
+            page_number   INTEGER NOT NULL,
+            text          BLOB,            -- zlib-compressed UTF-8
+            PRIMARY KEY (pdf_sha256, page_number)
+        ) WITHOUT ROWID
+    """)
+
+
+def file_sha256(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_cached_pages(conn, digest: str) -> dict:
+    """{page_number: text} of whatever is cached for a PDF hash — complete or partial."""
+    try:
+        doc = conn.execute(
+            "SELECT extractor FROM pdf_docs WHERE pdf_sha256 = ?", (digest,)
+        ).fetchone()
+    except sqlite3.OperationalError:   # cache tables not created yet
+        return {}
+    if not doc or doc[0] != EXTRACTOR:
+        return {}
+    return {n: zlib.decompress(blob).decode("utf-8") for n, blob in conn.execute(
+        "SELECT page_number, text FROM pdf_pages WHERE pdf_sha256 = ?", (digest,))}
+
+
+def load_page_texts(conn, digest: str):
+    """Cached pages for a PDF hash if the entry is complete, else None. Works on read-only connections too."""
+    try:
+        doc = conn.execute(
+            "SELECT page_count, extractor FROM pdf_docs WHERE pdf_sha256 = ?", (digest,)
+        ).fetchone()
+    except sqlite3.OperationalError:   # cache tables not created yet
+        return None
+    if not doc or doc[1] != EXTRACTOR:
+        return None
+    rows = conn.execute(
+        "SELECT page_number, text FROM pdf_pages WHERE pdf_sha256 = ? ORDER BY page_number", (digest,)
+    ).fetchall()
+    if len(rows) != doc[0]:
+        return None
+    return [(n, zlib.decompress(blob).decode("utf-8")) for n, blob in rows]
+
+
+def store_page_texts(conn, digest: str, pages: list, total: int = None):
+    """
+    Store a PDF's pages. total=None: `pages` is the whole document and
+    replaces the entry. total=N: `pages` is a subset of an N-page document,
+    merged into what is already cached (a partial entry).
+    """
+    init_page_cache(conn)
+    with conn:   # one transaction — a crash never leaves a half-stored document
+        doc = conn.execute("SELECT extractor FROM pdf_docs WHERE pdf_sha256 = ?", (digest,)).fetchone()
+        if total is None or not doc or doc[0] != EXTRACTOR:
+            conn.execute("DELETE FROM pdf_pages WHERE pdf_sha256 = ?", (digest,))
+        conn.executemany(
+            "INSERT OR REPLACE INTO pdf_pages (pdf_sha256, page_number, text) VALUES (?,?,?)",
+            [(digest, n, zlib.compress(t.encode("utf-8"), 6)) for n, t in pages],
+        )
+        conn.execute("""
+            INSERT OR REPLACE INTO pdf_docs (pdf_sha256, page_count, extractor, extracted_at)
+            VALUES (?,?,?,?)
+        """, (digest, len(pages) if total is None else total, EXTRACTOR, datetime.now().isoformat()))
+
+
+def complete_page_texts(pdf_path, cached: dict = None, workers: int = None) -> list:
+    """Every page of the PDF, extracting only the pages missing from `cached` ({n: text})."""
+    if not cached:
+        return extract_page_texts(pdf_path, workers=workers)
+    total = page_count(pdf_path)
+    pages = dict(cached)
+    pages.update(extract_selected_pages(pdf_path, [n for n in range(1, total + 1) if n not in cached],
+                                        workers=workers or PDF_WORKERS))
+    return [(n, pages.get(n, "")) for n in range(1, total + 1)]
+
+
+def get_page_texts(pdf_path, conn=None, workers: int = None, collect: list = None) -> list:
+    """
+    extract_page_texts through the drhp.db page cache.
+    conn must be a writable connection; None → no caching.
+    With `collect`, newly extracted pages are appended to it as
+    (digest, pages, None) instead of stored — conn is then only read (a
+    worker's read-only connection), and the caller's writer stores them.
+    """
+    if conn is None:
+        return extract_page_texts(pdf_path, workers=workers)
+    digest = file_sha256(pdf_path)
+    pages  = load_page_texts(conn, digest)
+    if pages is not None:
+        print(f"    Page text cache hit ({len(pages)} pages)")
+        return pages
+    cached = load_cached_pages(conn, digest)
+    if cached:
+        print(f"    Page text cache: {len(cached)} pages cached, extracting the rest")
+    pages = complete_page_texts(pdf_path, cached, workers)
+    if collect is not None:
+        collect.append((digest, pages, None))
+    else:
+        store_page_texts(conn, digest, pages)
+    return pages
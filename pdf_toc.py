@@ -0,0 +1,195 @@
+"""
+pdf_toc.py — Table-of-contents lookup for DRHP/RHP PDFs
+=======================================================
+SEBI filings open with a table of contents, and most carry PDF bookmarks
+too. Reading it tells a caller which pages hold a section, so it can
+extract those pages instead of all 300–600.
+
+  toc_entries(pdf_path, read) → ([(title, page_number), ...], source)
+
+page_number is the 1-based physical page; source is "outline", "toc" or
+None (nothing usable found → the caller falls back to a full-text scan).
+
+  1. Outline   — PDF bookmarks already point at physical pages.
+  2. Printed   — the contents page in the first TOC_SCAN_PAGES pages,
+                 lines like "RISK FACTORS ........ 27". Printed numbers
+                 start after the cover and front matter, so they are
+                 calibrated to physical pages by an offset taken from
+                 page labels, footer page numbers, or by probing
+                 0..MAX_PAGE_OFFSET. Every candidate offset must put
+                 the entry titles on the pages it predicts.
+
+`read(page_numbers) → {page_number: text}` supplies page text. Use
+page_reader(pdf_path) for a memoised pdf_extract reader. Pass whatever the
+page-text cache holds as `cached`; only the pages it lacks are extracted.
+"""
+
+import re
+from collections import Counter
+from pdf_extract import extract_selected_pages, page_count, pdfium
+
+TOC_SCAN_PAGES  = 25    # the printed contents sits within the first pages
+TOC_MIN_ENTRIES = 6     # a page with fewer "title … number" lines is not a contents page
+MAX_PAGE_OFFSET = 60    # cover + front-matter pages before printed page 1
+CALIBRATE_CHECK = 5     # entry titles verified per candidate offset (2 must match)
+TITLE_LINES     = 12    # a section title must appear this close to the top of its page
+
+_TOC_LINE = re.compile(r"^(?P<title>.*?[A-Za-z].*?)\s*(?:\.{2,}|…+|_{2,}|\s)\s*(?P<page>\d{1,4})$")
+_FOOTER   = re.compile(r"^(?:page\s+)?(\d{1,4})$", re.IGNORECASE)
+
+
+def page_reader(pdf_path, cached=None, fresh: dict = None):
+    """
+    read(page_numbers) → {n: text}; each page is extracted at most once.
+    cached: pages already known ({n: text} or [(n, text)], possibly partial).
+    fresh:  a dict that collects the pages this reader extracted, for the
+            caller to add to the page cache.
+    """
+    memo  = dict(cached or {})
+    total = []   # page count, looked up on the first miss
+
+    def read(page_numbers) -> dict:
+        missing = [n for n in page_numbers if n not in memo]
+        if missing:
+            if not total:
+                total.append(page_count(pdf_path))
+            missing = [n for n in missing if 1 <= n <= total[0]]
+        if missing:
+            got = dict(extract_selected_pages(pdf_path, missing))
+            memo.update(got)
+            if fresh is not None:
+                fresh.update(got)
+        return {n: memo.get(n, "") for n in page_numbers}
+    return read
+
+
+def _norm(text: str) -> str:
+    return " ".join(re.sub(r"[^A-Z0-9]+", " ", text.upper()).split())
+
+
+def title_on_page(title: str, text: str) -> bool:
+    head = _norm("\n".join([l for l in text.splitlines() if l.strip()][:TITLE_LINES]))
+    return bool(_norm(title)) and _norm(title) in head
+
+
+# ── OUTLINE ───────────────────────────────────────────────────────────────────
+def read_outline(pdf_path) -> list:
+    """Bookmarks as [(title, page_number)] in outline order; [] if none."""
+    if pdfium is None:
+        return []
+    entries = []
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        for bm in pdf.get_toc():
+            dest  = bm.get_dest()
+            index = dest.get_index() if dest is not None else None
+            title = (bm.get_title() or "").strip()
+            if title and index is not None:
+                entries.append((title, index + 1))
+    except Exception:
+        return []
+    finally:
+        pdf.close()
+    return entries
+
+
+# ── PRINTED TABLE OF CONTENTS ─────────────────────────────────────────────────
+def parse_printed_toc(pages: dict) -> tuple:
+    """
+    (entries, last_toc_page) from the first run of contents pages:
+    entries are [(title, printed_page)] with printed pages non-decreasing.
+    """
+    entries, last = [], None
+    for n in sorted(pages):
+        found = []
+        for line in pages[n].splitlines():
+            m = _TOC_LINE.match(line.strip())
+            if m and len(m.group("title")) >= 4:
+                found.append((m.group("title").strip(" .…_"), int(m.group("page"))))
+        if len(found) >= TOC_MIN_ENTRIES:
+            entries += found
+            last = n
+        elif entries:
+            break   # contents ended
+    kept, high = [], 0
+    for title, page in entries:   # drop stray lines (dates, amounts) that break the page order
+        if page >= high:
+            kept.append((title, page))
+            high = page
+    return kept, last
+
+
+def _label_offsets(pdf_path) -> list:
+    if pdfium is None:
+        return []
+    offsets = Counter()
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        for i in range(len(pdf)):
+            label = pdf.get_page_label(i)
+            if label.isdigit():
+                offsets[i + 1 - int(label)] += 1
+    except Exception:
+        return []
+    finally:
+        pdf.close()
+    return [o for o, _ in offsets.most_common(2)]
+
+
+def _footer_offsets(pages: dict, after: int) -> list:
+    """Offsets implied by bare page numbers printed at the top or bottom of pages."""
+    offsets = Counter()
+    for n, text in pages.items():
+        lines = [l.strip() for l in text.splitlines() if l.strip()]
+        if n <= after or not lines:
+            continue
+        for line in (lines[-1], lines[0]):
+            m = _FOOTER.match(line)
+            if m and 0 <= n - int(m.group(1)) <= MAX_PAGE_OFFSET:
+                offsets[n - int(m.group(1))] += 1
+                break
+    return [o for o, _ in offsets.most_common(2)]
+
+
+def calibrate_offset(entries: list, read, total: int, candidates=(), after: int = 0) -> int:
+    """
+    Physical = printed + offset for the first offset the titles agree with,
+    else None. Pages up to `after` (the contents itself) never count.
+    """
+    checks = entries[:CALIBRATE_CHECK]
+    need   = min(2, len(checks))
+    tried  = set()
+    for offset in [*candidates, *range(0, MAX_PAGE_OFFSET + 1)]:
+        if offset in tried:
+            continue
+        tried.add(offset)
+        hits = 0
+        for i, (title, printed) in enumerate(checks):
+            n = printed + offset
+            if after < n <= total and title_on_page(title, read([n])[n]):
+                hits += 1
+            if hits >= need or hits + len(checks) - i - 1 < need:
+                break   # decided either way
+        if hits >= need:
+            return offset
+    return None
+
+
+def toc_entries(pdf_path, read=None) -> tuple:
+    """([(title, page_number)], source) — see module docstring."""
+    outline = read_outline(pdf_path)
+    if len(outline) >= TOC_MIN_ENTRIES:
+        return outline, "outline"
+
+    read    = read or page_reader(pdf_path)
+    total   = page_count(pdf_path)
+    scanned = read(range(1, min(TOC_SCAN_PAGES, total) + 1))
+    printed, toc_page = parse_printed_toc(scanned)
+    if not printed:
+        return [], None
+    body   = [(t, p) for t, p in printed if p >= 1]
+    offset = calibrate_offset(body, read, total,
+                              _label_offsets(pdf_path) + _footer_offsets(scanned, toc_page), toc_page)
+    if offset is None:
+        return [], None
+    return [(t, p + offset) for t, p in body if 1 <= p + offset <= total], "toc"
@@ -13,8 +13,11 @@ Requirements:
     pip install pinecone python-dotenv
 """
 
-import os, json, sqlite3, time
+import os, sqlite3, time
+from datetime import datetime
 from dotenv import load_dotenv
+from embeddings import unpack_embedding
+from rag_manifest import init_manifest_table, mark_pushed, export_json
 
 load_dotenv()
 
@@ -96,9 +99,9 @@ def migrate():
     total_uploaded = 0
     batch          = []
 
-    for chunk_id, ipo_id, company, page_number, chunk_index, text, embedding_json in rows:
+    for chunk_id, ipo_id, company, page_number, chunk_index, text, embedding_blob in rows:
         try:
-            embedding = json.loads(embedding_json)
+            embedding = unpack_embedding(embedding_blob).tolist()
         except Exception:
             continue
 
@@ -140,12 +143,16 @@ def migrate():
     # Show breakdown by IPO
     print("\n  Vectors by IPO:")
     conn = sqlite3.connect(DB_PATH)
+    init_manifest_table(conn)
     ipos = conn.execute(
         "SELECT ipo_id, company, COUNT(*) FROM chunks GROUP BY ipo_id ORDER BY ipo_id"
     ).fetchall()
-    conn.close()
+    pushed_at = datetime.now().isoformat()
     for ipo_id, company, count in ipos:
+        mark_pushed(conn, ipo_id, pushed_at)
         print(f"    {ipo_id} | {company:30s} | {count} chunks")
+    export_json(conn)
+    conn.close()
 
     print("\n" + "="*60)
     print("  Migration complete.")
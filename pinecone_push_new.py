@@ -4,12 +4,23 @@ pinecone_push_new.py — Incremental Pinecone sync
 Uploads ONLY chunks that are in SQLite but NOT yet in Pinecone.
 Safe to run on every pipeline run — skips already-uploaded chunks.
 
+What is "already uploaded" comes from the rag_manifest table
+(pushed_to_pinecone_at, reset whenever an IPO's content hash changes) —
+no per-IPO Pinecone probes.
+
+Re-indexed IPOs are synced as a delta: only chunks indexed after the IPO's
+last push are upserted, and chunk ids the indexer removed (chunk_tombstones)
+are deleted from Pinecone.
+
 Used by GitHub Actions after rag_indexer.py runs on new IPOs.
 For full re-upload of everything, use pinecone_migrate.py instead.
 """
 
-import os, json, sqlite3, time
+import os, sqlite3, time
 from dotenv import load_dotenv
+from embeddings import unpack_embedding
+from rag_manifest import (init_manifest_table, get_entry, mark_pushed,
+                          pushed_elsewhere, export_json)
 
 load_dotenv()
 
@@ -32,47 +43,29 @@ def get_index():
     return pc.Index(INDEX_NAME)
 
 
-def get_indexed_ipo_ids(index):
-    """Get set of ipo_ids already in Pinecone."""
-    try:
-        stats = index.describe_index_stats()
-        # Query each known ipo_id with a zero vector to check existence
-        # More efficient: get all unique ipo_ids from SQLite, check each
-        return set()  # Will check per-IPO below
-    except Exception as e:
-        print(f"  Warning: could not get index stats: {e}")
-        return set()
-
-
-def ipo_already_in_pinecone(index, ipo_id):
-    """Check if this IPO has any vectors in Pinecone."""
-    try:
-        results = index.query(
-            vector=[0.0] * 384,
-            top_k=1,
-            filter={"ipo_id": {"$eq": ipo_id}},
-            include_metadata=False,
-        )
-        return len(results.matches) > 0
-    except Exception:
+def ipo_already_in_pinecone(conn, ipo_id):
+    """Manifest lookup — pushed, and the content hasn't changed since."""
+    entry = get_entry(conn, ipo_id)
+    if not entry:
         return False
+    if entry["pushed_to_pinecone_at"]:
+        return True
+    # Fresh DB (e.g. CI) — the JSON manifest may already record this exact content
+    if pushed_elsewhere(entry):
+        mark_pushed(conn, ipo_id)
+        return True
+    return False
 
 
-def get_new_ipo_ids(index):
+def get_new_ipo_ids(conn):
     """Return ipo_ids that are in SQLite but not yet in Pinecone."""
-    if not os.path.exists(DB_PATH):
-        print("  drhp.db not found — nothing to upload")
-        return []
-
-    conn = sqlite3.connect(DB_PATH)
     all_ids = [r[0] for r in conn.execute(
-        "SELECT DISTINCT ipo_id FROM chunks WHERE embedding IS NOT NULL"
+        "SELECT ipo_id FROM rag_manifest WHERE chunk_count > 0 ORDER BY ipo_id"
     ).fetchall()]
-    conn.close()
 
     new_ids = []
     for ipo_id in all_ids:
-        if not ipo_already_in_pinecone(index, ipo_id):
+        if not ipo_already_in_pinecone(conn, ipo_id):
             new_ids.append(ipo_id)
             print(f"  New IPO to upload: {ipo_id}")
         else:
@@ -81,15 +74,33 @@ def get_new_ipo_ids(index):
     return new_ids
 
 
-def upload_ipo_chunks(index, ipo_id):
-    """Upload all chunks for a single IPO to Pinecone."""
+def delete_tombstoned(index, conn):
+    """Delete chunk ids removed by incremental re-indexing, then forget them."""
+    if not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='chunk_tombstones'"
+    ).fetchone():
+        return 0
+    ids = [r[0] for r in conn.execute("SELECT chunk_id FROM chunk_tombstones").fetchall()]
+    for i in range(0, len(ids), 1000):
+        batch = ids[i:i+1000]
+        index.delete(ids=batch)
+        conn.executemany("DELETE FROM chunk_tombstones WHERE chunk_id = ?", [(c,) for c in batch])
+        conn.commit()
+    if ids:
+        print(f"  🗑  Deleted {len(ids)} removed chunk(s) from Pinecone")
+    return len(ids)
+
+
+def upload_ipo_chunks(index, ipo_id, since=None):
+    """Upload an IPO's chunks to Pinecone — only those indexed after `since` if given."""
     conn = sqlite3.connect(DB_PATH)
     rows = conn.execute("""
         SELECT chunk_id, ipo_id, company, page_number, chunk_index, text, embedding
         FROM chunks
         WHERE ipo_id = ? AND embedding IS NOT NULL
+          AND (? IS NULL OR indexed_at > ?)
         ORDER BY chunk_index
-    """, (ipo_id,)).fetchall()
+    """, (ipo_id, since, since)).fetchall()
     conn.close()
 
     if not rows:
@@ -99,9 +110,9 @@ def upload_ipo_chunks(index, ipo_id):
     batch = []
     total = 0
 
-    for chunk_id, ipo_id, company, page_number, chunk_index, text, embedding_json in rows:
+    for chunk_id, ipo_id, company, page_number, chunk_index, text, embedding_blob in rows:
         try:
-            embedding = json.loads(embedding_json)
+            embedding = unpack_embedding(embedding_blob).tolist()
         except Exception:
             continue
 
@@ -139,22 +150,37 @@ def main():
     if not index:
         return
 
+    if not os.path.exists(DB_PATH):
+        print("  drhp.db not found — nothing to upload")
+        return
+    conn = sqlite3.connect(DB_PATH)
+    init_manifest_table(conn)
+
+    delete_tombstoned(index, conn)
+
     print("\n  Checking for new IPOs not yet in Pinecone...")
-    new_ids = get_new_ipo_ids(index)
+    new_ids = get_new_ipo_ids(conn)
 
     if not new_ids:
         print("\n  ✅ All IPOs already in Pinecone — nothing to upload")
+        export_json(conn)
+        conn.close()
         return
 
     print(f"\n  Found {len(new_ids)} new IPO(s) to upload: {new_ids}")
 
     total_uploaded = 0
     for ipo_id in new_ids:
-        print(f"\n  Uploading {ipo_id}...")
-        count = upload_ipo_chunks(index, ipo_id)
+        since = get_entry(conn, ipo_id)["last_pushed_at"]
+        print(f"\n  Uploading {ipo_id}" + (f" (changes since {since})..." if since else "..."))
+        count = upload_ipo_chunks(index, ipo_id, since)
+        mark_pushed(conn, ipo_id)
         print(f"  ✅ {ipo_id}: {count} chunks uploaded")
         total_uploaded += count
 
+    export_json(conn)
+    conn.close()
+
     stats = index.describe_index_stats()
     print(f"\n  Total vectors in Pinecone: {stats.total_vector_count}")
     print(f"  Uploaded this run: {total_uploaded}")
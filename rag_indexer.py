@@ -15,16 +15,41 @@ Result: chunks follow actual content structure.
 "Basis for Offer Price" stays together as one chunk.
 Financial tables don't get cut mid-row.
 
-No section labels stored — retrieval uses pure cosine similarity.
+Runs as a stream (pages → sentences → windowed embedding → online boundary
+detection → batched DB writes), so memory stays flat on 600-page RHPs and
+a crash mid-document keeps every chunk already written. With --workers,
+each worker process reads the DB and embeds one IPO at a time while the
+main process is the single writer (see INDEX EVENTS below).
+
+Sentence embeddings are cached across filings (sentence_embeddings table),
+so SEBI boilerplate shared between DRHPs is encoded once; each run prints
+its cache hit rate.
 
-Run: python rag_indexer.py
-Re-run safely — already-indexed IPOs are skipped.
+No section labels stored — retrieval uses pure cosine similarity.
+Embeddings are stored as packed float32 BLOBs (see embeddings.py).
+
+Run: python rag_indexer.py            # new IPOs + IPOs whose PDF changed
+     python rag_indexer.py --force    # re-check every IPO
+     python rag_indexer.py --full     # drop and rebuild every IPO
+     python rag_indexer.py --workers 4   # index 4 IPOs at once (combines with the above)
+Re-run safely — unchanged IPOs are skipped, and a changed PDF (e.g. the RHP
+replacing the DRHP) only re-chunks and re-embeds the pages that changed.
 """
 
-import os, json, re, sqlite3, time
+import os, re, sqlite3, time, hashlib, multiprocessing
 import numpy as np
-import pdfplumber
 from datetime import datetime
+from embeddings import (EMBEDDING_BACKEND, embedding_model_id, load_embedding_model,
+                        pack_embedding, unpack_embedding, migrate_json_embeddings)
+from ann_index import ANN_DIR, build_ann_index
+from rag_manifest import init_manifest_table, update_manifest, export_json
+from drhp_db import get_write_connection, close_write_connection, get_read_connection
+from pdf_extract import (complete_page_texts, load_page_texts, load_cached_pages,
+                         store_page_texts, init_page_cache, file_sha256)
+from index_telemetry import StageTimer, init_runs_table, new_run_id, record_ipo_run, peak_rss_mb
+from difflib import SequenceMatcher
+from queue import Empty
+from concurrent.futures import ProcessPoolExecutor
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "data", "drhp.db")
 PDF_DIR = os.path.join(os.path.dirname(__file__), "data", "drhp_pdfs")
@@ -34,6 +59,13 @@ SIMILARITY_THRESHOLD  = 0.45   # below this → topic changed → split
 MIN_CHUNK_CHARS       = 300    # merge chunks smaller than this
 MAX_CHUNK_CHARS       = 4000   # split chunks larger than this
 CHARS_PER_TOK         = 4
+NORMALIZE_EMBEDDINGS  = True   # store unit vectors → cosine is a plain dot product
+
+# Streaming pipeline — fixed working set regardless of document size
+EMBED_WINDOW          = 256    # sentences embedded per window
+REEMBED_BATCH         = 32     # oversized sub-chunks re-embedded together
+WRITE_BATCH           = 64     # chunks per DB commit (progress survives a crash)
+SENTENCE_CACHE_MAX    = 200_000   # cached sentence embeddings kept (~1.6 KB each)
 
 
 # ── DATABASE ──────────────────────────────────────────────────────────────────
@@ -47,7 +79,7 @@ def init_chunks_table(conn):
             chunk_index  INTEGER,
             text         TEXT NOT NULL,
             token_count  INTEGER,
-            embedding    TEXT,
+            embedding    BLOB,
             indexed_at   TEXT
         )
     """)
@@ -56,8 +88,97 @@ def init_chunks_table(conn):
         conn.execute("ALTER TABLE chunks DROP COLUMN section")
     except Exception:
         pass
+    # Sentence span of each chunk: (page_number, sent_start)..(page_end, sent_end)
+    for col in ("page_end", "sent_start", "sent_end"):
+        try:
+            conn.execute(f"ALTER TABLE chunks ADD COLUMN {col} INTEGER")
+        except Exception:
+            pass
     conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_ipo ON chunks(ipo_id)")
+    # Per-page content hashes and the source PDF of every indexed IPO
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS page_hashes (
+            ipo_id       TEXT NOT NULL,
+            page_number  INTEGER NOT NULL,
+            page_hash    TEXT NOT NULL,
+            PRIMARY KEY (ipo_id, page_number)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS index_sources (
+            ipo_id       TEXT PRIMARY KEY,
+            pdf_sha256   TEXT NOT NULL,
+            indexed_at   TEXT
+        )
+    """)
+    # Chunk ids removed by a re-index — pinecone_push_new deletes them remotely
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS chunk_tombstones (
+            chunk_id     TEXT PRIMARY KEY,
+            ipo_id       TEXT NOT NULL,
+            deleted_at   TEXT
+        )
+    """)
+    # Sentence embeddings shared across filings — see SENTENCE EMBEDDING CACHE
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sentence_embeddings (
+            sent_key     TEXT PRIMARY KEY,
+            embedding    BLOB NOT NULL,
+            hits         INTEGER NOT NULL DEFAULT 0,
+            last_used    TEXT
+        ) WITHOUT ROWID
+    """)
+    init_page_cache(conn)   # apply_event stores worker-extracted pages here
+    init_runs_table(conn)
+    conn.commit()
+    # Old DBs declared embedding TEXT and stored JSON — convert those rows once.
+    # TEXT affinity never coerces BLOBs, so the column declaration can stay.
+    migrate_json_embeddings(conn, normalize=NORMALIZE_EMBEDDINGS)
+    init_fts_table(conn)
+    init_manifest_table(conn)
+
+
+def init_fts_table(conn):
+    """
+    FTS5 index over chunks.text for BM25 lexical retrieval.
+    External-content table kept in sync by triggers, so every insert, delete
+    or re-index of a chunk updates it in the same transaction.
+    """
+    # INSERT OR REPLACE only fires the delete trigger with recursive_triggers on
+    conn.execute("PRAGMA recursive_triggers = ON")
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='chunks_fts'"
+    ).fetchone()
+    if exists:
+        return
+    try:
+        conn.execute("""
+            CREATE VIRTUAL TABLE chunks_fts USING fts5(
+                text, ipo_id UNINDEXED,
+                content='chunks', content_rowid='rowid'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        print(f"  ⚠ FTS5 not available in this SQLite build ({e}) — lexical search disabled")
+        return
+    conn.executescript("""
+        CREATE TRIGGER IF NOT EXISTS chunks_fts_ai AFTER INSERT ON chunks BEGIN
+            INSERT INTO chunks_fts(rowid, text, ipo_id) VALUES (new.rowid, new.text, new.ipo_id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS chunks_fts_ad AFTER DELETE ON chunks BEGIN
+            INSERT INTO chunks_fts(chunks_fts, rowid, text, ipo_id)
+            VALUES ('delete', old.rowid, old.text, old.ipo_id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS chunks_fts_au AFTER UPDATE OF text, ipo_id ON chunks BEGIN
+            INSERT INTO chunks_fts(chunks_fts, rowid, text, ipo_id)
+            VALUES ('delete', old.rowid, old.text, old.ipo_id);
+            INSERT INTO chunks_fts(rowid, text, ipo_id) VALUES (new.rowid, new.text, new.ipo_id);
+        END;
+    """)
+    # Index chunks that existed before the FTS table
+    conn.execute("INSERT INTO chunks_fts(chunks_fts) VALUES ('rebuild')")
     conn.commit()
+    print("  FTS5 lexical index created")
 
 
 def already_indexed(conn, ipo_id):
@@ -67,9 +188,39 @@ def already_indexed(conn, ipo_id):
     return row[0] > 0
 
 
+def source_unchanged(conn, ipo_id, pdf_path):
+    """
+    True if the IPO was fully indexed from this exact PDF (sha256 match).
+    The index_sources row is dropped when a plan is committed and written
+    back by `done`, so page hashes without it mean an interrupted index.
+    Chunks with neither predate both tables (legacy index) and are left alone.
+    """
+    row = conn.execute(
+        "SELECT pdf_sha256 FROM index_sources WHERE ipo_id = ?", (ipo_id,)
+    ).fetchone()
+    if row is None:
+        return conn.execute(
+            "SELECT 1 FROM page_hashes WHERE ipo_id = ? LIMIT 1", (ipo_id,)
+        ).fetchone() is None
+    return row[0] == file_sha256(pdf_path)
+
+
+def _tombstone(conn, ipo_id, chunk_ids, now):
+    conn.executemany(
+        "INSERT OR REPLACE INTO chunk_tombstones (chunk_id, ipo_id, deleted_at) VALUES (?,?,?)",
+        [(cid, ipo_id, now) for cid in chunk_ids],
+    )
+
+
 def force_reindex(conn, ipo_id):
+    """Drop everything indexed for an IPO — the next index_pdf rebuilds from scratch."""
+    ids = [r[0] for r in conn.execute("SELECT chunk_id FROM chunks WHERE ipo_id = ?", (ipo_id,))]
+    _tombstone(conn, ipo_id, ids, datetime.now().isoformat())
     conn.execute("DELETE FROM chunks WHERE ipo_id = ?", (ipo_id,))
+    conn.execute("DELETE FROM page_hashes WHERE ipo_id = ?", (ipo_id,))
+    conn.execute("DELETE FROM index_sources WHERE ipo_id = ?", (ipo_id,))
     conn.commit()
+    update_manifest(conn, ipo_id)
 
 
 def get_ipo_id_from_filename(filename, conn):
@@ -90,26 +241,17 @@ def get_ipo_id_from_filename(filename, conn):
 
 
 # ── PDF EXTRACTION ────────────────────────────────────────────────────────────
-def extract_pages(pdf_path):
+def clean_pages(raw):
+    """Cleaned (page_num, text) for pages with real text."""
     pages = []
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            total = len(pdf.pages)
-            print(f"    {total} pages...")
-            for i, page in enumerate(pdf.pages):
-                try:
-                    text = page.extract_text(x_tolerance=3, y_tolerance=3) or ""
-                    text = re.sub(r'\x00', '', text)
-                    text = re.sub(r'[ \t]+', ' ', text)
-                    text = re.sub(r'\n{3,}', '\n\n', text)
-                    text = text.strip()
-                    if text and len(text) > 50:
-                        pages.append((i + 1, text))
-                except Exception:
-                    continue
-            print(f"    Text extracted from {len(pages)}/{total} pages")
-    except Exception as e:
-        print(f"    PDF read error: {e}")
+    for page_num, text in raw:
+        text = re.sub(r'\x00', '', text)
+        text = re.sub(r'[ \t]+', ' ', text)
+        text = re.sub(r'\n{3,}', '\n\n', text)
+        text = text.strip()
+        if text and len(text) > 50:
+            pages.append((page_num, text))
+    print(f"    Text extracted from {len(pages)}/{len(raw)} pages")
     return pages
 
 
@@ -126,127 +268,127 @@ def split_into_sentences(text):
     return sentences if sentences else [text]
 
 
-def semantic_chunk_pages(pages, model):
+def page_sentences(pages):
+    """Flat [(page_num, index_within_page, sentence)] in document order."""
+    return [(page_num, k, sent)
+            for page_num, text in pages
+            for k, sent in enumerate(split_into_sentences(text))]
+
+
+# Streaming stages: sentences → embed_windows → stream_chunks → index_events.
+# A `None` item marks a run break (text the chunker must not join across).
+def embed_windows(sentences, model, window=EMBED_WINDOW):
+    """Yield (rows, E) windows: rows are (page, k, sentence), E their float32 embeddings."""
+    rows = []
+
+    def flush():
+        E = np.ascontiguousarray(
+            model.encode([t for _, _, t in rows], batch_size=128, show_progress_bar=False),
+            dtype=np.float32,
+        )
+        return rows, E
+
+    for item in sentences:
+        if item is None:
+            if rows: yield flush(); rows = []
+            yield None
+            continue
+        rows.append(item)
+        if len(rows) >= window:
+            yield flush(); rows = []
+    if rows:
+        yield flush()
+
+
+def stream_chunks(windows, model):
     """
-    Semantic chunking across all pages.
+    Online semantic chunking over embedded windows.
     Groups sentences by topic similarity, respects page boundaries.
-    """
-    if not pages:
-        return []
 
-    # Build flat list of (page_num, sentence) pairs
-    all_sentences = []
-    for page_num, text in pages:
-        sentences = split_into_sentences(text)
-        for sent in sentences:
-            all_sentences.append((page_num, sent))
-
-    if not all_sentences:
-        return []
-
-    print(f"    Embedding {len(all_sentences)} sentences for semantic chunking...")
-
-    # Embed all sentences in one batch
-    texts = [s for _, s in all_sentences]
-
-    # Batch to avoid memory issues on large PDFs
-    batch_size = 128
-    all_embeddings = []
-    for i in range(0, len(texts), batch_size):
-        batch = texts[i:i+batch_size]
-        embs = model.encode(batch, show_progress_bar=False)
-        all_embeddings.extend(embs)
-
-    # Calculate similarity between consecutive sentences
-    similarities = []
-    for i in range(len(all_embeddings) - 1):
-        a = np.array(all_embeddings[i], dtype=np.float32)
-        b = np.array(all_embeddings[i+1], dtype=np.float32)
-        na, nb = np.linalg.norm(a), np.linalg.norm(b)
-        sim = float(np.dot(a, b) / (na * nb)) if na > 0 and nb > 0 else 0.0
-        similarities.append(sim)
-
-    # Find split points where similarity drops (topic change)
-    split_indices = {0}  # always start a new chunk at beginning
-    for i, sim in enumerate(similarities):
-        page_curr = all_sentences[i][0]
-        page_next = all_sentences[i+1][0]
-        # Split on topic change OR page boundary (major section breaks)
-        if sim < SIMILARITY_THRESHOLD or (page_next > page_curr + 2):
-            split_indices.add(i + 1)
-
-    # Build chunks from split points
-    split_list = sorted(split_indices)
-    raw_chunks = []
-    for k, start in enumerate(split_list):
-        end = split_list[k+1] if k+1 < len(split_list) else len(all_sentences)
-        chunk_sentences = all_sentences[start:end]
-        if not chunk_sentences:
-            continue
-        chunk_text = " ".join(s for _, s in chunk_sentences)
-        chunk_page = chunk_sentences[0][0]  # page of first sentence
-        # Store mean embedding of all sentences in chunk
-        chunk_embs = all_embeddings[start:end]
-        mean_emb   = np.mean(chunk_embs, axis=0).tolist()
-        raw_chunks.append({
-            "text":      chunk_text,
-            "page":      chunk_page,
-            "embedding": mean_emb,
-        })
-
-    # Merge tiny chunks with the next chunk
-    merged = []
-    i = 0
-    while i < len(raw_chunks):
-        chunk = raw_chunks[i]
-        if len(chunk["text"]) < MIN_CHUNK_CHARS and i + 1 < len(raw_chunks):
-            # Merge into next
-            next_chunk = raw_chunks[i+1]
-            merged_text = chunk["text"] + " " + next_chunk["text"]
-            # Recompute mean embedding
-            embs = [chunk["embedding"], next_chunk["embedding"]]
-            mean_emb = np.mean(embs, axis=0).tolist()
-            raw_chunks[i+1] = {
-                "text":      merged_text,
-                "page":      chunk["page"],
-                "embedding": mean_emb,
-            }
-            i += 1
-            continue
-        merged.append(chunk)
-        i += 1
-
-    # Split oversized chunks at paragraph boundaries
-    final_chunks = []
-    for chunk in merged:
-        if len(chunk["text"]) <= MAX_CHUNK_CHARS:
-            final_chunks.append(chunk)
-            continue
-        # Split at paragraph breaks
-        paragraphs = re.split(r'\n\n+', chunk["text"])
+    Per window, consecutive similarities are one rowwise dot product;
+    only the open chunk (its sentences and a float64 embedding sum) is held
+    across windows. A boundary is taken when similarity drops below the
+    threshold or pages jump by more than 2 — unless the open chunk is still
+    under MIN_CHUNK_CHARS, in which case it absorbs the next one. Oversized
+    chunks are split at paragraph breaks and re-embedded in batches.
+
+    Each chunk records its sentence span (page, sent_start)..(page_end,
+    sent_end), inclusive, so a re-index can tell exactly what it covers.
+    """
+    cur     = None   # {"texts", "start", "end", "sum", "n", "chars"}
+    pending = []     # oversized sub-chunks awaiting embeddings
+    prev    = None   # (unit vector, page) of the previous sentence in this run
+
+    def reembed():
+        embs = model.encode([c["text"] for c in pending], batch_size=REEMBED_BATCH,
+                            show_progress_bar=False)
+        for c, emb in zip(pending, embs):
+            c["embedding"] = np.asarray(emb, dtype=np.float32)
+        out = pending[:]
+        pending.clear()
+        return out
+
+    def close(chunk):
+        chunk_text = " ".join(chunk["texts"])
+        span = {"page": chunk["start"][0], "sent_start": chunk["start"][1],
+                "page_end": chunk["end"][0], "sent_end": chunk["end"][1]}
+        if len(chunk_text) <= MAX_CHUNK_CHARS:
+            return [{"text": chunk_text, **span,
+                     "embedding": (chunk["sum"] / chunk["n"]).astype(np.float32)}]
+        # Split oversized chunks at paragraph breaks
         current_text = ""
-        current_page = chunk["page"]
-        for para in paragraphs:
+        for para in re.split(r'\n\n+', chunk_text):
             if len(current_text) + len(para) > MAX_CHUNK_CHARS and current_text:
-                # Embed this sub-chunk
-                emb = model.encode([current_text])[0].tolist()
-                final_chunks.append({
-                    "text":      current_text.strip(),
-                    "page":      current_page,
-                    "embedding": emb,
-                })
+                pending.append({"text": current_text.strip(), **span})
                 current_text = para
             else:
                 current_text = (current_text + " " + para).strip() if current_text else para
         if current_text.strip():
-            emb = model.encode([current_text])[0].tolist()
-            final_chunks.append({
-                "text":      current_text.strip(),
-                "page":      current_page,
-                "embedding": emb,
-            })
+            pending.append({"text": current_text.strip(), **span})
+        return reembed() if len(pending) >= REEMBED_BATCH else []
 
-    return final_chunks
+    for item in windows:
+        if item is None:                       # run break
+            if cur: yield from close(cur)
+            cur, prev = None, None
+            continue
+        rows, E = item
+        n     = len(rows)
+        norms = np.linalg.norm(E, axis=1)
+        U     = np.divide(E, norms[:, None], out=np.zeros_like(E), where=norms[:, None] > 0)
+        page  = np.array([p for p, _, _ in rows])
+        sims  = np.empty(n, dtype=np.float32)
+        sims[1:] = np.einsum("ij,ij->i", U[:-1], U[1:])
+        breaks = np.zeros(n, dtype=bool)
+        breaks[1:] = (sims[1:] < SIMILARITY_THRESHOLD) | (page[1:] > page[:-1] + 2)
+        if prev is None:
+            breaks[0] = True
+        else:
+            breaks[0] = float(U[0] @ prev[0]) < SIMILARITY_THRESHOLD or page[0] > prev[1] + 2
+        prev = (U[-1], int(page[-1]))
+
+        bounds = np.concatenate((np.flatnonzero(breaks), [n]))
+        if bounds[0] != 0:                     # window opens mid-chunk
+            bounds = np.concatenate(([0], bounds))
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            texts = [t for _, _, t in rows[a:b]]
+            seg   = {"texts": texts, "start": rows[a][:2], "end": rows[b - 1][:2],
+                     "sum": E[a:b].sum(axis=0, dtype=np.float64), "n": b - a,
+                     "chars": sum(map(len, texts)) + (b - a) - 1}
+            if cur is None:
+                cur = seg
+            elif not breaks[a] or cur["chars"] < MIN_CHUNK_CHARS:
+                # same topic, or the open chunk is too small to stand alone
+                cur["texts"] += seg["texts"]; cur["end"] = seg["end"]
+                cur["sum"] += seg["sum"];     cur["n"] += seg["n"]
+                cur["chars"] += seg["chars"] + 1
+            else:
+                yield from close(cur)
+                cur = seg
+    if cur:
+        yield from close(cur)
+    if pending:
+        yield from reembed()
 
 
 # ── EMBEDDING MODEL ───────────────────────────────────────────────────────────
@@ -255,53 +397,464 @@ _model = None
 def get_model():
     global _model
     if _model is None:
-        from sentence_transformers import SentenceTransformer
-        print("  Loading embedding model...")
-        _model = SentenceTransformer("all-MiniLM-L6-v2")
+        print(f"  Loading embedding model ({EMBEDDING_BACKEND})...")
+        _model = load_embedding_model()
         print("  Model ready.")
     return _model
 
 
+# ── SENTENCE EMBEDDING CACHE ──────────────────────────────────────────────────
+# SME DRHPs repeat SEBI-mandated boilerplate (disclaimers, definitions, the
+# standard risk-factor wording) almost word for word. Sentence embeddings are
+# cached in drhp.db keyed by model + normalised sentence, so a sentence seen
+# in any earlier filing is looked up instead of encoded. Keys are
+# whitespace-collapsed and lower-cased — MiniLM-L6 is uncased, so neither
+# changes the embedding. Lookups only read; new entries and hit counts go out
+# as `sentences` events, so parallel workers stay read-only.
+_sentence_stats = {"hits": 0, "misses": 0}   # per run, summed by the writer
+
+def sentence_key(sentence: str) -> str:
+    text = " ".join(sentence.split()).lower()
+    return hashlib.sha1(f"{embedding_model_id()}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class SentenceCache:
+    """model.encode stand-in that answers repeated sentences from drhp.db."""
+
+    def __init__(self, conn, model):
+        self.conn, self.model = conn, model
+        self.new      = {}   # key → vector encoded here, not yet handed to the writer
+        self.hit_keys = []
+        self.hits = self.misses = 0
+
+    def _lookup(self, keys):
+        found = {}
+        for i in range(0, len(keys), 500):
+            part = keys[i:i+500]
+            try:
+                rows = self.conn.execute(
+                    f"SELECT sent_key, embedding FROM sentence_embeddings "
+                    f"WHERE sent_key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+            except sqlite3.OperationalError:   # table not created yet
+                return found
+            found.update((k, unpack_embedding(b)) for k, b in rows)
+        return found
+
+    def encode(self, sentences, batch_size=128, show_progress_bar=False):
+        keys  = [sentence_key(t) for t in sentences]
+        found = {k: self.new[k] for k in keys if k in self.new}
+        found.update(self._lookup([k for k in dict.fromkeys(keys) if k not in found]))
+        todo  = {k: t for k, t in zip(keys, sentences) if k not in found}   # unique misses
+        if todo:
+            E = self.model.encode(list(todo.values()), batch_size=batch_size,
+                                  show_progress_bar=show_progress_bar)
+            for k, v in zip(todo, E):
+                found[k] = self.new[k] = np.asarray(v, dtype=np.float32)
+        n_miss = sum(1 for k in keys if k in todo)
+        self.misses += n_miss
+        self.hits   += len(keys) - n_miss
+        self.hit_keys += [k for k in dict.fromkeys(keys) if k not in todo]
+        return np.stack([found[k] for k in keys]) if keys else np.zeros((0, 0), np.float32)
+
+    def drain(self, ipo_id, now):
+        """`sentences` event for everything learned since the last drain, or None."""
+        if not (self.new or self.hit_keys):
+            return None
+        event = {"kind": "sentences", "ipo_id": ipo_id, "now": now,
+                 "rows": [(k, pack_embedding(v, normalize=False)) for k, v in self.new.items()],
+                 "hit_keys": self.hit_keys}
+        self.new, self.hit_keys = {}, []
+        return event
+
+
+def prune_sentence_cache(conn, keep=SENTENCE_CACHE_MAX):
+    """Cap the cache: drop never-reused sentences first, then least recently used."""
+    n = conn.execute("SELECT COUNT(*) FROM sentence_embeddings").fetchone()[0]
+    if n <= keep:
+        return 0
+    with conn:
+        conn.execute("""
+            DELETE FROM sentence_embeddings WHERE sent_key IN (
+                SELECT sent_key FROM sentence_embeddings
+                ORDER BY hits > 0, last_used LIMIT ?
+            )
+        """, (n - keep,))
+    return n - keep
+
+
+# ── INCREMENTAL RE-INDEX ──────────────────────────────────────────────────────
+# Every cleaned page gets a content hash (salted with the chunker config and
+# embedding backend, so changing either invalidates everything). On re-index
+# the old and new page-hash sequences are aligned — an RHP that inserts or
+# drops pages only shifts the unchanged ones. An old chunk survives when every page of its span is
+# unchanged; since chunks record their exact sentence span, only the sentences
+# no survivor covers are re-chunked and re-embedded. Survivors keep their
+# chunk_id and embedding (and indexed_at, unless their page numbers or
+# chunk_index shifted), so the Pinecone push only upserts what changed;
+# removed ids are tombstoned.
+def _chunker_salt() -> str:
+    return (f"{embedding_model_id()}|{SIMILARITY_THRESHOLD}|{MIN_CHUNK_CHARS}|"
+            f"{MAX_CHUNK_CHARS}|{NORMALIZE_EMBEDDINGS}")
+
+
+def page_hash(text: str, salt: str) -> str:
+    return hashlib.sha1(f"{salt}\x00{text}".encode("utf-8")).hexdigest()
+
+
+def _next_chunk_number(chunk_ids) -> int:
+    nums = [int(m.group(1)) for cid in chunk_ids if (m := re.search(r"_chunk_(\d+)$", cid))]
+    return max(nums) + 1 if nums else 0
+
+
+def plan_reindex(old_pages, old_chunks, new_pages):
+    """
+    old_pages / new_pages: [(page_number, page_hash)] in document order.
+    old_chunks: [(chunk_id, page_number, page_end, sent_start, sent_end)].
+    Returns (kept, covered):
+      kept     {chunk_id: (new_page_number, new_page_end)}
+      covered  sorted sentence spans ((page, k), (page_end, k_end)) the kept
+               chunks own in the new document — everything else is re-chunked
+    """
+    old_pos    = {p: i for i, (p, _) in enumerate(old_pages)}
+    old_to_new = {}
+    matcher    = SequenceMatcher(None, [h for _, h in old_pages], [h for _, h in new_pages],
+                                 autojunk=False)
+    for a, b, size in matcher.get_matching_blocks():
+        for k in range(size):
+            old_to_new[a + k] = b + k
+
+    kept, covered = {}, []
+    for chunk_id, start, end, s_start, s_end in old_chunks:
+        if None in (start, end, s_start, s_end):
+            continue   # indexed before spans were recorded
+        positions = [old_pos[p] for p in range(start, end + 1) if p in old_pos]
+        mapped    = [old_to_new.get(i) for i in positions]
+        if not positions or None in mapped:
+            continue
+        if any(m - i != mapped[0] - positions[0] for i, m in zip(positions, mapped)):
+            continue   # pages unchanged but not as one run
+        new_start, new_end = new_pages[mapped[0]][0], new_pages[mapped[-1]][0]
+        kept[chunk_id] = (new_start, new_end)
+        covered.append(((new_start, s_start), (new_end, s_end)))
+    covered.sort()
+    return kept, covered
+
+
+def dirty_sentences(pages, covered):
+    """Sentences no kept chunk covers, with None between non-adjacent runs."""
+    j, started, gap = 0, False, False
+    for page_num, text in pages:
+        for k, sent in enumerate(split_into_sentences(text)):
+            key = (page_num, k)
+            while j < len(covered) and covered[j][1] < key:
+                j += 1
+            if j < len(covered) and covered[j][0] <= key:
+                gap = True
+                continue
+            if started and gap:
+                yield None
+            started, gap = True, False
+            yield (page_num, k, sent)
+
+
+def _renumber_chunks(conn, ipo_id, now):
+    """
+    chunk_index in reading order. A row whose index changes gets indexed_at =
+    now, so pinecone_push_new re-pushes its chunk_index metadata.
+    """
+    ids = [r[0] for r in conn.execute("""
+        SELECT chunk_id FROM chunks WHERE ipo_id = ?
+        ORDER BY page_number, sent_start, rowid
+    """, (ipo_id,))]
+    conn.executemany(
+        "UPDATE chunks SET chunk_index = ?, indexed_at = ? WHERE chunk_id = ? AND chunk_index IS NOT ?",
+        [(i, now, cid, i) for i, cid in enumerate(ids)],
+    )
+
+
+# ── INDEX EVENTS ──────────────────────────────────────────────────────────────
+# Indexing one PDF is split into a reader and a writer:
+#   index_events(...) only READS drhp.db and yields events
+#   apply_event(...)  is the only code that WRITES
+# Serially both run in this process on one connection; in parallel mode
+# index_events runs in worker processes and every event is queued to the
+# single writer in the main process — no SQLite lock contention.
+#
+# Events (dicts, in order):
+#   pages   — freshly extracted raw page text for the page-text cache
+#   plan    — re-index plan: chunks removed, pages shifted, new page hashes
+#             (committed before any embedding, so a crash resumes)
+#   chunks  — WRITE_BATCH finished chunk rows, committed per batch
+#   done    — renumber, record the source PDF, refresh the manifest
+_run_id        = None   # set by run_indexer — done events are recorded to index_runs
+_write_seconds = {}     # ipo_id → writer seconds so far
+
+def index_events(pdf_path, ipo_id, company, conn, pdf_workers=None):
+    timer = StageTimer()   # stage seconds travel to the writer in the done event
+    with timer.stage("extract"):
+        digest = file_sha256(pdf_path)
+        raw    = load_page_texts(conn, digest)
+        fresh  = raw is None
+        if fresh:   # complete a partial entry left by drhp_scraper's TOC path
+            raw = complete_page_texts(pdf_path, load_cached_pages(conn, digest), workers=pdf_workers)
+        pages = clean_pages(raw)
+    if fresh:
+        yield {"kind": "pages", "ipo_id": ipo_id, "digest": digest, "pages": raw}
+    else:
+        print(f"    Page text cache hit ({len(raw)} pages)")
+    if not pages:
+        yield {"kind": "done", "ipo_id": ipo_id, "error": "No text extracted",
+               "timings": timer.seconds, "elapsed_s": timer.elapsed(), "rss_mb": peak_rss_mb()}
+        return
+
+    with timer.stage("split"):
+        salt       = _chunker_salt()
+        new_hashes = [(p, page_hash(text, salt)) for p, text in pages]
+        old_hashes = conn.execute(
+            "SELECT page_number, page_hash FROM page_hashes WHERE ipo_id = ? ORDER BY page_number", (ipo_id,)
+        ).fetchall()
+        old_chunks = conn.execute("""
+            SELECT chunk_id, page_number, page_end, sent_start, sent_end
+            FROM chunks WHERE ipo_id = ?
+        """, (ipo_id,)).fetchall()
+        kept, covered = plan_reindex(old_hashes, old_chunks, new_hashes)
+        now      = datetime.now().isoformat()
+        removed  = [r[0] for r in old_chunks if r[0] not in kept]
+        shifted  = [(kept[r[0]][0], kept[r[0]][1], now, r[0]) for r in old_chunks
+                    if r[0] in kept and kept[r[0]] != (r[1], r[2])]
+        n_dirty  = sum(1 for s in dirty_sentences(pages, covered) if s is not None)
+    if old_chunks:
+        print(f"  ↻ {len(kept)}/{len(old_chunks)} chunks unchanged — re-chunking "
+              f"{n_dirty} sentences")
+    yield {"kind": "plan", "ipo_id": ipo_id, "removed": removed, "shifted": shifted,
+           "page_hashes": new_hashes, "now": now}
+
+    written = 0
+    if n_dirty:
+        with timer.stage("embed"):
+            model = timer.encoder(get_model())
+        cache     = SentenceCache(conn, model)
+        next_no   = _next_chunk_number(r[0] for r in old_chunks)
+        batch     = []
+        sentences = timer.iterate(dirty_sentences(pages, covered), "split")
+        for chunk in timer.iterate(stream_chunks(embed_windows(sentences, timer.encoder(cache)), model), "chunk"):
+            batch.append((
+                f"{ipo_id}_chunk_{next_no + written:04d}", ipo_id, company,
+                chunk["page"], chunk["page_end"], chunk["sent_start"], chunk["sent_end"],
+                chunk["text"],
+                len(chunk["text"]) // CHARS_PER_TOK,
+                pack_embedding(chunk["embedding"], normalize=NORMALIZE_EMBEDDINGS),
+                now,
+            ))
+            written += 1
+            if len(batch) >= WRITE_BATCH:
+                learned = cache.drain(ipo_id, now)
+                if learned: yield learned
+                yield {"kind": "chunks", "ipo_id": ipo_id, "rows": batch}
+                batch = []
+        learned = cache.drain(ipo_id, now)
+        if learned: yield learned
+        if batch:
+            yield {"kind": "chunks", "ipo_id": ipo_id, "rows": batch}
+        hits, misses = cache.hits, cache.misses
+    else:
+        hits, misses = 0, 0
+    cached = f" — sentence cache {hits / (hits + misses):.0%} hit" if hits + misses else ""
+    print(f"  → {written} semantic chunks embedded{cached}")
+
+    yield {"kind": "done", "ipo_id": ipo_id, "digest": digest, "now": now,
+           "written": written, "kept": len(kept), "removed": len(removed),
+           "sent_hits": hits, "sent_misses": misses,
+           "pages": len(pages), "sentences": n_dirty,
+           "timings": timer.seconds, "elapsed_s": timer.elapsed(), "rss_mb": peak_rss_mb(),
+           "error": None if (kept or written) else "No chunks produced"}
+
+
+def _write_event(conn, event):
+    kind, ipo_id = event["kind"], event.get("ipo_id")
+    if kind == "pages":
+        store_page_texts(conn, event["digest"], event["pages"])
+    elif kind == "plan":
+        with conn:   # commit the plan — from here on a crash resumes, not restarts
+            _tombstone(conn, ipo_id, event["removed"], event["now"])
+            conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(c,) for c in event["removed"]])
+            conn.executemany(   # pages shifted → metadata changed → re-push
+                "UPDATE chunks SET page_number = ?, page_end = ?, indexed_at = ? WHERE chunk_id = ?",
+                event["shifted"],
+            )
+            conn.execute("DELETE FROM index_sources WHERE ipo_id = ?", (ipo_id,))   # in progress until done
+            conn.execute("DELETE FROM page_hashes WHERE ipo_id = ?", (ipo_id,))
+            conn.executemany(
+                "INSERT INTO page_hashes (ipo_id, page_number, page_hash) VALUES (?,?,?)",
+                [(ipo_id, p, h) for p, h in event["page_hashes"]],
+            )
+    elif kind == "sentences":
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO sentence_embeddings (sent_key, embedding, last_used) VALUES (?,?,?)",
+                [(k, blob, event["now"]) for k, blob in event["rows"]],
+            )
+            conn.executemany(
+                "UPDATE sentence_embeddings SET hits = hits + 1, last_used = ? WHERE sent_key = ?",
+                [(event["now"], k) for k in event["hit_keys"]],
+            )
+    elif kind == "chunks":
+        with conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO chunks
+                (chunk_id, ipo_id, company, page_number, page_end, sent_start, sent_end,
+                 chunk_index, text, token_count, embedding, indexed_at)
+                VALUES (?,?,?,?,?,?,?,NULL,?,?,?,?)
+            """, event["rows"])
+            conn.executemany("DELETE FROM chunk_tombstones WHERE chunk_id = ?",
+                             [(r[0],) for r in event["rows"]])
+    elif kind == "done" and not event["error"]:
+        with conn:
+            _renumber_chunks(conn, ipo_id, datetime.now().isoformat())
+            conn.execute(
+                "INSERT OR REPLACE INTO index_sources (ipo_id, pdf_sha256, indexed_at) VALUES (?,?,?)",
+                (ipo_id, event["digest"], event["now"]),
+            )
+        update_manifest(conn, ipo_id)
+
+
+def apply_event(conn, event):
+    """Write one index event. Returns the finished `done` event, else None."""
+    ipo_id = event.get("ipo_id")
+    t0 = time.perf_counter()
+    _write_event(conn, event)
+    _write_seconds[ipo_id] = _write_seconds.get(ipo_id, 0.0) + time.perf_counter() - t0
+    if event["kind"] != "done":
+        return None
+
+    if _run_id:
+        record_ipo_run(conn, _run_id, "rag_indexer", ipo_id,
+                       status="failed" if event["error"] else "ok",
+                       seconds={**event.get("timings", {}), "write": _write_seconds.pop(ipo_id, 0.0)},
+                       total_s=event.get("elapsed_s"), pages=event.get("pages", 0),
+                       sentences=event.get("sentences", 0), chunks=event.get("written", 0),
+                       cache_hits=event.get("sent_hits", 0), rss_mb=event.get("rss_mb"))
+    if event["error"]:
+        print(f"  ❌ {event['error']}")
+        return event
+    _sentence_stats["hits"]   += event["sent_hits"]
+    _sentence_stats["misses"] += event["sent_misses"]
+    print(f"  ✅ {event['written']} chunks stored, {event['kept']} kept, {event['removed']} removed")
+    return event
+
+
 # ── MAIN INDEXER ──────────────────────────────────────────────────────────────
-def index_pdf(pdf_path, ipo_id, company, conn):
+def index_pdf(pdf_path, ipo_id, company, conn, pdf_workers=None):
+    """
+    Index (or incrementally re-index) one IPO's PDF as a stream:
+    pages → sentences → windowed embedding → online chunking → batched writes.
+
+    The re-index plan is committed first and chunks every WRITE_BATCH, so
+    after a crash the next run sees the written chunks as unchanged and
+    only embeds what is left. index_sources is updated last — an
+    interrupted IPO is picked up again automatically.
+    Returns the number of chunks that were (re-)embedded.
+    """
     print(f"  Indexing: {company} ({ipo_id})")
+    for event in index_events(pdf_path, ipo_id, company, conn, pdf_workers):
+        done = apply_event(conn, event)
+        if done:
+            return done.get("written", 0)
+    return 0
 
-    pages = extract_pages(pdf_path)
-    if not pages:
-        print("  ❌ No text extracted"); return 0
 
-    model  = get_model()
-    chunks = semantic_chunk_pages(pages, model)
-    print(f"  → {len(chunks)} semantic chunks")
+# ── PARALLEL INDEXING ─────────────────────────────────────────────────────────
+_events_queue = None
+
+def _worker_init(queue, threads):
+    """Per worker process: the event queue, and a fair share of CPU threads for torch."""
+    global _events_queue
+    _events_queue = queue
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except Exception:
+        pass
 
-    if not chunks:
-        print("  ❌ No chunks produced"); return 0
 
-    now  = datetime.now().isoformat()
-    rows = []
-    for idx, chunk in enumerate(chunks):
-        chunk_id = f"{ipo_id}_chunk_{idx:04d}"
-        rows.append((
-            chunk_id, ipo_id, company,
-            chunk["page"], idx,
-            chunk["text"],
-            len(chunk["text"]) // CHARS_PER_TOK,
-            json.dumps(chunk["embedding"]),
-            now,
-        ))
-
-    conn.executemany("""
-        INSERT OR REPLACE INTO chunks
-        (chunk_id, ipo_id, company, page_number, chunk_index,
-         text, token_count, embedding, indexed_at)
-        VALUES (?,?,?,?,?,?,?,?,?)
-    """, rows)
-    conn.commit()
-    print(f"  ✅ {len(rows)} chunks stored")
-    return len(rows)
+def _worker_index(job):
+    """Runs in a worker: read-only DB access, every write goes to the queue."""
+    pdf_path, ipo_id, company = job
+    conn = get_read_connection(DB_PATH)
+    try:
+        for event in index_events(pdf_path, ipo_id, company, conn, pdf_workers=1):
+            _events_queue.put(event)
+    except Exception as e:
+        _events_queue.put({"kind": "done", "ipo_id": ipo_id, "error": f"Failed: {e}"})
 
 
-def run_indexer(force=False):
+def index_parallel(jobs, conn, workers):
+    """
+    Index (pdf_path, ipo_id, company) jobs across `workers` processes, each
+    loading the embedding model once. This process is the only writer.
+    Returns (chunks written, IPOs indexed, failures).
+    """
+    ctx     = multiprocessing.get_context("spawn")   # fork + torch threads deadlocks
+    queue   = ctx.Queue(maxsize=workers * 8)          # bounded: workers wait on a slow writer
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    names   = {ipo_id: company for _, ipo_id, company in jobs}
+    started = {}
+    written, indexed, failed = 0, 0, 0
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_worker_init, initargs=(queue, threads)) as ex:
+        futures = [ex.submit(_worker_index, job) for job in jobs]
+        remaining = len(jobs)
+        try:
+            while remaining:
+                try:
+                    event = queue.get(timeout=5)
+                except Empty:
+                    if all(f.done() for f in futures) and queue.empty():
+                        break   # a worker died without reporting
+                    continue
+                ipo_id = event["ipo_id"]
+                if ipo_id not in started:
+                    started[ipo_id] = time.time()
+                    print(f"  ▶ {names.get(ipo_id, ipo_id)} ({ipo_id})")
+                done = apply_event(conn, event)
+                if not done:
+                    continue
+                remaining -= 1
+                n_done = len(jobs) - remaining
+                if done["error"]:
+                    failed += 1
+                    print(f"  [{n_done}/{len(jobs)}] ❌ {names.get(ipo_id, ipo_id)} — {done['error']}")
+                else:
+                    written += done["written"]; indexed += 1
+                    print(f"  [{n_done}/{len(jobs)}] ✅ {names.get(ipo_id, ipo_id)} — "
+                          f"{done['written']} new, {done['kept']} kept "
+                          f"({time.time() - started[ipo_id]:.0f}s)")
+        except BaseException:
+            # Writer failed — workers blocked on the full queue would never
+            # finish, so cancel what hasn't started and drain the rest.
+            for f in futures:
+                f.cancel()
+            while not all(f.done() for f in futures):
+                try:
+                    queue.get(timeout=1)
+                except Empty:
+                    pass
+            raise
+        for f in futures:
+            if f.exception():
+                print(f"  ❌ Worker crashed: {f.exception()}")
+    failed += remaining
+    return written, indexed, failed
+
+
+def run_indexer(force=False, full=False, workers=1):
+    """
+    force:   re-check every IPO, not only those whose PDF changed (incremental)
+    full:    drop each IPO's chunks first and rebuild from scratch
+    workers: index this many IPOs at once in separate processes
+    """
+    global _run_id
     print("\n" + "="*60)
     print(f"RAG Semantic Indexer — {datetime.now().strftime('%Y-%m-%d %H:%M')}")
     print(f"  Similarity threshold: {SIMILARITY_THRESHOLD}")
@@ -313,46 +866,103 @@ def run_indexer(force=False):
     if not os.path.exists(DB_PATH):
         print(f"❌ DB not found: {DB_PATH}"); return
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_write_connection(DB_PATH)   # single WAL writer — app readers never block
     init_chunks_table(conn)
 
     pdf_files = sorted(f for f in os.listdir(PDF_DIR) if f.endswith(".pdf"))
     if not pdf_files:
-        print("❌ No PDFs found"); return
+        print("❌ No PDFs found")
+        close_write_connection(DB_PATH)
+        return
 
     print(f"\n  Found {len(pdf_files)} PDFs\n")
-    total_chunks, skipped, failed = 0, 0, 0
+    total_chunks, skipped, failed, reindexed = 0, 0, 0, 0
+    _sentence_stats.update(hits=0, misses=0)
+    _run_id = new_run_id()
 
+    jobs = []
     for pdf_file in pdf_files:
         ipo_id, company = get_ipo_id_from_filename(pdf_file, conn)
-        if not force and already_indexed(conn, ipo_id):
+        pdf_path = os.path.join(PDF_DIR, pdf_file)
+        if not (force or full) and already_indexed(conn, ipo_id) \
+                and source_unchanged(conn, ipo_id, pdf_path):
             count = conn.execute(
                 "SELECT COUNT(*) FROM chunks WHERE ipo_id=?", (ipo_id,)
             ).fetchone()[0]
             print(f"  ⏭  Skipping {company} — already indexed ({count} chunks)")
             skipped += 1
             continue
+        if full:
+            force_reindex(conn, ipo_id)
+        jobs.append((pdf_path, ipo_id, company))
 
+    workers = max(1, min(workers, len(jobs)))
+    if workers > 1:
+        print(f"\n  Indexing {len(jobs)} IPOs across {workers} worker processes\n")
+        try:
+            total_chunks, reindexed, failed = index_parallel(jobs, conn, workers)
+            jobs = []
+        except Exception as e:
+            # No process support on this host — fall back to the serial loop.
+            # IPOs that finished are skipped there (index_sources is up to date).
+            print(f"  ⚠ Parallel indexing failed ({e}) — continuing serially")
+            jobs = [j for j in jobs if not source_unchanged(conn, j[1], j[0])
+                    or not already_indexed(conn, j[1])]
+            failed = 0
+
+    for pdf_path, ipo_id, company in jobs:
         print(f"\n{'─'*60}")
-        if force:
-            force_reindex(conn, ipo_id)
         try:
-            n = index_pdf(os.path.join(PDF_DIR, pdf_file), ipo_id, company, conn)
+            n = index_pdf(pdf_path, ipo_id, company, conn)
             total_chunks += n
+            reindexed    += 1
         except Exception as e:
             print(f"  ❌ Failed: {e}"); failed += 1
+            record_ipo_run(conn, _run_id, "rag_indexer", ipo_id, status="failed")
 
     print(f"\n{'='*60}")
     print(f"  Done. New chunks: {total_chunks} | Skipped: {skipped} | Failed: {failed}")
     total = conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
     ipos  = conn.execute("SELECT COUNT(DISTINCT ipo_id) FROM chunks").fetchone()[0]
     print(f"  Total in DB: {total} chunks across {ipos} IPOs")
-    conn.close()
+    looked_up = _sentence_stats["hits"] + _sentence_stats["misses"]
+    if looked_up:
+        print(f"  Sentence cache: {_sentence_stats['hits'] / looked_up:.1%} hit "
+              f"({_sentence_stats['hits']:,} of {looked_up:,} sentences not re-encoded)")
+    print(f"  Stage timings: run {_run_id} → index_runs (python index_telemetry.py)")
+    pruned = prune_sentence_cache(conn)
+    if pruned:
+        print(f"  🗑 Pruned {pruned:,} cached sentence embeddings")
+
+    export_json(conn)
+
+    # Rebuild the local ANN index whenever the chunk set changed
+    if reindexed or not os.path.exists(ANN_DIR):
+        try:
+            build_ann_index(conn)
+        except Exception as e:
+            print(f"  ⚠ ANN index build failed: {e}")
+    close_write_connection(DB_PATH)
+
+    # Precompute the fixed scorecard topic embeddings, so the app loads them
+    # from disk instead of embedding at runtime. The model is only loaded if
+    # the saved file is missing or stale (new model or edited queries).
+    try:
+        from rag_retriever import get_scorecard_query_matrix
+        get_scorecard_query_matrix(load_model=get_model)
+    except Exception as e:
+        print(f"  ⚠ Scorecard query embeddings not precomputed: {e}")
 
 
 if __name__ == "__main__":
     import sys
     force = "--force" in sys.argv
-    if force:
-        print("  ⚠ Force mode — re-indexing ALL IPOs")
-    run_indexer(force=force)
+    full  = "--full" in sys.argv
+    workers = 1
+    if "--workers" in sys.argv:
+        workers = int(sys.argv[sys.argv.index("--workers") + 1])
+    if full:
+        print("  ⚠ Full mode — dropping and rebuilding ALL IPOs")
+    elif force:
+        print("  ⚠ Force mode — re-checking ALL IPOs (only changed pages re-embedded)")
+    run_indexer(force=force, full=full, workers=workers)
@@ -0,0 +1,174 @@
+"""
+rag_manifest.py — Per-IPO RAG index manifest
+=============================================
+One row per indexed IPO in drhp.db → rag_manifest:
+  ipo_id, company, chunk_count, page_min, page_max,
+  content_hash (sha256 of chunk ids + text), indexed_at, pushed_to_pinecone_at,
+  last_pushed_at (kept across content changes — the push uploads only
+  chunks indexed after it)
+
+Maintained by rag_indexer (after every IPO) and the Pinecone push scripts
+(after every upload). Existence/stats checks in rag_retriever are O(1)
+lookups here instead of zero-vector Pinecone probes.
+
+The table is mirrored to data/rag_manifest.json so deployments without
+drhp.db (Streamlit Cloud on Pinecone) get the same lookups. The JSON is
+merged, never truncated — a fresh CI database doesn't drop known IPOs.
+"""
+
+import os, json, hashlib
+from datetime import datetime
+
+MANIFEST_JSON = os.path.join(os.path.dirname(__file__), "data", "rag_manifest.json")
+
+_FIELDS = ["ipo_id", "company", "chunk_count", "page_min", "page_max",
+           "content_hash", "indexed_at", "pushed_to_pinecone_at", "last_pushed_at"]
+
+
+# ── SQLITE TABLE ──────────────────────────────────────────────────────────────
+def init_manifest_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS rag_manifest (
+            ipo_id                 TEXT PRIMARY KEY,
+            company                TEXT,
+            chunk_count            INTEGER NOT NULL DEFAULT 0,
+            page_min               INTEGER,
+            page_max               INTEGER,
+            content_hash           TEXT,
+            indexed_at             TEXT,
+            pushed_to_pinecone_at  TEXT
+        )
+    """)
+    try:
+        conn.execute("ALTER TABLE rag_manifest ADD COLUMN last_pushed_at TEXT")
+    except Exception:
+        pass
+    conn.commit()
+    if not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='chunks'"
+    ).fetchone():
+        return
+    # Backfill IPOs indexed before the manifest existed — not ones whose
+    # index was interrupted (page hashes but no index_sources row yet)
+    unfinished = ""
+    if conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type='table' AND name IN ('page_hashes','index_sources')"
+    ).fetchone()[0] == 2:
+        unfinished = """AND ipo_id NOT IN (SELECT ipo_id FROM page_hashes
+                                           WHERE ipo_id NOT IN (SELECT ipo_id FROM index_sources))"""
+    missing = [r[0] for r in conn.execute(f"""
+        SELECT DISTINCT ipo_id FROM chunks
+        WHERE ipo_id NOT IN (SELECT ipo_id FROM rag_manifest) {unfinished}
+    """).fetchall()]
+    for ipo_id in missing:
+        update_manifest(conn, ipo_id)
+    if missing:
+        print(f"  Manifest backfilled for {len(missing)} IPO(s)")
+
+
+def content_hash(conn, ipo_id: str) -> str:
+    h = hashlib.sha256()
+    for chunk_id, text in conn.execute(
+        "SELECT chunk_id, text FROM chunks WHERE ipo_id = ? ORDER BY chunk_index", (ipo_id,)
+    ):
+        h.update(chunk_id.encode("utf-8")); h.update(b"\x00")
+        h.update((text or "").encode("utf-8")); h.update(b"\x00")
+    return h.hexdigest()
+
+
+def update_manifest(conn, ipo_id: str) -> dict:
+    """
+    Recompute one IPO's row from the chunks table.
+    A changed content hash clears pushed_to_pinecone_at so the push
+    script re-uploads it; no chunks left → the row is removed.
+    """
+    company, count, pmin, pmax, indexed_at = conn.execute("""
+        SELECT MAX(company), COUNT(*), MIN(page_number), MAX(page_number), MAX(indexed_at)
+        FROM chunks WHERE ipo_id = ?
+    """, (ipo_id,)).fetchone()
+    if not count:
+        conn.execute("DELETE FROM rag_manifest WHERE ipo_id = ?", (ipo_id,))
+        conn.commit()
+        return None
+
+    digest = content_hash(conn, ipo_id)
+    prev   = conn.execute(
+        "SELECT content_hash, pushed_to_pinecone_at, last_pushed_at FROM rag_manifest WHERE ipo_id = ?",
+        (ipo_id,)
+    ).fetchone()
+    pushed = prev[1] if prev and prev[0] == digest else None
+    conn.execute("""
+        INSERT OR REPLACE INTO rag_manifest
+        (ipo_id, company, chunk_count, page_min, page_max,
+         content_hash, indexed_at, pushed_to_pinecone_at, last_pushed_at)
+        VALUES (?,?,?,?,?,?,?,?,?)
+    """, (ipo_id, company, count, pmin, pmax, digest, indexed_at, pushed, prev[2] if prev else None))
+    conn.commit()
+    return get_entry(conn, ipo_id)
+
+
+def mark_pushed(conn, ipo_id: str, when: str = None):
+    when = when or datetime.now().isoformat()
+    conn.execute(
+        "UPDATE rag_manifest SET pushed_to_pinecone_at = ?, last_pushed_at = ? WHERE ipo_id = ?",
+        (when, when, ipo_id),
+    )
+    conn.commit()
+
+
+def get_entry(conn, ipo_id: str):
+    row = conn.execute(
+        f"SELECT {', '.join(_FIELDS)} FROM rag_manifest WHERE ipo_id = ?", (ipo_id,)
+    ).fetchone()
+    return dict(zip(_FIELDS, row)) if row else None
+
+
+def has_manifest_table(conn) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='rag_manifest'"
+    ).fetchone() is not None
+
+
+# ── JSON MIRROR ───────────────────────────────────────────────────────────────
+_json_cache = (None, None)   # (mtime, entries)
+
+def load_json_manifest() -> dict:
+    """ipo_id → entry from data/rag_manifest.json (empty if absent), cached by mtime."""
+    global _json_cache
+    try:
+        mtime = os.path.getmtime(MANIFEST_JSON)
+    except OSError:
+        return {}
+    if _json_cache[0] == mtime:
+        return _json_cache[1]
+    try:
+        with open(MANIFEST_JSON, encoding="utf-8") as f:
+            entries = json.load(f).get("ipos", {})
+    except Exception as e:
+        print(f"  Manifest JSON unreadable: {e}")
+        entries = {}
+    _json_cache = (mtime, entries)
+    return entries
+
+
+def export_json(conn):
+    """Merge the DB manifest into data/rag_manifest.json (DB rows win)."""
+    entries = dict(load_json_manifest())
+    for row in conn.execute(f"SELECT {', '.join(_FIELDS)} FROM rag_manifest"):
+        entry = dict(zip(_FIELDS, row))
+        old   = entries.get(entry["ipo_id"], {})
+        # Keep a known push time if this DB hasn't pushed the same content itself
+        if not entry["pushed_to_pinecone_at"] and old.get("content_hash") == entry["content_hash"]:
+            entry["pushed_to_pinecone_at"] = old.get("pushed_to_pinecone_at")
+        entries[entry["ipo_id"]] = entry
+    os.makedirs(os.path.dirname(MANIFEST_JSON), exist_ok=True)
+    tmp = MANIFEST_JSON + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"updated_at": datetime.now().isoformat(), "ipos": entries}, f, indent=2)
+    os.replace(tmp, MANIFEST_JSON)
+
+
+def pushed_elsewhere(entry: dict) -> bool:
+    """True if the JSON mirror records this exact content as already in Pinecone."""
+    known = load_json_manifest().get(entry["ipo_id"], {})
+    return bool(known.get("pushed_to_pinecone_at")) and known.get("content_hash") == entry["content_hash"]
@@ -1,29 +1,59 @@
 """
-rag_retriever.py — RAG Retrieval via Pinecone (cloud) or SQLite (local fallback)
+rag_retriever.py — RAG Retrieval via local ANN index, Pinecone (cloud) or SQLite
 =================================================================================
 Priority:
-  1. Pinecone  — used on Streamlit Cloud (no local DB needed)
-  2. SQLite    — used locally if Pinecone not configured
+  1. Local ANN — on-disk IVF index built by rag_indexer (see ann_index.py),
+                 used whenever it exists and covers the IPO
+  2. Pinecone  — used on Streamlit Cloud (no local DB needed)
+  3. SQLite    — brute-force fallback if neither is available
 
-Both backends expose the same interface:
-  retrieve_chunks(ipo_id, question, top_k)
+Set RAG_BACKEND=local|pinecone|sqlite to force one backend (default: auto).
+
+Lexical search: BM25 over the chunks_fts FTS5 table in drhp.db. Hybrid mode
+(RAG_RETRIEVAL_MODE=hybrid; the default is dense) fuses BM25 and dense
+rankings with reciprocal rank fusion, so exact terms ("RoNW", "restated",
+rupee figures) surface even when cosine misses them. A BM25 hit that the
+dense search did not return still needs MIN_SIMILARITY or a BM25 score of
+BM25_MIN to be kept, and every hit carries its cosine "similarity".
+
+All backends expose the same interface:
+  retrieve_chunks(ipo_id, question, top_k, mode)  — dense / lexical / hybrid
+  retrieve_multi(ipo_id, queries)          — many topic queries in one pass
   retrieve_for_scorecard(ipo_id)
+  search_all_ipos(question)                — cross-IPO search, grouped by IPO
   has_rag_index(ipo_id)
 
 No section labels — pure cosine similarity on all chunks.
 """
 
-import os, json
+import os, re, json, threading, time
 import numpy as np
+from collections import OrderedDict
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from embeddings import embedding_model_id, load_embedding_model, pack_embedding, unpack_embedding
+from ann_index import ANN_DIR, load_ann_index, search as ann_search
+from drhp_db import get_read_connection
+from rag_manifest import (load_json_manifest, has_manifest_table,
+                          get_entry as get_manifest_row)
 
 load_dotenv()
 
 # ── CONFIG ────────────────────────────────────────────────────────────────────
-DB_PATH        = os.path.join(os.path.dirname(__file__), "data", "drhp.db")
-PINECONE_INDEX = "tradesage-drhp"
-TOP_K          = 12   # Cast wider net — filter by similarity threshold
-MIN_SIMILARITY = 0.25
+DB_PATH            = os.path.join(os.path.dirname(__file__), "data", "drhp.db")
+SCORECARD_EMB_PATH = os.path.join(os.path.dirname(__file__), "data", "scorecard_query_embeddings.npz")
+QUERY_CACHE_PATH   = os.path.join(os.path.dirname(__file__), "data", "query_embeddings.db")
+PINECONE_INDEX     = "tradesage-drhp"
+RAG_BACKEND        = os.environ.get("RAG_BACKEND", "auto").lower()
+TOP_K              = 12   # Cast wider net — filter by similarity threshold
+MIN_SIMILARITY     = 0.25
+RETRIEVAL_MODE     = os.environ.get("RAG_RETRIEVAL_MODE", "dense").lower()
+RRF_K              = 60   # reciprocal rank fusion damping constant
+BM25_MIN           = 4.0  # a lexical-only hybrid hit below MIN_SIMILARITY needs this BM25 score
+
+QUERY_CACHE_SIZE      = 512    # in-memory LRU entries
+MATRIX_CACHE_SIZE     = 16     # per-IPO chunk matrices kept in memory (LRU, a few MB each)
+QUERY_CACHE_DISK_SIZE = 5000   # on-disk entries kept (least recently used dropped)
 
 SCORECARD_QUERIES = {
     "risks":      "risk factors investment risks red flags material risks threats to business",
@@ -41,12 +71,171 @@ _model = None
 def get_embedding_model():
     global _model
     if _model is None:
-        from sentence_transformers import SentenceTransformer
-        _model = SentenceTransformer("all-MiniLM-L6-v2")
+        _model = load_embedding_model()   # EMBEDDING_BACKEND: torch / onnx / onnx-int8
     return _model
 
+# ── QUERY EMBEDDING CACHE ─────────────────────────────────────────────────────
+# Bounded LRU of query embeddings keyed by (model, normalised text), backed by a
+# small SQLite file so it survives Streamlit restarts. Suggested questions and
+# scorecard/industry queries repeat across IPOs, so most lookups never reach
+# the model. Text is whitespace-collapsed and lower-cased — MiniLM-L6 is an
+# uncased model, so case never changes the embedding.
+_qcache       = OrderedDict()
+_qcache_lock  = threading.Lock()
+_qcache_conn  = None
+_qcache_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+def _qcache_key(question: str) -> str:
+    import hashlib
+    text = " ".join(question.split()).lower()
+    return hashlib.sha1(f"{embedding_model_id()}\x00{text}".encode("utf-8")).hexdigest()
+
+def _qcache_db():
+    """Lazily open the on-disk store; None if it cannot be created."""
+    global _qcache_conn
+    if _qcache_conn is None:
+        import sqlite3
+        try:
+            os.makedirs(os.path.dirname(QUERY_CACHE_PATH), exist_ok=True)
+            _qcache_conn = sqlite3.connect(QUERY_CACHE_PATH, check_same_thread=False)
+            _qcache_conn.execute("""
+                CREATE TABLE IF NOT EXISTS query_embeddings (
+                    cache_key  TEXT PRIMARY KEY,
+                    model      TEXT NOT NULL,
+                    embedding  BLOB NOT NULL,
+                    last_used  REAL
+                )
+            """)
+            _qcache_conn.commit()
+        except Exception as e:
+            print(f"  Query cache on disk unavailable: {e}")
+            _qcache_conn = False
+    return _qcache_conn or None
+
+def _qcache_remember(key: str, vec: np.ndarray):
+    _qcache[key] = vec
+    _qcache.move_to_end(key)
+    while len(_qcache) > QUERY_CACHE_SIZE:
+        _qcache.popitem(last=False)
+
+def _qcache_get(key: str):
+    with _qcache_lock:
+        vec = _qcache.get(key)
+        if vec is not None:
+            _qcache.move_to_end(key)
+            _qcache_stats["memory_hits"] += 1
+            return vec
+        db = _qcache_db()
+        if db is not None:
+            try:
+                row = db.execute(
+                    "SELECT embedding FROM query_embeddings WHERE cache_key = ?", (key,)
+                ).fetchone()
+                if row:
+                    db.execute("UPDATE query_embeddings SET last_used = ? WHERE cache_key = ?",
+                               (time.time(), key))
+                    db.commit()
+                    vec = unpack_embedding(row[0])
+                    _qcache_remember(key, vec)
+                    _qcache_stats["disk_hits"] += 1
+                    return vec
+            except Exception as e:
+                print(f"  Query cache read error: {e}")
+        _qcache_stats["misses"] += 1
+        return None
+
+def _qcache_put(entries: list):
+    """Store (key, vector) pairs in memory and on disk, evicting the LRU tail."""
+    with _qcache_lock:
+        for key, vec in entries:
+            _qcache_remember(key, vec)
+        db = _qcache_db()
+        if db is None: return
+        try:
+            now = time.time()
+            db.executemany(
+                "INSERT OR REPLACE INTO query_embeddings VALUES (?,?,?,?)",
+                [(key, embedding_model_id(), pack_embedding(vec, normalize=False), now)
+                 for key, vec in entries],
+            )
+            db.execute("""
+                DELETE FROM query_embeddings WHERE cache_key IN (
+                    SELECT cache_key FROM query_embeddings
+                    ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (QUERY_CACHE_DISK_SIZE,))
+            db.commit()
+        except Exception as e:
+            print(f"  Query cache write error: {e}")
+
+def get_query_cache_stats() -> dict:
+    with _qcache_lock:
+        stats = dict(_qcache_stats)
+        stats["memory_entries"] = len(_qcache)
+    lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+    stats["hit_rate"] = round((lookups - stats["misses"]) / lookups, 3) if lookups else 0.0
+    return stats
+
 def embed_question(question: str) -> list:
-    return get_embedding_model().encode([question])[0].tolist()
+    return embed_questions([question])[0].tolist()
+
+def embed_questions(questions: list, model=None) -> np.ndarray:
+    """
+    Embed many queries → (n_queries, 384) float32. Cached queries are looked
+    up; all misses go through a single encode call.
+    """
+    if not questions:
+        return np.zeros((0, 384), dtype=np.float32)
+    keys    = [_qcache_key(q) for q in questions]
+    vectors = [_qcache_get(k) for k in keys]
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    if missing:
+        model = model or get_embedding_model()
+        embs  = np.asarray(model.encode([questions[i] for i in missing],
+                                        show_progress_bar=False), dtype=np.float32)
+        _qcache_put([(keys[i], emb) for i, emb in zip(missing, embs)])
+        for i, emb in zip(missing, embs):
+            vectors[i] = emb
+    return np.vstack(vectors).astype(np.float32, copy=False)
+
+# ── SCORECARD TOPIC EMBEDDINGS ────────────────────────────────────────────────
+# The scorecard queries are fixed text, so their embeddings are computed once,
+# saved next to the DB and reloaded on every start. The stored signature ties
+# the file to the model + query text — edit a query and it is rebuilt once.
+_scorecard_matrix = None
+
+def _scorecard_signature() -> str:
+    import hashlib
+    payload = json.dumps([embedding_model_id(), list(SCORECARD_QUERIES.items())])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def get_scorecard_query_matrix(model=None, load_model=None) -> np.ndarray:
+    """
+    (n_topics, 384) scorecard query embeddings. load_model is a zero-argument
+    loader called only if the saved file is missing or stale.
+    """
+    global _scorecard_matrix
+    if _scorecard_matrix is not None:
+        return _scorecard_matrix
+    signature = _scorecard_signature()
+    if os.path.exists(SCORECARD_EMB_PATH):
+        try:
+            saved = np.load(SCORECARD_EMB_PATH)
+            if str(saved["signature"]) == signature:
+                _scorecard_matrix = saved["matrix"].astype(np.float32, copy=False)
+                return _scorecard_matrix
+        except Exception as e:
+            print(f"  Scorecard embeddings unreadable ({e}) — rebuilding")
+    if model is None and load_model is not None:
+        model = load_model()
+    matrix = embed_questions(list(SCORECARD_QUERIES.values()), model=model)
+    try:
+        os.makedirs(os.path.dirname(SCORECARD_EMB_PATH), exist_ok=True)
+        np.savez(SCORECARD_EMB_PATH, signature=np.array(signature), matrix=matrix)
+    except Exception as e:
+        print(f"  Could not save scorecard embeddings: {e}")
+    _scorecard_matrix = matrix
+    return matrix
 
 # ── BACKEND DETECTION ─────────────────────────────────────────────────────────
 _pinecone_index   = None
@@ -75,8 +264,55 @@ def get_pinecone_index():
         return None
 
 def use_pinecone() -> bool:
+    if RAG_BACKEND in ("local", "sqlite"): return False
     return get_pinecone_index() is not None
 
+def get_local_index():
+    if RAG_BACKEND not in ("auto", "local"): return None
+    if not os.path.exists(DB_PATH): return None   # chunk text is read from drhp.db
+    return load_ann_index(ANN_DIR)
+
+def use_local_index(ipo_id: str = None) -> bool:
+    index = get_local_index()
+    return index is not None and (ipo_id is None or ipo_id in index["ipo_ranges"])
+
+# ── LOCAL ANN RETRIEVAL ───────────────────────────────────────────────────────
+def _fetch_chunk_texts(chunk_ids: list) -> dict:
+    conn = get_read_connection(DB_PATH)
+    if conn is None or not chunk_ids: return {}
+    marks = ",".join("?" * len(chunk_ids))
+    return dict(conn.execute(
+        f"SELECT chunk_id, text FROM chunks WHERE chunk_id IN ({marks})", chunk_ids
+    ).fetchall())
+
+def _local_multi_query(ipo_id: str, query_matrix, top_k: int) -> list:
+    index = get_local_index()
+    if index is None:
+        return [[] for _ in range(len(query_matrix))]
+    Q = np.atleast_2d(np.asarray(query_matrix, dtype=np.float32))
+    norms = np.linalg.norm(Q, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    hits = [[(row, score) for row, score in per_query if score >= MIN_SIMILARITY]
+            for per_query in ann_search(index, Q / norms, top_k, ipo_id=ipo_id)]
+    texts = _fetch_chunk_texts(list({index["chunk_ids"][row] for h in hits for row, _ in h}))
+    results = []
+    for per_query in hits:
+        chunks = []
+        for row, score in per_query:
+            chunk_id = index["chunk_ids"][row]
+            if chunk_id not in texts: continue   # chunk deleted since the index was built
+            chunks.append({
+                "chunk_id":    chunk_id,
+                "page_number": index["pages"][row],
+                "text":        texts[chunk_id],
+                "similarity":  round(score, 4),
+            })
+        results.append(chunks)
+    return results
+
+def _local_query(ipo_id: str, embedding: list, top_k: int) -> list:
+    return _local_multi_query(ipo_id, [embedding], top_k)[0]
+
 # ── PINECONE RETRIEVAL ────────────────────────────────────────────────────────
 def _pinecone_query(ipo_id: str, embedding: list, top_k: int) -> list:
     index = get_pinecone_index()
@@ -104,58 +340,234 @@ def _pinecone_query(ipo_id: str, embedding: list, top_k: int) -> list:
         return []
 
 # ── SQLITE RETRIEVAL ──────────────────────────────────────────────────────────
-def _sqlite_query(ipo_id: str, embedding: list, top_k: int) -> list:
-    import sqlite3
-    if not os.path.exists(DB_PATH): return []
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        rows = conn.execute("""
-            SELECT chunk_id, page_number, text, embedding
-            FROM chunks WHERE ipo_id = ?
-            ORDER BY chunk_index
-        """, (ipo_id,)).fetchall()
-    finally:
-        conn.close()
-    a  = np.array(embedding, dtype=np.float32)
-    na = np.linalg.norm(a)
-    scored = []
-    for chunk_id, page_number, text, embedding_json in rows:
-        if not embedding_json: continue
+# Per-IPO in-memory cache of the L2-normalised (n_chunks, 384) embedding matrix
+# plus chunk metadata. Built once per IPO and rebuilt only when the indexer
+# rewrites that IPO's chunks (chunk count or MAX(indexed_at) changes). An LRU
+# of MATRIX_CACHE_SIZE IPOs, so a long-running app does not keep every IPO
+# anyone has opened.
+_matrix_cache = OrderedDict()
+_matrix_lock  = threading.Lock()
+
+def _chunk_version(conn, ipo_id: str) -> tuple:
+    return tuple(conn.execute(
+        "SELECT COUNT(*), MAX(indexed_at) FROM chunks WHERE ipo_id = ?", (ipo_id,)
+    ).fetchone())
+
+def _build_chunk_matrix(conn, ipo_id: str) -> dict:
+    rows = conn.execute("""
+        SELECT chunk_id, page_number, text, embedding
+        FROM chunks WHERE ipo_id = ? AND embedding IS NOT NULL
+        ORDER BY chunk_index
+    """, (ipo_id,)).fetchall()
+    vectors, chunk_ids, pages, texts = [], [], [], []
+    for chunk_id, page_number, text, embedding_blob in rows:
         try:
-            b  = np.array(json.loads(embedding_json), dtype=np.float32)
-            nb = np.linalg.norm(b)
-            if na == 0 or nb == 0: continue
-            score = float(np.dot(a, b) / (na * nb))
-            if score >= MIN_SIMILARITY:
-                scored.append({
-                    "chunk_id":    chunk_id,
-                    "page_number": page_number,
-                    "text":        text,
-                    "similarity":  round(score, 4),
-                })
+            v = unpack_embedding(embedding_blob)
         except Exception:
             continue
-    scored.sort(key=lambda x: x["similarity"], reverse=True)
-    return scored[:top_k]
+        if v.shape != (384,): continue
+        vectors.append(v)
+        chunk_ids.append(chunk_id)
+        pages.append(page_number or 0)
+        texts.append(text)
+    if vectors:
+        matrix = np.vstack(vectors).astype(np.float32, copy=False)
+        norms  = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0          # zero rows stay zero → never pass MIN_SIMILARITY
+        matrix = matrix / norms
+    else:
+        matrix = np.zeros((0, 384), dtype=np.float32)
+    return {"matrix": matrix, "chunk_ids": chunk_ids, "pages": pages, "texts": texts}
+
+def get_chunk_matrix(ipo_id: str):
+    """Cached normalised embedding matrix + metadata for one IPO (None if no DB)."""
+    conn = get_read_connection(DB_PATH)
+    if conn is None: return None
+    version = _chunk_version(conn, ipo_id)
+    with _matrix_lock:
+        entry = _matrix_cache.get(ipo_id)
+        if entry and entry["version"] == version:
+            _matrix_cache.move_to_end(ipo_id)
+            return entry
+        entry = _build_chunk_matrix(conn, ipo_id)
+        entry["version"] = version
+        _matrix_cache[ipo_id] = entry
+        _matrix_cache.move_to_end(ipo_id)
+        while len(_matrix_cache) > MATRIX_CACHE_SIZE:
+            _matrix_cache.popitem(last=False)
+        return entry
+
+def _normalise(embedding) -> np.ndarray:
+    q = np.asarray(embedding, dtype=np.float32)
+    n = np.linalg.norm(q)
+    return q / n if n > 0 else q
+
+def _top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the top_k scores, best first — argpartition then sort only k."""
+    if top_k <= 0 or scores.size == 0:
+        return np.zeros(0, dtype=np.intp)
+    if top_k < scores.size:
+        idx = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        idx = np.arange(scores.size)
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+def _rows_to_chunks(entry: dict, scores: np.ndarray, top_k: int) -> list:
+    chunks = []
+    for i in _top_k_indices(scores, top_k):
+        score = float(scores[i])
+        if score < MIN_SIMILARITY: break
+        chunks.append({
+            "chunk_id":    entry["chunk_ids"][i],
+            "page_number": entry["pages"][i],
+            "text":        entry["texts"][i],
+            "similarity":  round(score, 4),
+        })
+    return chunks
+
+def _sqlite_query(ipo_id: str, embedding: list, top_k: int) -> list:
+    entry = get_chunk_matrix(ipo_id)
+    if entry is None or not entry["chunk_ids"]: return []
+    q = _normalise(embedding)
+    if not q.any(): return []
+    scores = entry["matrix"] @ q      # one mat-vec product = cosine for every chunk
+    return _rows_to_chunks(entry, scores, top_k)
+
+def _sqlite_multi_query(ipo_id: str, query_matrix: np.ndarray, top_k: int) -> list:
+    entry = get_chunk_matrix(ipo_id)
+    if entry is None or not entry["chunk_ids"]:
+        return [[] for _ in range(len(query_matrix))]
+    Q = np.asarray(query_matrix, dtype=np.float32)
+    norms = np.linalg.norm(Q, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    scores = (Q / norms) @ entry["matrix"].T     # (n_queries, n_chunks) in one product
+    return [_rows_to_chunks(entry, row, top_k) for row in scores]
 
 def _query(ipo_id: str, embedding: list, top_k: int) -> list:
+    if use_local_index(ipo_id):
+        return _local_query(ipo_id, embedding, top_k)
     if use_pinecone():
         return _pinecone_query(ipo_id, embedding, top_k)
     return _sqlite_query(ipo_id, embedding, top_k)
 
+def _multi_query(ipo_id: str, query_matrix: np.ndarray, top_k: int) -> list:
+    """Ranked results per query row, in the same order as query_matrix."""
+    if use_local_index(ipo_id):
+        return _local_multi_query(ipo_id, query_matrix, top_k)
+    if use_pinecone():
+        # Pinecone has no batch query — fan the round-trips out concurrently
+        with ThreadPoolExecutor(max_workers=max(1, len(query_matrix))) as ex:
+            return list(ex.map(
+                lambda q: _pinecone_query(ipo_id, q.tolist(), top_k), query_matrix
+            ))
+    return _sqlite_multi_query(ipo_id, query_matrix, top_k)
+
+# ── LEXICAL (BM25) RETRIEVAL ──────────────────────────────────────────────────
+_FTS_STOPWORDS = {
+    "a","an","and","are","as","at","be","by","do","does","for","from","has","have",
+    "how","in","is","it","its","me","of","on","or","the","this","to","was","what",
+    "when","where","which","who","why","will","with","any","about","there","their",
+}
+
+def _fts_match_expr(question: str) -> str:
+    """
+    FTS5 MATCH expression: every meaningful term quoted and OR-ed.
+    Figures like 1,234.56 stay one term — quoted, FTS treats them as a phrase.
+    """
+    terms = re.findall(r"\w+(?:[.,]\w+)*", question)
+    terms = [t for t in terms if t.lower() not in _FTS_STOPWORDS and len(t) > 1]
+    return " OR ".join(f'"{t}"' for t in dict.fromkeys(terms))
+
+def _bm25_query(ipo_id: str, question: str, top_k: int) -> list:
+    import sqlite3
+    expr = _fts_match_expr(question)
+    conn = get_read_connection(DB_PATH)
+    if not expr or conn is None: return []
+    try:
+        rows = conn.execute("""
+            SELECT c.chunk_id, c.page_number, c.text, bm25(chunks_fts) AS rank
+            FROM chunks_fts JOIN chunks c ON c.rowid = chunks_fts.rowid
+            WHERE chunks_fts MATCH ? AND chunks_fts.ipo_id = ?
+            ORDER BY rank LIMIT ?
+        """, (expr, ipo_id, top_k)).fetchall()
+    except sqlite3.OperationalError:
+        return []   # no FTS table yet (indexer not re-run) or FTS5 unavailable
+    return [{
+        "chunk_id":    chunk_id,
+        "page_number": page_number,
+        "text":        text,
+        "bm25":        round(-rank, 4),   # SQLite bm25() is lower-is-better
+        "similarity":  0.0,               # no cosine in lexical mode — hybrid fills it in
+    } for chunk_id, page_number, text, rank in rows]
+
+def _add_similarity(ipo_id: str, embedding, chunks: list) -> list:
+    """Set each chunk's cosine similarity from the cached chunk matrix (0.0 if it has no row)."""
+    entry = get_chunk_matrix(ipo_id)
+    if entry is None or not entry["chunk_ids"]:
+        return chunks
+    if "row_of" not in entry:
+        entry["row_of"] = {chunk_id: i for i, chunk_id in enumerate(entry["chunk_ids"])}
+    q = _normalise(embedding)
+    for chunk in chunks:
+        i = entry["row_of"].get(chunk["chunk_id"])
+        chunk["similarity"] = round(float(entry["matrix"][i] @ q), 4) if i is not None else 0.0
+    return chunks
+
+def _rrf_fuse(rankings: list, top_k: int) -> list:
+    """Reciprocal rank fusion: score = Σ 1 / (RRF_K + rank) across rankings."""
+    fused = {}
+    for ranking in rankings:
+        for rank, chunk in enumerate(ranking, start=1):
+            entry = fused.setdefault(chunk["chunk_id"], {**chunk, "rrf": 0.0})
+            entry.update({k: v for k, v in chunk.items() if k not in entry})
+            entry["rrf"] += 1.0 / (RRF_K + rank)
+    ranked = sorted(fused.values(), key=lambda x: x["rrf"], reverse=True)[:top_k]
+    for chunk in ranked:
+        chunk["rrf"] = round(chunk["rrf"], 5)
+    return ranked
+
 # ── PUBLIC API ────────────────────────────────────────────────────────────────
-def retrieve_chunks(ipo_id: str, question: str, top_k: int = TOP_K) -> list:
-    embedding = embed_question(question)
-    chunks    = _query(ipo_id, embedding, top_k)
+def retrieve_chunks(ipo_id: str, question: str, top_k: int = TOP_K,
+                    mode: str = None) -> list:
+    """
+    mode: "dense"   — cosine similarity only
+          "lexical" — BM25 only (no embedding call)
+          "hybrid"  — RRF of both; falls back to dense when no FTS index exists.
+                      BM25-only hits must still reach MIN_SIMILARITY or BM25_MIN.
+    Every chunk has "similarity" (0.0 in lexical mode, which embeds nothing).
+    """
+    mode = mode or RETRIEVAL_MODE
+    if mode == "lexical":
+        chunks = _bm25_query(ipo_id, question, top_k)
+    else:
+        embedding = embed_question(question)
+        dense = _query(ipo_id, embedding, top_k if mode == "dense" else top_k * 2)
+        if mode == "dense":
+            chunks = dense
+        else:
+            seen    = {c["chunk_id"] for c in dense}
+            lexical = _bm25_query(ipo_id, question, top_k * 2)
+            _add_similarity(ipo_id, embedding, [c for c in lexical if c["chunk_id"] not in seen])
+            lexical = [c for c in lexical if c["chunk_id"] in seen
+                       or c["similarity"] >= MIN_SIMILARITY or c["bm25"] >= BM25_MIN]
+            chunks  = _rrf_fuse([dense, lexical], top_k) if lexical else dense[:top_k]
     chunks.sort(key=lambda x: x["page_number"])
     return chunks
 
-def retrieve_for_scorecard(ipo_id: str) -> list:
+def retrieve_multi(ipo_id: str, queries: dict, per_topic: int = 2,
+                   candidates: int = 10, query_matrix=None) -> list:
+    """
+    Retrieve for several topics at once: one encode call (skipped when
+    query_matrix is given), one scoring pass, then per-topic de-dup so a
+    chunk is only credited to the first topic that picks it.
+    """
+    topics = list(queries.keys())
+    if query_matrix is None:
+        query_matrix = embed_questions([queries[t] for t in topics])
+    per_query  = _multi_query(ipo_id, query_matrix, candidates)
     seen_ids   = set()
     all_chunks = []
-    for topic, query in SCORECARD_QUERIES.items():
-        embedding = embed_question(query)
-        results   = _query(ipo_id, embedding, top_k=10)
+    for topic, results in zip(topics, per_query):
         count = 0
         for chunk in results:
             if chunk["chunk_id"] in seen_ids: continue
@@ -163,65 +575,197 @@ def retrieve_for_scorecard(ipo_id: str) -> list:
             chunk["topic"] = topic
             all_chunks.append(chunk)
             count += 1
-            if count >= 2: break
+            if count >= per_topic: break
     all_chunks.sort(key=lambda x: x["page_number"])
     return all_chunks
 
-def has_rag_index(ipo_id: str) -> bool:
-    if use_pinecone():
+def retrieve_for_scorecard(ipo_id: str) -> list:
+    return retrieve_multi(ipo_id, SCORECARD_QUERIES,
+                          query_matrix=get_scorecard_query_matrix())
+
+# ── CROSS-IPO SEARCH ──────────────────────────────────────────────────────────
+# One query against a global index (local ANN → Pinecone without a filter →
+# streaming SQLite scan), then grouping by IPO — never N per-IPO queries.
+CROSS_IPO_CANDIDATES = 200   # global hits pulled before grouping/capping
+
+def _fetch_chunk_rows(chunk_ids: list) -> dict:
+    conn = get_read_connection(DB_PATH)
+    if conn is None or not chunk_ids: return {}
+    marks = ",".join("?" * len(chunk_ids))
+    return {r[0]: r[1:] for r in conn.execute(f"""
+        SELECT chunk_id, ipo_id, company, page_number, text
+        FROM chunks WHERE chunk_id IN ({marks})
+    """, chunk_ids).fetchall()}
+
+def _rows_for_hits(hits: list) -> list:
+    """(chunk_id, score) pairs → full chunk dicts, dropping chunks no longer in the DB."""
+    rows   = _fetch_chunk_rows([cid for cid, _ in hits])
+    chunks = []
+    for chunk_id, score in hits:
+        if chunk_id not in rows: continue
+        ipo_id, company, page_number, text = rows[chunk_id]
+        chunks.append({
+            "chunk_id": chunk_id, "ipo_id": ipo_id, "company": company,
+            "page_number": page_number, "text": text, "similarity": round(score, 4),
+        })
+    return chunks
+
+def _global_local(q: np.ndarray, n: int) -> list:
+    index = get_local_index()
+    hits  = ann_search(index, q, n)[0]
+    return _rows_for_hits([(index["chunk_ids"][row], score) for row, score in hits
+                           if score >= MIN_SIMILARITY])
+
+def _global_pinecone(q: np.ndarray, n: int) -> list:
+    try:
+        results = get_pinecone_index().query(vector=q.tolist(), top_k=n, include_metadata=True)
+    except Exception as e:
+        print(f"  Pinecone query error: {e}")
+        return []
+    chunks = []
+    for match in results.matches:
+        if match.score < MIN_SIMILARITY: continue
+        meta = match.metadata
+        chunks.append({
+            "chunk_id":    match.id,
+            "ipo_id":      meta.get("ipo_id", ""),
+            "company":     meta.get("company", ""),
+            "page_number": int(meta.get("page_number", 0)),
+            "text":        meta.get("text", ""),
+            "similarity":  round(float(match.score), 4),
+        })
+    return chunks
+
+def _global_sqlite(q: np.ndarray, n: int, batch: int = 4096) -> list:
+    """Brute-force scan in fixed-size batches — bounded memory at any corpus size."""
+    conn = get_read_connection(DB_PATH)
+    if conn is None: return []
+    best_scores = np.zeros(0, dtype=np.float32)
+    best_ids    = []
+    cursor = conn.execute("SELECT chunk_id, embedding FROM chunks WHERE embedding IS NOT NULL")
+    while True:
+        rows = cursor.fetchmany(batch)
+        if not rows: break
+        vecs = [(cid, unpack_embedding(blob)) for cid, blob in rows]
+        vecs = [(cid, v) for cid, v in vecs if v.shape == (384,)]
+        if not vecs: continue
+        M = np.vstack([v for _, v in vecs])
+        norms = np.linalg.norm(M, axis=1)
+        norms[norms == 0] = 1.0
+        scores = np.concatenate([best_scores, (M @ q) / norms])
+        ids    = best_ids + [cid for cid, _ in vecs]
+        keep   = _top_k_indices(scores, n)
+        best_scores = scores[keep]
+        best_ids    = [ids[i] for i in keep]
+    return _rows_for_hits([(cid, float(sc)) for cid, sc in zip(best_ids, best_scores)
+                           if sc >= MIN_SIMILARITY])
+
+def search_all_ipos(question: str, max_ipos: int = 10, per_ipo: int = 3,
+                    candidates: int = CROSS_IPO_CANDIDATES) -> list:
+    """
+    Corpus-wide semantic search across every indexed DRHP.
+    Returns IPO groups, best first:
+      [{"ipo_id", "company", "best_similarity", "chunks": [...≤ per_ipo]}]
+    """
+    q = _normalise(embed_question(question))
+    if not q.any(): return []
+    if use_local_index():
+        hits = _global_local(q, candidates)
+    elif use_pinecone():
+        hits = _global_pinecone(q, candidates)
+    else:
+        hits = _global_sqlite(q, candidates)
+
+    groups = {}
+    for chunk in hits:                      # hits arrive best-first
+        group = groups.get(chunk["ipo_id"])
+        if group is None:
+            if len(groups) >= max_ipos: continue
+            group = groups[chunk["ipo_id"]] = {
+                "ipo_id":          chunk["ipo_id"],
+                "company":         chunk["company"],
+                "best_similarity": chunk["similarity"],
+                "chunks":          [],
+            }
+        if len(group["chunks"]) < per_ipo:
+            group["chunks"].append(chunk)
+    for group in groups.values():
+        group["chunks"].sort(key=lambda x: x["page_number"] or 0)
+    return list(groups.values())
+
+# ── INDEX MANIFEST ────────────────────────────────────────────────────────────
+_pinecone_probe = {}   # ipo_id → bool, only for IPOs the manifest doesn't know
+
+def _manifest_entry(ipo_id: str):
+    """
+    (known, entry): manifest row from drhp.db if it has the table, else from
+    data/rag_manifest.json. known=False only when neither source exists.
+    """
+    import sqlite3
+    conn = get_read_connection(DB_PATH)
+    if conn is not None:
         try:
-            index   = get_pinecone_index()
-            results = index.query(
+            if has_manifest_table(conn):
+                return True, get_manifest_row(conn, ipo_id)
+        except sqlite3.Error:
+            pass
+    entries = load_json_manifest()
+    if entries:
+        return True, entries.get(ipo_id)
+    return False, None
+
+def _pinecone_has_ipo(ipo_id: str) -> bool:
+    """Legacy zero-vector probe — only when no manifest records the push."""
+    if ipo_id not in _pinecone_probe:
+        try:
+            results = get_pinecone_index().query(
                 vector=[0.0] * 384, top_k=1,
                 filter={"ipo_id": {"$eq": ipo_id}},
                 include_metadata=False,
             )
-            return len(results.matches) > 0
+            _pinecone_probe[ipo_id] = len(results.matches) > 0
         except Exception:
             return False
+    return _pinecone_probe[ipo_id]
+
+def _backend_name(ipo_id: str) -> str:
+    if use_local_index(ipo_id): return "Local ANN"
+    if use_pinecone():          return "Pinecone"
+    return "SQLite"
+
+def has_rag_index(ipo_id: str) -> bool:
+    known, entry = _manifest_entry(ipo_id)
+    backend      = _backend_name(ipo_id)
+    if backend == "Pinecone":
+        if entry and entry.get("pushed_to_pinecone_at"):
+            return True
+        return _pinecone_has_ipo(ipo_id)
+    if not os.path.exists(DB_PATH):
+        return False   # local ANN and SQLite both read chunk text from drhp.db
+    if known:
+        return bool(entry and entry.get("chunk_count"))
+    return _sqlite_chunk_count(ipo_id) > 0
+
+def _sqlite_chunk_count(ipo_id: str) -> int:
+    conn = get_read_connection(DB_PATH)
+    if conn is None: return 0
     try:
-        import sqlite3
-        conn  = sqlite3.connect(DB_PATH)
-        count = conn.execute(
+        return conn.execute(
             "SELECT COUNT(*) FROM chunks WHERE ipo_id = ?", (ipo_id,)
         ).fetchone()[0]
-        conn.close()
-        return count > 0
     except Exception:
-        return False
+        return 0
 
 def get_index_stats(ipo_id: str) -> dict:
-    if use_pinecone():
-        try:
-            index   = get_pinecone_index()
-            results = index.query(
-                vector=[0.0] * 384, top_k=10000,
-                filter={"ipo_id": {"$eq": ipo_id}},
-                include_metadata=True,
-            )
-            pages = [int(m.metadata.get("page_number", 0)) for m in results.matches]
-            return {
-                "total_chunks": len(results.matches),
-                "page_range":   f"{min(pages)}-{max(pages)}" if pages else "-",
-                "backend":      "Pinecone",
-            }
-        except Exception:
-            return {"total_chunks": 0, "page_range": "-", "backend": "Pinecone"}
-    try:
-        import sqlite3
-        conn  = sqlite3.connect(DB_PATH)
-        total = conn.execute(
-            "SELECT COUNT(*) FROM chunks WHERE ipo_id = ?", (ipo_id,)
-        ).fetchone()[0]
-        pages = conn.execute(
-            "SELECT MIN(page_number), MAX(page_number) FROM chunks WHERE ipo_id = ?",
-            (ipo_id,)
-        ).fetchone()
-        conn.close()
-        return {
-            "total_chunks": total,
-            "page_range":   f"{pages[0]}-{pages[1]}" if pages[0] else "-",
-            "backend":      "SQLite",
-        }
-    except Exception:
-        return {"total_chunks": 0, "page_range": "-", "backend": "SQLite"}
+    backend = _backend_name(ipo_id)
+    _, entry = _manifest_entry(ipo_id)
+    if not entry:
+        return {"total_chunks": 0, "page_range": "-", "backend": backend}
+    pmin, pmax = entry.get("page_min"), entry.get("page_max")
+    return {
+        "total_chunks": entry.get("chunk_count") or 0,
+        "page_range":   f"{pmin}-{pmax}" if pmin else "-",
+        "backend":      backend,
+        "indexed_at":   entry.get("indexed_at"),
+        "pushed_to_pinecone_at": entry.get("pushed_to_pinecone_at"),
+    }
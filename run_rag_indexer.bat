@@ -1,8 +1,10 @@
 @echo off
 REM run_rag_indexer.bat — Semantic chunking + embedding pipeline
 REM Usage:
-REM   run_rag_indexer.bat          → index only new IPOs (skips already done)
-REM   run_rag_indexer.bat --force  → re-index ALL IPOs (use after code changes)
+REM   run_rag_indexer.bat          → index new IPOs and IPOs whose PDF changed
+REM   run_rag_indexer.bat --force  → re-check ALL IPOs (only changed pages re-embedded)
+REM   run_rag_indexer.bat --full   → drop and rebuild ALL IPOs (use after code changes)
+REM   add --workers N to any of the above to index N IPOs at once
 
 echo.
 echo ============================================================
@@ -20,12 +22,15 @@ echo   Installing dependencies...
 %PYTHON% -m pip install sentence-transformers numpy pdfplumber --quiet
 
 echo.
-if "%1"=="--force" (
-    echo   FORCE MODE — re-indexing all IPOs
-    %PYTHON% rag_indexer.py --force
+if "%1"=="--full" (
+    echo   FULL MODE — rebuilding all IPOs from scratch
+    %PYTHON% rag_indexer.py %*
+) else if "%1"=="--force" (
+    echo   FORCE MODE — re-checking all IPOs
+    %PYTHON% rag_indexer.py %*
 ) else (
     echo   Indexing new IPOs only (pass --force to re-index all)
-    %PYTHON% rag_indexer.py
+    %PYTHON% rag_indexer.py %*
 )
 
 echo.
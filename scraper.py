@@ -8,11 +8,14 @@ Source: ipowatch.in
 Classification logic:
   - Row contains "BSE SME" or "NSE Emerge/SME" → SME
   - Otherwise large issue size or BSE/NSE mainboard → Mainboard
+
+Pages go through http_cache (data/http_cache/live): unchanged pages answer
+304 and are read from disk.
 """
 
-import requests
 from bs4 import BeautifulSoup
 import json, os, re, time
+import http_cache
 from datetime import datetime, date, timezone, timedelta
 
 # All date comparisons use IST (UTC+5:30) — ipowatch dates are Indian calendar dates
@@ -29,13 +32,14 @@ HEADERS = {
 BASE_URL    = "https://ipowatch.in"
 OUTPUT_FILE = os.path.join(os.path.dirname(__file__), "data", "live_ipo_data.json")
 DELAY = 1.5
+HTTP_SCOPE  = "live"   # http_cache scope — data/http_cache/live
 
 
 def fetch(url):
+    """Page → soup. Unchanged pages (304) come from the on-disk HTTP cache."""
     try:
-        r = requests.get(url, headers=HEADERS, timeout=15)
-        r.raise_for_status()
-        return BeautifulSoup(r.text, "html.parser")
+        text, _ = http_cache.get_text(url, HTTP_SCOPE, HEADERS, timeout=15)
+        return BeautifulSoup(text, "html.parser")
     except Exception as e:
         print(f"  ⚠ Failed {url}: {e}")
         return None
@@ -0,0 +1,78 @@
+import os, sys, hashlib, threading, http.server
+
+import numpy as np
+import pytest
+
+# Modules live at the repo root, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeModel:
+    """
+    Deterministic 16-d unit vectors seeded by the text before the first ":",
+    so every sentence of one topic embeds alike and chunks break between topics.
+    """
+
+    def encode(self, sentences, batch_size=128, show_progress_bar=False):
+        out = []
+        for s in sentences:
+            seed = int(hashlib.md5(s.split(":")[0].encode()).hexdigest()[:8], 16)
+            v = np.random.default_rng(seed).standard_normal(16)
+            out.append(v / np.linalg.norm(v))
+        return np.array(out, dtype=np.float32)
+
+
+def topic_page(topic: str, sentences: int = 12) -> str:
+    """Page text of `sentences` sentences on one FakeModel topic."""
+    return " ".join(f"{topic}: sentence {k} about the issuer's business segment {topic}, "
+                    f"with enough words to be a real sentence." for k in range(sentences))
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves server.files ({path: {"body", "etag"}}) with ETag validators:
+    304 on a matching If-None-Match, 206 on Range (unless If-Range names an
+    older ETag). Every request's headers are logged to server.requests.
+    """
+
+    def log_message(self, *a):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        f = self.server.files.get(self.path)
+        if f is None or f.get("status"):
+            self.send_response(f.get("status", 404) if f else 404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body, etag = f["body"], f["etag"]
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        rng, if_range = self.headers.get("Range"), self.headers.get("If-Range")
+        if rng and (if_range is None or if_range == etag):
+            start = int(rng.split("=")[1].split("-")[0])
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+            body = body[start:]
+        else:
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def stub_server():
+    """A local HTTP server: set server.files, read server.requests, build URLs with server.url(path)."""
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.files, server.requests = {}, []
+    server.url = lambda path: f"http://127.0.0.1:{server.server_address[1]}{path}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
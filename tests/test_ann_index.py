@@ -0,0 +1,87 @@
+"""Local ANN index: built from drhp.db, filtered to one IPO, reloaded after a rebuild."""
+
+import os, sqlite3
+
+import numpy as np
+import pytest
+
+import ann_index
+import rag_indexer as ri
+from embeddings import pack_embedding
+
+
+def _insert(conn, ipo_id, n, seed):
+    rng = np.random.default_rng(seed)
+    conn.executemany(
+        "INSERT INTO chunks (chunk_id, ipo_id, company, page_number, chunk_index, text, embedding, indexed_at) "
+        "VALUES (?,?,?,?,?,?,?,?)",
+        [(f"{ipo_id}_{i}", ipo_id, ipo_id.upper(), i + 1, i, f"chunk {i}",
+          pack_embedding(rng.standard_normal(384)), "2026-01-01") for i in range(n)])
+    conn.commit()
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(ann_index, "_loaded", {})
+    conn = sqlite3.connect(tmp_path / "drhp.db")
+    ri.init_chunks_table(conn)
+    _insert(conn, "a", 40, 1)
+    _insert(conn, "b", 25, 2)
+    yield conn
+    conn.close()
+
+
+def test_build_writes_every_vector(tmp_path, db):
+    out = str(tmp_path / "ann")
+    assert ann_index.build_ann_index(db, out) == 65
+    index = ann_index.load_ann_index(out)
+    assert index["vectors"].shape == (65, 384)
+    assert np.allclose(np.linalg.norm(index["vectors"], axis=1), 1.0, atol=1e-5)
+    assert index["ipo_ranges"] == {"a": [0, 40], "b": [40, 65]}
+    assert int(index["offsets"][-1]) == 65
+    assert sorted(index["list_rows"]) == list(range(65))
+    assert not os.path.exists(out + ".tmp")
+
+
+def test_ipo_filter_returns_only_that_ipo(tmp_path, db):
+    out = str(tmp_path / "ann")
+    ann_index.build_ann_index(db, out)
+    index = ann_index.load_ann_index(out)
+    query = np.asarray(index["vectors"][50])            # a chunk of "b"
+
+    [hits] = ann_index.search(index, query, top_k=10, ipo_id="b")
+    assert len(hits) == 10
+    assert all(index["chunk_ids"][row].startswith("b_") for row, _ in hits)
+    assert hits[0][0] == 50 and hits[0][1] == pytest.approx(1.0, abs=1e-5)
+    assert [s for _, s in hits] == sorted((s for _, s in hits), reverse=True)
+
+    assert ann_index.search(index, query, top_k=10, ipo_id="missing") == [[]]
+
+
+def test_unfiltered_search_finds_the_query_row(tmp_path, db):
+    out = str(tmp_path / "ann")
+    ann_index.build_ann_index(db, out)
+    index = ann_index.load_ann_index(out)
+    queries = np.asarray(index["vectors"][[3, 45]])
+    results = ann_index.search(index, queries, top_k=5, nprobe=len(index["centroids"]))
+    assert [hits[0][0] for hits in results] == [3, 45]
+
+
+def test_reloaded_when_meta_json_changes(tmp_path, db):
+    out = str(tmp_path / "ann")
+    ann_index.build_ann_index(db, out)
+    first = ann_index.load_ann_index(out)
+    assert ann_index.load_ann_index(out) is first       # unchanged → cached
+
+    _insert(db, "c", 10, 3)
+    ann_index.build_ann_index(db, out)
+    meta = os.path.join(out, "meta.json")
+    mtime = os.path.getmtime(meta)
+    os.utime(meta, (mtime + 5, mtime + 5))              # coarse-mtime filesystems
+    second = ann_index.load_ann_index(out)
+    assert second is not first
+    assert second["vectors"].shape == (75, 384) and "c" in second["ipo_ranges"]
+
+
+def test_missing_index_loads_as_none(tmp_path):
+    assert ann_index.load_ann_index(str(tmp_path / "nowhere")) is None
@@ -0,0 +1,73 @@
+"""Cross-IPO search: global hits grouped per IPO, capped, and alike on the SQLite and local ANN backends."""
+
+import sqlite3
+
+import numpy as np
+import pytest
+
+import ann_index
+import rag_indexer as ri
+import rag_retriever as rr
+from embeddings import pack_embedding
+
+
+def _unit(*weights):
+    v = np.zeros(384, dtype=np.float32)
+    v[:len(weights)] = weights
+    return v / np.linalg.norm(v)
+
+
+# ipo_id: [(page, embedding)] — the question embeds to _unit(1)
+IPOS = {
+    "acme":  [(9, _unit(1, 0.1)), (2, _unit(1, 0.2)), (5, _unit(1, 0.3)), (7, _unit(1, 0.4))],
+    "bolt":  [(3, _unit(1, 0.5)), (1, _unit(0, 0, 1))],
+    "crest": [(4, _unit(1, 0.9))],
+    "dune":  [(6, _unit(0, 1))],     # orthogonal — below MIN_SIMILARITY
+}
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    path = str(tmp_path / "drhp.db")
+    conn = sqlite3.connect(path)
+    ri.init_chunks_table(conn)
+    conn.executemany(
+        "INSERT INTO chunks (chunk_id, ipo_id, company, page_number, chunk_index, text, embedding) "
+        "VALUES (?,?,?,?,?,?,?)",
+        [(f"{ipo_id}_{i}", ipo_id, ipo_id.title(), page, i, f"{ipo_id} page {page}", pack_embedding(vec))
+         for ipo_id, chunks in IPOS.items() for i, (page, vec) in enumerate(chunks)])
+    conn.commit()
+    monkeypatch.setattr(rr, "DB_PATH", path)
+    monkeypatch.setattr(rr, "embed_question", lambda q: _unit(1).tolist())
+    monkeypatch.setattr(rr, "get_pinecone_index", lambda: None)
+    monkeypatch.setattr(ann_index, "_loaded", {})
+    yield conn
+    conn.close()
+
+
+@pytest.fixture(params=["sqlite", "local"])
+def backend(request, db, tmp_path, monkeypatch):
+    monkeypatch.setattr(rr, "RAG_BACKEND", request.param)
+    if request.param == "local":
+        out = str(tmp_path / "ann")
+        ann_index.build_ann_index(db, out)
+        monkeypatch.setattr(rr, "ANN_DIR", out)   # 8 vectors → 3 lists, all probed: exact
+    return request.param
+
+
+def test_groups_best_ipo_first(backend):
+    groups = rr.search_all_ipos("question")
+    assert [g["ipo_id"] for g in groups] == ["acme", "bolt", "crest"]
+    assert [g["company"] for g in groups] == ["Acme", "Bolt", "Crest"]
+    best = [g["best_similarity"] for g in groups]
+    assert best == sorted(best, reverse=True)
+
+
+def test_chunks_capped_per_ipo_and_in_page_order(backend):
+    acme = rr.search_all_ipos("question", per_ipo=3)[0]
+    assert [c["page_number"] for c in acme["chunks"]] == [2, 5, 9]   # best three, by page
+    assert all(c["similarity"] >= rr.MIN_SIMILARITY for c in acme["chunks"])
+
+
+def test_max_ipos_caps_groups(backend):
+    assert [g["ipo_id"] for g in rr.search_all_ipos("question", max_ipos=2)] == ["acme", "bolt"]
@@ -0,0 +1,72 @@
+"""drhp.db connection layer: pooled read-only readers and the single WAL writer."""
+
+import os, sqlite3, threading
+
+import pytest
+
+import drhp_db
+
+
+def _make_db(path, label):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (label TEXT)")
+    conn.execute("INSERT INTO t VALUES (?)", (label,))
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "drhp.db")
+    _make_db(path, "first")
+    yield path
+    for _, conn in drhp_db._local.__dict__.pop("conns", {}).values():
+        conn.close()
+    drhp_db.close_write_connection(path)
+
+
+def test_reader_is_pooled_per_thread(db_path):
+    conn = drhp_db.get_read_connection(db_path)
+    assert drhp_db.get_read_connection(db_path) is conn
+
+    other = []
+    t = threading.Thread(target=lambda: other.append(drhp_db.get_read_connection(db_path)))
+    t.start(); t.join()
+    assert other[0] is not None and other[0] is not conn
+
+
+def test_reader_is_read_only(db_path):
+    conn = drhp_db.get_read_connection(db_path)
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("INSERT INTO t VALUES ('x')")
+
+
+def test_reader_reopens_when_file_is_replaced(db_path, tmp_path):
+    conn = drhp_db.get_read_connection(db_path)
+    assert conn.execute("SELECT label FROM t").fetchone() == ("first",)
+
+    fresh = str(tmp_path / "fresh.db")
+    _make_db(fresh, "second")
+    os.replace(fresh, db_path)                      # new inode, as after a copy or git pull
+
+    reopened = drhp_db.get_read_connection(db_path)
+    assert reopened is not conn
+    assert reopened.execute("SELECT label FROM t").fetchone() == ("second",)
+    with pytest.raises(sqlite3.ProgrammingError):   # the stale connection was closed
+        conn.execute("SELECT 1")
+
+
+def test_missing_db_gives_no_reader(tmp_path):
+    assert drhp_db.get_read_connection(str(tmp_path / "absent.db")) is None
+
+
+def test_reader_sees_writer_commits_in_wal_mode(db_path):
+    writer = drhp_db.get_write_connection(db_path)
+    assert drhp_db.get_write_connection(db_path) is writer
+    assert writer.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+
+    reader = drhp_db.get_read_connection(db_path)
+    writer.execute("INSERT INTO t VALUES ('written')")
+    assert reader.execute("SELECT COUNT(*) FROM t").fetchone() == (1,)   # uncommitted
+    writer.commit()
+    assert reader.execute("SELECT COUNT(*) FROM t").fetchone() == (2,)
@@ -0,0 +1,41 @@
+"""The queue's download stage: an unchanged PDF reuses the last run's sections instead of re-extracting."""
+
+import pytest
+
+import drhp_scraper as S
+from pdf_extract import file_sha256
+
+
+@pytest.fixture
+def payload(tmp_path, monkeypatch):
+    monkeypatch.setattr(S, "PDF_DIR", str(tmp_path))
+    monkeypatch.setattr(S, "fetch_pdf", lambda url, dest, headers, revalidate: (2048, 0.1, False))
+    local = tmp_path / "acme.pdf"
+    local.write_bytes(b"%PDF-1.4 " + b"x" * 2048)
+    previous = {"pdf_sha256": file_sha256(local), "parser": S.SECTIONS_TAG,
+                "sections": {"risk_factors": "..."}, "found": ["risk_factors"], "total": 200}
+    return {"ipo": {"id": "acme", "company": "Acme"}, "detail": {"rhp_url": "http://x/acme.pdf"},
+            "previous": previous}
+
+
+def test_not_modified_reuses_previous_sections(payload):
+    stage, out = S._download_stage(payload)
+    assert stage == "write"
+    assert out["sections"] == {"risk_factors": "..."} and out["total"] == 200
+    assert "previous" not in out
+
+
+def test_other_parser_is_extracted_again(payload):
+    payload["previous"]["parser"] = "sections-v0/old"
+    stage, out = S._download_stage(payload)
+    assert stage == "extract" and "sections" not in out and "previous" not in out
+
+
+def test_changed_file_is_extracted_again(payload):
+    payload["previous"]["pdf_sha256"] = "0" * 64
+    assert S._download_stage(payload)[0] == "extract"
+
+
+def test_modified_pdf_is_extracted(payload, monkeypatch):
+    monkeypatch.setattr(S, "fetch_pdf", lambda url, dest, headers, revalidate: (2048, 0.1, True))
+    assert S._download_stage(payload)[0] == "extract"
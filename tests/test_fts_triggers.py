@@ -0,0 +1,92 @@
+"""FTS5 chunk index: the triggers keep chunks_fts in step with every write to chunks."""
+
+import sqlite3
+
+import pytest
+
+import rag_indexer as ri
+
+
+@pytest.fixture
+def db(tmp_path):
+    conn = sqlite3.connect(tmp_path / "drhp.db")
+    ri.init_chunks_table(conn)
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'chunks_fts'").fetchone():
+        pytest.skip("FTS5 not available in this SQLite build")
+    yield conn
+    conn.close()
+
+
+def _add(conn, chunk_id, text, ipo_id="acme"):
+    conn.execute(
+        "INSERT OR REPLACE INTO chunks (chunk_id, ipo_id, company, page_number, chunk_index, text, indexed_at) "
+        "VALUES (?,?,?,?,?,?,?)", (chunk_id, ipo_id, ipo_id.upper(), 1, 0, text, "2026-01-01"))
+    conn.commit()
+
+
+def _match(conn, term, ipo_id="acme"):
+    return sorted(r[0] for r in conn.execute(
+        "SELECT c.chunk_id FROM chunks_fts JOIN chunks c ON c.rowid = chunks_fts.rowid "
+        "WHERE chunks_fts MATCH ? AND chunks_fts.ipo_id = ?", (term, ipo_id)))
+
+
+def _check_integrity(conn):
+    """Raises sqlite3.DatabaseError if chunks_fts disagrees with chunks."""
+    conn.execute("INSERT INTO chunks_fts(chunks_fts, rank) VALUES ('integrity-check', 1)")
+
+
+def test_insert_is_searchable(db):
+    _add(db, "acme_0", "The promoters hold a majority stake.")
+    _add(db, "other_0", "The promoters sold shares.", ipo_id="other")
+    assert _match(db, "promoters") == ["acme_0"]
+    assert _match(db, "promoters", "other") == ["other_0"]
+    _check_integrity(db)
+
+
+def test_update_of_text_replaces_terms(db):
+    _add(db, "acme_0", "Revenue grew in fiscal 2024.")
+    db.execute("UPDATE chunks SET text = 'Litigation is pending before the tribunal.' WHERE chunk_id = 'acme_0'")
+    db.commit()
+    assert _match(db, "revenue") == []
+    assert _match(db, "litigation") == ["acme_0"]
+    _check_integrity(db)
+
+
+def test_update_of_other_columns_leaves_index_alone(db):
+    _add(db, "acme_0", "Working capital requirements.")
+    db.execute("UPDATE chunks SET chunk_index = 7, indexed_at = '2026-02-01' WHERE chunk_id = 'acme_0'")
+    db.commit()
+    assert _match(db, "capital") == ["acme_0"]
+    _check_integrity(db)
+
+
+def test_delete_removes_terms(db):
+    _add(db, "acme_0", "Objects of the issue.")
+    _add(db, "acme_1", "Objects of the offer.")
+    db.execute("DELETE FROM chunks WHERE chunk_id = 'acme_0'")
+    db.commit()
+    assert _match(db, "objects") == ["acme_1"]
+    assert _match(db, "issue") == []
+    _check_integrity(db)
+
+
+def test_insert_or_replace_drops_old_terms(db):
+    _add(db, "acme_0", "Dividend policy of the company.")
+    _add(db, "acme_0", "Risk factors of the company.")     # re-index of the same chunk_id
+    assert _match(db, "dividend") == []
+    assert _match(db, "risk") == ["acme_0"]
+    _check_integrity(db)
+
+
+def test_existing_chunks_indexed_when_table_created(tmp_path):
+    conn = sqlite3.connect(tmp_path / "old.db")
+    ri.init_chunks_table(conn)
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'chunks_fts'").fetchone():
+        pytest.skip("FTS5 not available in this SQLite build")
+    conn.execute("DROP TABLE chunks_fts")
+    for t in ("ai", "ad", "au"):
+        conn.execute(f"DROP TRIGGER chunks_fts_{t}")
+    _add(conn, "acme_0", "Capacity utilisation at the plant.")
+    ri.init_fts_table(conn)
+    assert _match(conn, "utilisation") == ["acme_0"]
+    conn.close()
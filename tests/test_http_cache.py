@@ -0,0 +1,64 @@
+"""http_cache: conditional requests, stored bodies, and parsed results keyed by parser tag."""
+
+import pytest
+
+import http_cache
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(http_cache, "CACHE_DIR", str(tmp_path / "http_cache"))
+
+
+def _counting_parser(calls):
+    def parse(text):
+        calls.append(text)
+        return {"words": text.split()}
+    return parse
+
+
+def test_second_get_is_conditional_and_uses_stored_body(stub_server):
+    stub_server.files["/page"] = {"body": b"hello world", "etag": '"v1"'}
+    url = stub_server.url("/page")
+    assert http_cache.get_text(url, "t") == ("hello world", True)
+    assert http_cache.get_text(url, "t") == ("hello world", False)
+    assert stub_server.requests[-1][1].get("If-None-Match") == '"v1"'
+
+
+def test_get_parsed_reuses_result_on_304(stub_server):
+    stub_server.files["/page"] = {"body": b"a b c", "etag": '"v1"'}
+    url, calls = stub_server.url("/page"), []
+    parse = _counting_parser(calls)
+    assert http_cache.get_parsed(url, "t", parse, "p1") == ({"words": ["a", "b", "c"]}, True)
+    assert http_cache.get_parsed(url, "t", parse, "p1") == ({"words": ["a", "b", "c"]}, False)
+    assert len(calls) == 1
+
+
+def test_get_parsed_reparses_when_tag_changes(stub_server):
+    stub_server.files["/page"] = {"body": b"a b c", "etag": '"v1"'}
+    url, calls = stub_server.url("/page"), []
+    parse = _counting_parser(calls)
+    http_cache.get_parsed(url, "t", parse, "p1")
+    data, modified = http_cache.get_parsed(url, "t", lambda t: {"n": len(t.split())}, "p2")
+    assert (data, modified) == ({"n": 3}, False)
+    assert http_cache.load(url, "t")["parsed_tag"] == "p2"
+    assert http_cache.get_parsed(url, "t", parse, "p2") == ({"n": 3}, False)
+    assert len(calls) == 1
+
+
+def test_get_parsed_reparses_changed_page(stub_server):
+    stub_server.files["/page"] = {"body": b"a b c", "etag": '"v1"'}
+    url, calls = stub_server.url("/page"), []
+    parse = _counting_parser(calls)
+    http_cache.get_parsed(url, "t", parse, "p1")
+    stub_server.files["/page"] = {"body": b"d e", "etag": '"v2"'}
+    assert http_cache.get_parsed(url, "t", parse, "p1") == ({"words": ["d", "e"]}, True)
+    assert len(calls) == 2
+
+
+def test_scopes_are_separate(stub_server):
+    stub_server.files["/page"] = {"body": b"x", "etag": '"v1"'}
+    url = stub_server.url("/page")
+    http_cache.get_text(url, "one")
+    assert http_cache.conditional_headers(url, "one") == {"If-None-Match": '"v1"'}
+    assert http_cache.conditional_headers(url, "two") == {}
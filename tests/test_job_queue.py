@@ -0,0 +1,96 @@
+"""job_queue: claim order, stage hand-off, retries, lease expiry and lost leases."""
+
+import sqlite3
+import time
+
+import pytest
+
+import job_queue as jq
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    jq.init_jobs_table(conn)
+    return conn
+
+
+def _state(conn, key, stage):
+    row = conn.execute("SELECT state FROM jobs WHERE queue = 'q' AND key = ? AND stage = ?",
+                       (key, stage)).fetchone()
+    return row[0] if row else None
+
+
+def test_claim_takes_each_task_once(conn):
+    jq.start_chain(conn, "q", "a", "detail", {"n": 1})
+    jq.start_chain(conn, "q", "b", "detail", {"n": 2})
+    first, second = jq.claim(conn, "q", "detail", "w1"), jq.claim(conn, "q", "detail", "w2")
+    assert {first["key"], second["key"]} == {"a", "b"}
+    assert first["attempts"] == 1 and first["owner"] == "w1"
+    assert jq.claim(conn, "q", "detail", "w3") is None
+    assert jq.claim(conn, "q", "download", "w3") is None
+
+
+def test_start_chain_leaves_an_open_run_alone(conn):
+    assert jq.start_chain(conn, "q", "a", "detail", {"n": 1})
+    assert not jq.start_chain(conn, "q", "a", "detail", {"n": 2})
+    assert jq.claim(conn, "q", "detail", "w")["payload"] == {"n": 1}
+
+
+def test_complete_enqueues_next_stage(conn):
+    jq.start_chain(conn, "q", "a", "detail", {"n": 1})
+    task = jq.claim(conn, "q", "detail", "w")
+    assert jq.complete(conn, task, "download", {"n": 1, "url": "u"})
+    assert _state(conn, "a", "detail") == "done"
+    nxt = jq.claim(conn, "q", "download", "w")
+    assert nxt["payload"] == {"n": 1, "url": "u"} and nxt["attempts"] == 1
+
+
+def test_fail_backs_off_then_gives_up(conn):
+    jq.start_chain(conn, "q", "a", "detail", {}, max_attempts=2)
+    task = jq.claim(conn, "q", "detail", "w")
+    assert jq.fail(conn, task, "boom") == "pending"
+    assert jq.claim(conn, "q", "detail", "w") is None   # still backing off
+    conn.execute("UPDATE jobs SET next_run_at = 0")
+    task = jq.claim(conn, "q", "detail", "w")
+    assert task["attempts"] == 2
+    assert jq.fail(conn, task, "boom") == "failed"
+    assert _state(conn, "a", "detail") == "failed"
+
+
+def test_reap_hands_back_expired_leases(conn):
+    jq.start_chain(conn, "q", "a", "detail", {})
+    jq.claim(conn, "q", "detail", "dead", lease_s=-1)
+    assert jq.reap_expired(conn, "q") == 1
+    task = jq.claim(conn, "q", "detail", "alive")
+    assert task["attempts"] == 2 and task["owner"] == "alive"
+
+
+def test_heartbeat_keeps_a_lease(conn):
+    jq.start_chain(conn, "q", "a", "detail", {})
+    task = jq.claim(conn, "q", "detail", "w", lease_s=-1)
+    jq.heartbeat(conn, [task])
+    assert jq.reap_expired(conn, "q") == 0
+    assert conn.execute("SELECT lease_until FROM jobs").fetchone()[0] > time.time()
+
+
+def test_stale_owner_cannot_complete_or_fail(conn):
+    jq.start_chain(conn, "q", "a", "detail", {})
+    stale = jq.claim(conn, "q", "detail", "slow", lease_s=-1)
+    jq.reap_expired(conn, "q")
+    fresh = jq.claim(conn, "q", "detail", "fast")
+
+    assert not jq.complete(conn, stale, "download", {"from": "slow"})
+    assert jq.fail(conn, stale, "late") is None
+    assert _state(conn, "a", "detail") == "running"
+    assert _state(conn, "a", "download") is None
+
+    assert jq.complete(conn, fresh, "download", {"from": "fast"})
+    assert jq.claim(conn, "q", "download", "w")["payload"] == {"from": "fast"}
+
+
+def test_release_returns_the_attempt(conn):
+    jq.start_chain(conn, "q", "a", "detail", {})
+    task = jq.claim(conn, "q", "detail", "w")
+    jq.release(conn, [task])
+    assert jq.claim(conn, "q", "detail", "w")["attempts"] == 1
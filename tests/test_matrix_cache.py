@@ -0,0 +1,58 @@
+"""Per-IPO chunk-matrix cache: bounded LRU, rebuilt when the indexer rewrites an IPO."""
+
+import sqlite3
+
+import numpy as np
+import pytest
+
+import rag_indexer as ri
+import rag_retriever as rr
+from embeddings import pack_embedding
+
+
+def _insert(conn, ipo_id, n, indexed_at="2026-01-01"):
+    rng = np.random.default_rng(len(ipo_id) + n)
+    conn.executemany(
+        "INSERT INTO chunks (chunk_id, ipo_id, company, page_number, chunk_index, text, embedding, indexed_at) "
+        "VALUES (?,?,?,?,?,?,?,?)",
+        [(f"{ipo_id}_{i}", ipo_id, ipo_id.upper(), i + 1, i, f"chunk {i}",
+          pack_embedding(rng.standard_normal(384)), indexed_at) for i in range(n)])
+    conn.commit()
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    path = str(tmp_path / "drhp.db")
+    conn = sqlite3.connect(path)
+    ri.init_chunks_table(conn)
+    for ipo_id in ("a", "b", "c"):
+        _insert(conn, ipo_id, 3)
+    monkeypatch.setattr(rr, "DB_PATH", path)
+    monkeypatch.setattr(rr, "MATRIX_CACHE_SIZE", 2)
+    rr._matrix_cache.clear()
+    yield conn
+    rr._matrix_cache.clear()
+    conn.close()
+
+
+def test_least_recently_used_ipo_is_evicted(db):
+    rr.get_chunk_matrix("a")
+    rr.get_chunk_matrix("b")
+    rr.get_chunk_matrix("a")   # a is now the most recent
+    rr.get_chunk_matrix("c")
+    assert list(rr._matrix_cache) == ["a", "c"]
+
+
+def test_hit_returns_cached_entry(db):
+    first = rr.get_chunk_matrix("a")
+    assert rr.get_chunk_matrix("a") is first
+    assert first["matrix"].shape == (3, 384)
+    assert np.allclose(np.linalg.norm(first["matrix"], axis=1), 1.0)
+
+
+def test_reindexed_ipo_is_rebuilt(db):
+    first = rr.get_chunk_matrix("a")
+    db.execute("UPDATE chunks SET indexed_at = '2026-02-01' WHERE chunk_id = 'a_0'")
+    db.commit()
+    second = rr.get_chunk_matrix("a")
+    assert second is not first and second["chunk_ids"] == first["chunk_ids"]
@@ -0,0 +1,43 @@
+"""Partial page-cache entries: the TOC path stores a subset, a full extraction completes it."""
+
+import sqlite3
+
+import pdf_extract as pe
+
+
+def _conn():
+    conn = sqlite3.connect(":memory:")
+    pe.init_page_cache(conn)
+    return conn
+
+
+def test_partial_entry_is_not_a_cache_hit():
+    conn = _conn()
+    pe.store_page_texts(conn, "abc", [(3, "three"), (7, "seven")], total=10)
+    assert pe.load_page_texts(conn, "abc") is None
+    assert pe.load_cached_pages(conn, "abc") == {3: "three", 7: "seven"}
+
+
+def test_partial_entries_accumulate_then_complete():
+    conn = _conn()
+    pe.store_page_texts(conn, "abc", [(1, "one")], total=3)
+    pe.store_page_texts(conn, "abc", [(2, "two")], total=3)
+    assert pe.load_cached_pages(conn, "abc") == {1: "one", 2: "two"}
+    pe.store_page_texts(conn, "abc", [(1, "one"), (2, "two"), (3, "three")])
+    assert pe.load_page_texts(conn, "abc") == [(1, "one"), (2, "two"), (3, "three")]
+
+
+def test_full_store_replaces_stale_pages():
+    conn = _conn()
+    pe.store_page_texts(conn, "abc", [(1, "a"), (2, "b"), (3, "c")])
+    pe.store_page_texts(conn, "abc", [(1, "x"), (2, "y")])
+    assert pe.load_page_texts(conn, "abc") == [(1, "x"), (2, "y")]
+
+
+def test_other_extractor_is_ignored(monkeypatch):
+    conn = _conn()
+    pe.store_page_texts(conn, "abc", [(1, "old")], total=2)
+    monkeypatch.setattr(pe, "EXTRACTOR", pe.EXTRACTOR + "-next")
+    assert pe.load_cached_pages(conn, "abc") == {}
+    pe.store_page_texts(conn, "abc", [(2, "new")], total=2)
+    assert pe.load_cached_pages(conn, "abc") == {2: "new"}
@@ -0,0 +1,95 @@
+"""download_pdf against a stub server: fresh download, If-Range resume, changed files, 304 revalidation."""
+
+import json
+
+import pytest
+
+import http_cache
+import pdf_download
+
+V1 = b"%PDF-1.4\n" + b"first version " * 400
+V2 = b"%PDF-1.4\n" + b"second version, longer " * 400
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(http_cache, "CACHE_DIR", str(tmp_path / "http_cache"))
+    monkeypatch.setattr(pdf_download, "RETRY_DELAY", 0)
+
+
+@pytest.fixture
+def dest(tmp_path):
+    return str(tmp_path / "acme.pdf")
+
+
+def _leave_part(dest, url, body, etag):
+    """A download of `body` (version `etag`) interrupted halfway."""
+    with open(dest + ".part", "wb") as f:
+        f.write(body[:len(body) // 2])
+    with open(dest + ".part.json", "w") as f:
+        json.dump({"url": url, "ETag": etag}, f)
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_fresh_download_leaves_no_partial_files(stub_server, dest, tmp_path):
+    stub_server.files["/a.pdf"] = {"body": V1, "etag": '"v1"'}
+    size, _, modified = pdf_download.download_pdf(stub_server.url("/a.pdf"), dest)
+    assert (size, modified) == (len(V1), True)
+    assert _read(dest) == V1
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["acme.pdf", "http_cache"]
+
+
+def test_resume_sends_range_and_if_range(stub_server, dest):
+    stub_server.files["/a.pdf"] = {"body": V1, "etag": '"v1"'}
+    url = stub_server.url("/a.pdf")
+    _leave_part(dest, url, V1, '"v1"')
+    pdf_download.download_pdf(url, dest)
+    sent = stub_server.requests[-1][1]
+    assert sent["Range"] == f"bytes={len(V1) // 2}-" and sent["If-Range"] == '"v1"'
+    assert _read(dest) == V1
+
+
+def test_resume_after_file_changed_restarts(stub_server, dest):
+    stub_server.files["/a.pdf"] = {"body": V2, "etag": '"v2"'}
+    url = stub_server.url("/a.pdf")
+    _leave_part(dest, url, V1, '"v1"')
+    pdf_download.download_pdf(url, dest)
+    assert _read(dest) == V2
+    assert http_cache.load(url, pdf_download.HTTP_SCOPE)["etag"] == '"v2"'
+
+
+def test_part_without_validators_is_discarded(stub_server, dest):
+    stub_server.files["/a.pdf"] = {"body": V2, "etag": '"v2"'}
+    with open(dest + ".part", "wb") as f:
+        f.write(V1[:len(V1) // 2])
+    pdf_download.download_pdf(stub_server.url("/a.pdf"), dest)
+    assert "Range" not in stub_server.requests[-1][1]
+    assert _read(dest) == V2
+
+
+def test_revalidate_unchanged_is_304(stub_server, dest):
+    stub_server.files["/a.pdf"] = {"body": V1, "etag": '"v1"'}
+    url = stub_server.url("/a.pdf")
+    pdf_download.download_pdf(url, dest)
+    size, _, modified = pdf_download.download_pdf(url, dest, revalidate=True)
+    assert (size, modified) == (len(V1), False)
+    assert stub_server.requests[-1][1]["If-None-Match"] == '"v1"'
+
+
+def test_revalidate_changed_downloads_new_version(stub_server, dest):
+    stub_server.files["/a.pdf"] = {"body": V1, "etag": '"v1"'}
+    url = stub_server.url("/a.pdf")
+    pdf_download.download_pdf(url, dest)
+    stub_server.files["/a.pdf"] = {"body": V2, "etag": '"v2"'}
+    _, _, modified = pdf_download.download_pdf(url, dest, revalidate=True)
+    assert modified and _read(dest) == V2
+
+
+def test_not_found_is_not_retried(stub_server, dest):
+    with pytest.raises(Exception):
+        pdf_download.download_pdf(stub_server.url("/missing.pdf"), dest)
+    assert len(stub_server.requests) == 1
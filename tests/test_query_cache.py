@@ -0,0 +1,45 @@
+"""Query-embedding LRU: memory, disk and miss counts as reported by get_query_cache_stats."""
+
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+import rag_retriever as rr
+
+
+class CountingModel:
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, sentences, show_progress_bar=False):
+        self.encoded += list(sentences)
+        return np.ones((len(sentences), 384), dtype=np.float32)
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(rr, "QUERY_CACHE_PATH", str(tmp_path / "query_embeddings.db"))
+    monkeypatch.setattr(rr, "_qcache", OrderedDict())
+    monkeypatch.setattr(rr, "_qcache_conn", None)
+    monkeypatch.setattr(rr, "_qcache_stats", {"memory_hits": 0, "disk_hits": 0, "misses": 0})
+    monkeypatch.setattr(rr, "embedding_model_id", lambda: "fake-model")
+
+
+def test_stats_count_memory_disk_and_misses():
+    model = CountingModel()
+    rr.embed_questions(["What is the IPO size?", "Who are the promoters?"], model=model)
+    rr.embed_questions(["what is the  IPO size?"], model=model)   # normalised → memory hit
+    rr._qcache.clear()                                           # as after a restart
+    rr.embed_questions(["Who are the promoters?"], model=model)  # disk hit
+    stats = rr.get_query_cache_stats()
+    assert model.encoded == ["What is the IPO size?", "Who are the promoters?"]
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 2)
+    assert stats["hit_rate"] == 0.5
+    assert stats["memory_entries"] == 1
+
+
+def test_memory_lru_is_bounded(monkeypatch):
+    monkeypatch.setattr(rr, "QUERY_CACHE_SIZE", 2)
+    rr.embed_questions(["one", "two", "three"], model=CountingModel())
+    assert rr.get_query_cache_stats()["memory_entries"] == 2
@@ -0,0 +1,80 @@
+"""Concurrent indexing: worker processes + one writer store the same chunks as the serial loop."""
+
+import multiprocessing
+
+import pytest
+
+import drhp_db
+import rag_indexer as ri
+from conftest import FakeModel, topic_page
+from pdf_extract import file_sha256, init_page_cache, store_page_texts
+
+IPOS = {
+    "acme":  [(n, topic_page(f"Acme{n}")) for n in range(1, 6)],
+    "bolt":  [(n, topic_page(f"Bolt{n}")) for n in range(1, 4)],
+    "crest": [(n, topic_page(f"Crest{n % 2}")) for n in range(1, 7)],
+}
+
+
+@pytest.fixture(autouse=True)
+def fake_model(monkeypatch):
+    monkeypatch.setattr(ri, "get_model", lambda: FakeModel())
+    monkeypatch.setattr(ri, "_run_id", None)
+    # Spawned workers re-import rag_indexer and would load the real model;
+    # forked ones inherit the patched module, so run the pool under fork here.
+    fork = multiprocessing.get_context("fork")
+    monkeypatch.setattr(ri.multiprocessing, "get_context", lambda method=None: fork)
+
+
+def _setup(tmp_path, name, monkeypatch):
+    """A WAL drhp.db with every IPO's page text cached, and its index jobs."""
+    path = str(tmp_path / name / "drhp.db")
+    conn = drhp_db.get_write_connection(path)
+    ri.init_chunks_table(conn)
+    init_page_cache(conn)
+    jobs = []
+    for ipo_id, pages in IPOS.items():
+        pdf = tmp_path / name / f"{ipo_id}.pdf"
+        pdf.write_bytes(f"%PDF-1.4 stand-in {ipo_id}".encode())
+        store_page_texts(conn, file_sha256(pdf), pages)
+        jobs.append((str(pdf), ipo_id, ipo_id.title()))
+    conn.commit()
+    monkeypatch.setattr(ri, "DB_PATH", path)
+    return path, conn, jobs
+
+
+def _rows(conn):
+    return conn.execute("""
+        SELECT chunk_id, ipo_id, page_number, page_end, sent_start, sent_end,
+               chunk_index, text, embedding
+        FROM chunks ORDER BY chunk_id
+    """).fetchall()
+
+
+def test_two_workers_store_the_same_chunks_as_serial(tmp_path, monkeypatch):
+    path, conn, jobs = _setup(tmp_path, "serial", monkeypatch)
+    for job in jobs:
+        ri.index_pdf(*job, conn)
+    serial = _rows(conn)
+    drhp_db.close_write_connection(path)
+
+    path, conn, jobs = _setup(tmp_path, "parallel", monkeypatch)
+    written, indexed, failed = ri.index_parallel(jobs, conn, workers=2)
+    parallel = _rows(conn)
+    sources = conn.execute("SELECT COUNT(*) FROM index_sources").fetchone()[0]
+    drhp_db.close_write_connection(path)
+
+    assert serial and parallel == serial
+    assert (written, indexed, failed) == (len(serial), len(IPOS), 0)
+    assert sources == len(IPOS)
+
+
+def test_worker_failure_is_counted_not_raised(tmp_path, monkeypatch):
+    path, conn, jobs = _setup(tmp_path, "broken", monkeypatch)
+    jobs[1] = (str(tmp_path / "broken" / "missing.pdf"), "bolt", "Bolt")
+    written, indexed, failed = ri.index_parallel(jobs, conn, workers=2)
+    ipos = {r[0] for r in conn.execute("SELECT DISTINCT ipo_id FROM chunks")}
+    drhp_db.close_write_connection(path)
+
+    assert (indexed, failed) == (2, 1)
+    assert ipos == {"acme", "crest"}
@@ -0,0 +1,83 @@
+"""Incremental re-index: an edited page replaces only its own chunks."""
+
+import sqlite3
+
+import pytest
+
+import rag_indexer as ri
+from conftest import FakeModel, topic_page
+from pdf_extract import file_sha256, init_page_cache, store_page_texts
+
+PAGES = [(n, topic_page(f"Topic{n}")) for n in range(1, 9)]
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(ri, "get_model", lambda: FakeModel())
+    monkeypatch.setattr(ri, "_run_id", None)
+    conn = sqlite3.connect(tmp_path / "drhp.db")
+    ri.init_chunks_table(conn)
+    init_page_cache(conn)
+    yield conn
+    conn.close()
+
+
+def _pdf(tmp_path, conn, name, pages):
+    """A stand-in PDF whose page text is already in the page cache."""
+    pdf = tmp_path / name
+    pdf.write_bytes(f"%PDF-1.4 stand-in {name}".encode())
+    store_page_texts(conn, file_sha256(pdf), pages)
+    return str(pdf)
+
+
+def _chunks(conn):
+    """{chunk_id: (page_number, chunk_index, indexed_at)}"""
+    return {cid: rest for cid, *rest in conn.execute(
+        "SELECT chunk_id, page_number, chunk_index, indexed_at FROM chunks WHERE ipo_id = 'acme'")}
+
+
+def test_edited_page_replaces_only_its_chunks(tmp_path, db):
+    ri.index_pdf(_pdf(tmp_path, db, "v1.pdf", PAGES), "acme", "Acme Ltd", db)
+    before = _chunks(db)
+    on_page = lambda chunks, p: {c for c, (page, _, _) in chunks.items() if page == p}
+    assert on_page(before, 5)
+
+    edited = [(n, topic_page("Topic5a", 6) + " " + topic_page("Topic5b", 6)) if n == 5 else (n, t)
+              for n, t in PAGES]
+    ri.index_pdf(_pdf(tmp_path, db, "v2.pdf", edited), "acme", "Acme Ltd", db)
+    after = _chunks(db)
+
+    for page in (1, 2, 3, 4, 6, 7, 8):
+        assert on_page(after, page) == on_page(before, page)
+    assert not on_page(after, 5) & on_page(before, 5)
+    assert len(on_page(after, 5)) == 2
+
+    tombstoned = {r[0] for r in db.execute("SELECT chunk_id FROM chunk_tombstones WHERE ipo_id = 'acme'")}
+    assert tombstoned == on_page(before, 5)
+
+
+def test_renumber_keeps_reading_order_and_bumps_indexed_at(tmp_path, db):
+    ri.index_pdf(_pdf(tmp_path, db, "v1.pdf", PAGES), "acme", "Acme Ltd", db)
+    before = _chunks(db)
+    edited = [(n, topic_page("Topic5a", 6) + " " + topic_page("Topic5b", 6)) if n == 5 else (n, t)
+              for n, t in PAGES]
+    ri.index_pdf(_pdf(tmp_path, db, "v2.pdf", edited), "acme", "Acme Ltd", db)
+    after = _chunks(db)
+
+    order = [r[0] for r in db.execute(
+        "SELECT chunk_id FROM chunks WHERE ipo_id = 'acme' ORDER BY page_number, sent_start")]
+    assert [after[c][1] for c in order] == list(range(len(order)))
+
+    for cid, (page, index, indexed_at) in after.items():
+        if cid not in before:
+            continue
+        if index != before[cid][1]:      # moved down by page 5's extra chunk
+            assert page > 5 and indexed_at > before[cid][2]
+        else:
+            assert page < 5 and indexed_at == before[cid][2]
+
+
+def test_unchanged_pdf_is_skipped(tmp_path, db):
+    pdf = _pdf(tmp_path, db, "v1.pdf", PAGES)
+    ri.index_pdf(pdf, "acme", "Acme Ltd", db)
+    assert ri.source_unchanged(db, "acme", pdf)
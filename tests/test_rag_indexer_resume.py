@@ -0,0 +1,67 @@
+"""An index interrupted after its first chunk batch must be resumed, not skipped."""
+
+import sqlite3
+import pytest
+
+import rag_indexer as ri
+from conftest import FakeModel, topic_page
+from pdf_extract import file_sha256, init_page_cache, store_page_texts
+
+
+@pytest.fixture
+def indexed_setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(ri, "get_model", lambda: FakeModel())
+    monkeypatch.setattr(ri, "WRITE_BATCH", 2)
+    monkeypatch.setattr(ri, "_run_id", None)
+    pdf = tmp_path / "acme.pdf"
+    pdf.write_bytes(b"%PDF-1.4 stand-in - only its sha256 matters")
+    conn = sqlite3.connect(tmp_path / "drhp.db")
+    ri.init_chunks_table(conn)
+    init_page_cache(conn)
+    pages = [(n, topic_page(f"Topic{n}")) for n in range(1, 9)]
+    store_page_texts(conn, file_sha256(pdf), pages)
+    yield conn, str(pdf)
+    conn.close()
+
+
+def _crash_after_first_batch(conn, pdf):
+    for event in ri.index_events(pdf, "acme", "Acme Ltd", conn):
+        ri.apply_event(conn, event)
+        if event["kind"] == "chunks":
+            return   # process killed — the generator never reaches `done`
+    pytest.fail("no chunk batch was written")
+
+
+def test_interrupted_index_is_not_skipped(indexed_setup):
+    conn, pdf = indexed_setup
+    _crash_after_first_batch(conn, pdf)
+    assert ri.already_indexed(conn, "acme")
+    assert not ri.source_unchanged(conn, "acme", pdf)
+
+    ri.index_pdf(pdf, "acme", "Acme Ltd", conn)
+    assert ri.source_unchanged(conn, "acme", pdf)
+    assert conn.execute("SELECT pdf_sha256 FROM index_sources WHERE ipo_id='acme'").fetchone()[0] \
+        == file_sha256(pdf)
+
+
+def test_interrupted_reindex_of_same_pdf_is_not_skipped(indexed_setup):
+    conn, pdf = indexed_setup
+    ri.index_pdf(pdf, "acme", "Acme Ltd", conn)
+    assert ri.source_unchanged(conn, "acme", pdf)
+    ri.force_reindex(conn, "acme")
+    _crash_after_first_batch(conn, pdf)
+    assert not ri.source_unchanged(conn, "acme", pdf)
+
+
+def test_manifest_backfill_skips_interrupted_index(indexed_setup):
+    conn, pdf = indexed_setup
+    _crash_after_first_batch(conn, pdf)
+    conn.execute("DELETE FROM rag_manifest")
+    ri.init_chunks_table(conn)   # runs the manifest backfill
+    assert conn.execute("SELECT COUNT(*) FROM rag_manifest").fetchone()[0] == 0
+
+
+def test_legacy_index_without_hashes_is_left_alone(indexed_setup):
+    conn, pdf = indexed_setup
+    conn.execute("INSERT INTO chunks (chunk_id, ipo_id, company, text) VALUES ('old_0001','old','Old Co','x')")
+    assert ri.source_unchanged(conn, "old", pdf)
@@ -0,0 +1,67 @@
+"""Hybrid retrieval: BM25-only hits must pass a threshold, and every hit carries its cosine similarity."""
+
+import sqlite3
+
+import numpy as np
+import pytest
+
+import rag_indexer as ri
+import rag_retriever as rr
+from embeddings import pack_embedding
+
+
+def _unit(*weights):
+    v = np.zeros(384, dtype=np.float32)
+    v[:len(weights)] = weights
+    return v
+
+
+CHUNKS = {   # chunk_id: (text, embedding) — the question embeds to _unit(1)
+    "near":  ("restated revenue from operations grew steadily", _unit(1)),
+    "half":  ("return on net worth RoNW was in line with peers", _unit(1, 1.7)),
+    "far":   ("RoNW RoNW RoNW stated in the basis for offer price", _unit(0, 1)),
+    "other": ("the registered office is in Mumbai", _unit(0, 0, 1)),
+}
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    path = str(tmp_path / "drhp.db")
+    conn = sqlite3.connect(path)
+    ri.init_chunks_table(conn)
+    conn.executemany(
+        "INSERT INTO chunks (chunk_id, ipo_id, company, page_number, chunk_index, text, embedding) "
+        "VALUES (?, 'acme', 'Acme', ?, ?, ?, ?)",
+        [(cid, i + 1, i, text, pack_embedding(vec)) for i, (cid, (text, vec)) in enumerate(CHUNKS.items())])
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(rr, "DB_PATH", path)
+    monkeypatch.setattr(rr, "RAG_BACKEND", "sqlite")
+    monkeypatch.setattr(rr, "get_local_index", lambda: None)
+    monkeypatch.setattr(rr, "embed_question", lambda q: _unit(1).tolist())
+    rr._matrix_cache.clear()
+
+
+def _ids(chunks):
+    return {c["chunk_id"] for c in chunks}
+
+
+def test_lexical_only_hit_below_both_floors_is_dropped(db, monkeypatch):
+    monkeypatch.setattr(rr, "BM25_MIN", 1e9)
+    chunks = rr.retrieve_chunks("acme", "RoNW", mode="hybrid")
+    assert _ids(chunks) == {"near", "half"}
+    assert all(c["similarity"] >= rr.MIN_SIMILARITY for c in chunks)
+
+
+def test_lexical_only_hit_kept_by_bm25_floor_has_similarity(db, monkeypatch):
+    monkeypatch.setattr(rr, "BM25_MIN", 0.0)
+    chunks = {c["chunk_id"]: c for c in rr.retrieve_chunks("acme", "RoNW", mode="hybrid")}
+    assert set(chunks) == {"near", "half", "far"}
+    assert chunks["far"]["similarity"] == pytest.approx(0.0, abs=1e-4)
+    assert chunks["half"]["similarity"] == pytest.approx(1 / np.hypot(1, 1.7), abs=1e-3)
+
+
+def test_lexical_mode_always_has_similarity(db):
+    chunks = rr.retrieve_chunks("acme", "RoNW", mode="lexical")
+    assert _ids(chunks) == {"half", "far"}
+    assert all("similarity" in c for c in chunks)
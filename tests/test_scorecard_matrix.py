@@ -0,0 +1,41 @@
+"""Scorecard query embeddings: the model is loaded only when the saved matrix is missing or stale."""
+
+import numpy as np
+import pytest
+
+import rag_retriever as rr
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(rr, "SCORECARD_EMB_PATH", str(tmp_path / "scorecard.npz"))
+    monkeypatch.setattr(rr, "_scorecard_matrix", None)
+    monkeypatch.setattr(rr, "embedding_model_id", lambda: "fake-model")
+    monkeypatch.setattr(rr, "embed_questions",
+                        lambda questions, model=None: np.ones((len(questions), 384), np.float32))
+
+
+def _loader(calls):
+    def load():
+        calls.append(1)
+        return object()
+    return load
+
+
+def test_model_loaded_only_to_build(monkeypatch):
+    calls = []
+    first = rr.get_scorecard_query_matrix(load_model=_loader(calls))
+    assert first.shape == (len(rr.SCORECARD_QUERIES), 384) and calls == [1]
+
+    monkeypatch.setattr(rr, "_scorecard_matrix", None)   # a new process: read back from disk
+    rr.get_scorecard_query_matrix(load_model=_loader(calls))
+    assert calls == [1]
+
+
+def test_stale_file_rebuilds_with_loaded_model(monkeypatch):
+    calls = []
+    rr.get_scorecard_query_matrix(load_model=_loader(calls))
+    monkeypatch.setattr(rr, "_scorecard_matrix", None)
+    monkeypatch.setattr(rr, "embedding_model_id", lambda: "other-model")
+    rr.get_scorecard_query_matrix(load_model=_loader(calls))
+    assert calls == [1, 1]
@@ -0,0 +1,87 @@
+"""Cross-filing sentence cache: repeated boilerplate is answered from drhp.db, not re-encoded."""
+
+import sqlite3
+
+import numpy as np
+import pytest
+
+import rag_indexer as ri
+from conftest import FakeModel, topic_page
+from pdf_extract import file_sha256, init_page_cache, store_page_texts
+
+
+class CountingModel(FakeModel):
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, sentences, batch_size=128, show_progress_bar=False):
+        self.encoded += list(sentences)
+        return super().encode(sentences, batch_size, show_progress_bar)
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(ri, "_run_id", None)
+    conn = sqlite3.connect(tmp_path / "drhp.db")
+    ri.init_chunks_table(conn)
+    init_page_cache(conn)
+    yield conn
+    conn.close()
+
+
+def _learn(conn, cache, ipo_id="acme", now="2026-01-01"):
+    event = cache.drain(ipo_id, now)
+    if event:
+        ri.apply_event(conn, event)
+
+
+def test_repeats_are_encoded_once(db):
+    model = CountingModel()
+    cache = ri.SentenceCache(db, model)
+    out = cache.encode(["Risk: one.", "Risk:  ONE.", "Other: two.", "Risk: one."])
+    assert model.encoded == ["Risk: one.", "Other: two."]        # key ignores case and spacing
+    assert np.allclose(out[0], out[1]) and np.allclose(out[0], out[3])
+    assert (cache.hits, cache.misses) == (0, 4)   # duplicates of a miss count as misses
+
+
+def test_drained_sentences_are_hits_for_the_next_filing(db):
+    first = ri.SentenceCache(db, CountingModel())
+    expected = first.encode(["Risk: one.", "Other: two."])
+    _learn(db, first)
+
+    model = CountingModel()
+    second = ri.SentenceCache(db, model)
+    out = second.encode(["Risk: one.", "Other: two.", "New: three."])
+    assert model.encoded == ["New: three."]
+    assert np.allclose(out[:2], expected, atol=1e-6)
+    assert (second.hits, second.misses) == (2, 1)
+
+    _learn(db, second, now="2026-02-01")
+    hits = dict(db.execute("SELECT sent_key, hits FROM sentence_embeddings"))
+    assert hits[ri.sentence_key("Risk: one.")] == 1
+    assert hits[ri.sentence_key("New: three.")] == 0
+
+
+def test_second_filing_reuses_shared_pages(tmp_path, db, monkeypatch):
+    model = CountingModel()
+    monkeypatch.setattr(ri, "get_model", lambda: model)
+    shared = [(1, topic_page("Boilerplate")), (2, topic_page("Definitions"))]
+    for ipo_id, own in (("acme", "Acme"), ("bolt", "Bolt")):
+        pdf = tmp_path / f"{ipo_id}.pdf"
+        pdf.write_bytes(f"%PDF-1.4 stand-in {ipo_id}".encode())
+        store_page_texts(db, file_sha256(pdf), shared + [(3, topic_page(own))])
+        model.encoded.clear()
+        ri.index_pdf(str(pdf), ipo_id, ipo_id.title(), db)
+    assert model.encoded and all(s.startswith("Bolt:") for s in model.encoded)
+
+
+def test_prune_drops_unused_then_least_recent(db):
+    db.executemany(
+        "INSERT INTO sentence_embeddings (sent_key, embedding, hits, last_used) VALUES (?,?,?,?)",
+        [("reused_old", b"", 2, "2026-01-01"), ("unused_new", b"", 0, "2026-03-01"),
+         ("reused_new", b"", 1, "2026-03-01"), ("unused_old", b"", 0, "2026-01-01")])
+    db.commit()
+    assert ri.prune_sentence_cache(db, keep=2) == 2
+    assert {r[0] for r in db.execute("SELECT sent_key FROM sentence_embeddings")} == {"reused_old", "reused_new"}
+    assert ri.prune_sentence_cache(db, keep=1) == 1
+    assert {r[0] for r in db.execute("SELECT sent_key FROM sentence_embeddings")} == {"reused_new"}